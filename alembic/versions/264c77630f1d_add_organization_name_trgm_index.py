@@ -0,0 +1,31 @@
+"""Add organization name trigram index
+
+Revision ID: 264c77630f1d
+Revises: 3e86f43b815c
+Create Date: 2026-10-18 14:05:42.318907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '264c77630f1d'
+down_revision: Union[str, Sequence[str], None] = '3e86f43b815c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Индекс по lower(name) обслуживает LIKE/ILIKE по префиксу и подстроке, а также оператор похожести %.
+    op.execute("CREATE INDEX IF NOT EXISTS ix_organization_name_trgm "
+               "ON organization USING gin (lower(name) gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_organization_name_trgm")
@@ -0,0 +1,49 @@
+"""Add activity_closure table
+
+Revision ID: 3e86f43b815c
+Revises: 43a42d889eda
+Create Date: 2026-10-18 12:40:07.551203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e86f43b815c'
+down_revision: Union[str, Sequence[str], None] = '43a42d889eda'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('activity_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['activity.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['activity.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_activity_closure_descendant_id', 'activity_closure', ['descendant_id', 'depth'],
+                    unique=False)
+    op.execute("""
+        WITH RECURSIVE closure(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM activity
+            UNION ALL
+            SELECT closure.ancestor_id, activity.id, closure.depth + 1
+            FROM closure JOIN activity ON activity.parent_id = closure.descendant_id
+            WHERE closure.depth < 32
+        )
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, min(depth) FROM closure GROUP BY ancestor_id, descendant_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_activity_closure_descendant_id', table_name='activity_closure')
+    op.drop_table('activity_closure')
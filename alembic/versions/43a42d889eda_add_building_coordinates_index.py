@@ -0,0 +1,40 @@
+"""Add building coordinates index
+
+Revision ID: 43a42d889eda
+Revises: ba0c3e3ebbe1
+Create Date: 2026-10-18 10:12:31.184502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '43a42d889eda'
+down_revision: Union[str, Sequence[str], None] = 'ba0c3e3ebbe1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_building_latitude_longitude', 'building', ['latitude', 'longitude'], unique=False)
+    # GiST-индекс для earthdistance создаётся, только если расширение уже установлено в базе.
+    op.execute("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'earthdistance') THEN
+                CREATE INDEX IF NOT EXISTS ix_building_ll_to_earth
+                    ON building USING gist (ll_to_earth(latitude, longitude));
+            END IF;
+        END
+        $$;
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_building_ll_to_earth")
+    op.drop_index('ix_building_latitude_longitude', table_name='building')
@@ -0,0 +1,32 @@
+"""Add table_version table
+
+Revision ID: 5c1f7a92d3e4
+Revises: 8ba3d2deda08
+Create Date: 2026-10-18 18:02:37.184520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1f7a92d3e4'
+down_revision: Union[str, Sequence[str], None] = '8ba3d2deda08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('table_version',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('table_version')
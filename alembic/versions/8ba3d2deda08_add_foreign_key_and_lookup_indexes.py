@@ -0,0 +1,43 @@
+"""Add foreign key and lookup indexes
+
+Revision ID: 8ba3d2deda08
+Revises: 264c77630f1d
+Create Date: 2026-10-18 15:21:09.774160
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8ba3d2deda08'
+down_revision: Union[str, Sequence[str], None] = '264c77630f1d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_organization_building_id', 'organization', ['building_id']),
+    ('ix_organization_name', 'organization', ['name']),
+    ('ix_activity_parent_id', 'activity', ['parent_id']),
+    ('ix_phone_number_organization_id', 'phone_number', ['organization_id']),
+    ('ix_organization_activity_activity_id_organization_id', 'organization_activity',
+     ['activity_id', 'organization_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY не блокирует запись, но не может выполняться внутри транзакции.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                            postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -1,30 +1,38 @@
-from http.client import HTTPException
-
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+from app.core.conditional import conditional
 from app.core.db_helper import db_helper
 from app.repositories import activity_repository
 from app.schemas.activity import ActivityRead, ActivityUpdate, ActivityCreate
-from app.core.dependencies import verify_api_key
+from app.core.dependencies import verify_api_key, page_params, PageParams
+from app.core.streaming import stream_page
+from app.schemas.pagination import Page
 
-router = APIRouter(tags=['activity'])
+router = APIRouter(tags=['activity'], dependencies=[Depends(verify_api_key)])
 
 
-@router.get('/all_activities', response_model=list[ActivityRead],
+@router.get('/all_activities', response_model=Page[ActivityRead],
+            dependencies=[Depends(conditional("activity"))],
             summary="Получить список всех деятельностей из базы данных",
-            description="Эндпоинт для получения списка всех деятельностей из базы данных.")
-async def read_all_activities(session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                              _: None = Depends(verify_api_key)):
-    return await activity_repository.get_all_activities(session=session)
+            description="Эндпоинт для получения списка всех деятельностей из базы данных. "
+                        "Результат разбит на страницы (limit/after), stream=true отдаёт все записи потоком.")
+async def read_all_activities(page: PageParams = Depends(page_params),
+                              stream: bool = Query(False, description="Отдать все записи потоком"),
+                              session: AsyncSession = Depends(db_helper.read_session_dependency)):
+    if stream:
+        return StreamingResponse(stream_page(activity_repository.all_activities_query(after=page.after), ActivityRead),
+                                 media_type="application/json")
+    return await activity_repository.get_all_activities(session=session, limit=page.limit, after=page.after)
 
 
 @router.get('/activity/{activity_id}', response_model=ActivityRead,
+            dependencies=[Depends(conditional("activity"))],
             summary="Получить деятельность из базы данных по ID",
             description="Эндпоинт для получения конкретной деятельности из базы данных по её ID.")
-async def get_activity_by_id(activity_id: int, session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                             _: None = Depends(verify_api_key)):
+async def get_activity_by_id(activity_id: int, session: AsyncSession = Depends(db_helper.read_session_dependency)):
     activity = await activity_repository.get_activity_by_id(session=session, activity_id=activity_id)
     if activity is not None:
         return activity
@@ -36,8 +44,7 @@ async def get_activity_by_id(activity_id: int, session: AsyncSession = Depends(d
              summary="Добавить новую деятельность в базу данных",
              description="Эндпоинт для добавления новой деятельности в базу данных.")
 async def create_activity(activity_in: ActivityCreate,
-                          session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                          _: None = Depends(verify_api_key)):
+                          session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     return await activity_repository.create_activity(session=session, activity_in=activity_in)
 
 
@@ -45,8 +52,7 @@ async def create_activity(activity_in: ActivityCreate,
             summary="Обновить все данные по деятельности",
             description="Эндпоинт для обновления данных по деятельности.")
 async def update_activity(activity_id: int, activity_update: ActivityUpdate,
-                          session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                          _: None = Depends(verify_api_key)):
+                          session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     activity = await activity_repository.get_activity_by_id(session=session, activity_id=activity_id)
     if not activity:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Activity not found!")
@@ -58,8 +64,7 @@ async def update_activity(activity_id: int, activity_update: ActivityUpdate,
               summary="Обновить некоторые данные по деятельности",
               description="Эндпоинт для частичного обновления данных по деятельности.")
 async def update_activity_partial(activity_id: int, activity_update: ActivityUpdate,
-                                  session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                  _: None = Depends(verify_api_key)):
+                                  session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     activity = await activity_repository.get_activity_by_id(session=session, activity_id=activity_id)
     if not activity:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Activity not found!")
@@ -72,8 +77,7 @@ async def update_activity_partial(activity_id: int, activity_update: ActivityUpd
                description="Эндпоинт для удаления деятельности. "
                            "Необходимо ввести ID деятельности, которую необходимо удалить из базы данных.")
 async def delete_activity(activity_id: int,
-                          session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                          _: None = Depends(verify_api_key)):
+                          session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     activity = await activity_repository.get_activity_by_id(session=session, activity_id=activity_id)
     if not activity:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Activity not found!")
@@ -1,43 +1,64 @@
-from http.client import HTTPException
-
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+from app.core.bulk import read_bulk_items, bulk_result
+from app.core.conditional import conditional
 from app.core.db_helper import db_helper
 from app.repositories import building_repository
-from app.schemas.building import BuildingRead, BuildingUpdate, BuildingCreate
-from app.core.dependencies import verify_api_key
+from app.schemas.building import BuildingRead, BuildingUpdate, BuildingCreate, BuildingBulkItem
+from app.core.dependencies import verify_api_key, page_params, PageParams
+from app.core.streaming import stream_page
+from app.schemas.bulk import BulkResult
+from app.schemas.pagination import Page
 
-router = APIRouter(tags=['building'])
+router = APIRouter(tags=['building'], dependencies=[Depends(verify_api_key)])
 
 
-@router.get("/all_buildings", response_model=list[BuildingRead],
+@router.get("/all_buildings", response_model=Page[BuildingRead],
+            dependencies=[Depends(conditional("building"))],
             summary="Получить список всех зданий из базы данных",
-            description="Эндпоинт для получения списка всех зданий из базы данных.")
-async def get_all_buildings(session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                            _: None = Depends(verify_api_key)):
-    return await building_repository.get_all_buildings(session=session)
+            description="Эндпоинт для получения списка всех зданий из базы данных. "
+                        "Результат разбит на страницы (limit/after), stream=true отдаёт все записи потоком.")
+async def get_all_buildings(page: PageParams = Depends(page_params),
+                            stream: bool = Query(False, description="Отдать все записи потоком"),
+                            session: AsyncSession = Depends(db_helper.read_session_dependency)):
+    if stream:
+        return StreamingResponse(stream_page(building_repository.all_buildings_query(after=page.after), BuildingRead),
+                                 media_type="application/json")
+    return await building_repository.get_all_buildings(session=session, limit=page.limit, after=page.after)
 
 
 @router.get("/building/{building_id}", response_model=BuildingRead,
+            dependencies=[Depends(conditional("building"))],
             summary="Получить здание из базы данных по ID",
             description="Эндпоинт для получения конкретного здания из базы данных по ID.")
-async def get_building_by_id(building_id: int, session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                             _: None = Depends(verify_api_key)):
+async def get_building_by_id(building_id: int, session: AsyncSession = Depends(db_helper.read_session_dependency)):
     building = await building_repository.get_building_by_id(session=session, building_id=building_id)
     if building is not None:
         return building
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Здание с ID {building_id} не найдено!")
 
 
+@router.post('/bulk', response_model=BulkResult,
+             summary="Массовое добавление и обновление зданий",
+             description="Эндпоинт для загрузки зданий пачкой: JSON-массив или NDJSON (Content-Type: "
+                         "application/x-ndjson). Строки с id обновляют существующие записи. Ошибки отдельных строк "
+                         "возвращаются в errors и не прерывают загрузку, ids - id записей в порядке строк.")
+async def bulk_upsert_buildings(request: Request,
+                                session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
+    total, items, errors = await read_bulk_items(request, BuildingBulkItem)
+    ids, write_errors = await building_repository.bulk_upsert_buildings(session=session, items=items)
+    return bulk_result(total, ids, errors + write_errors)
+
+
 @router.post("/", response_model=BuildingRead,
              status_code=status.HTTP_201_CREATED,
              summary="Добавить новое здание в базу данных",
              description="Эндпоинт для добавление нового здания в базу данных.")
 async def create_building(building_in: BuildingCreate,
-                          session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                          _: None = Depends(verify_api_key)):
+                          session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     return await building_repository.create_building(session=session, building_in=building_in)
 
 
@@ -45,8 +66,7 @@ async def create_building(building_in: BuildingCreate,
             summary="Обновить все данные по зданию",
             description="Эндпоинт для обновления данных по зданию.")
 async def update_building(building_id: int, building_update: BuildingUpdate,
-                          session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                          _: None = Depends(verify_api_key)):
+                          session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     building = await building_repository.get_building_by_id(session=session, building_id=building_id)
     if not building:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Building not found!")
@@ -58,8 +78,7 @@ async def update_building(building_id: int, building_update: BuildingUpdate,
               summary="Обновить некоторые данные по зданию",
               description="Эндпоинт для частичного обновления данных по зданию.")
 async def update_building_partial(building_id: int, building_update: BuildingUpdate,
-                                  session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                  _: None = Depends(verify_api_key)):
+                                  session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     building = await building_repository.get_building_by_id(building_id=building_id, session=session)
     if not building:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Building not found!")
@@ -72,35 +91,38 @@ async def update_building_partial(building_id: int, building_update: BuildingUpd
                description="Эндпоинт для удаления здания. "
                            "Необходимо ввести ID здания, которое необходимо удалить из базы данных.")
 async def delete_building(building_id: int,
-                          session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                          _: None = Depends(verify_api_key)):
+                          session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     building = await building_repository.get_building_by_id(session=session, building_id=building_id)
     if not building:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Building not found!")
     await building_repository.delete_building(session=session, building=building)
 
 
-@router.get('/buildings_in_bounds', response_model=list[BuildingRead],
+@router.get('/buildings_in_bounds', response_model=Page[BuildingRead],
+            dependencies=[Depends(conditional("building"))],
             summary="Получить список всех зданий из базы данных, "
                     "находящихся в выбранных координатах(Прямоугольная область).",
             description="Эндпоинт для получения списка всех "
                         "зданий из базы данных, находящихся в выбранных координатах широты и долготы. "
                         "Проверка по прямоугольной области.")
 async def all_organizations_in_bounds(lat_min: float, lat_max: float, lon_min: float, lon_max: float,
-                                      session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                      _: None = Depends(verify_api_key)):
+                                      page: PageParams = Depends(page_params),
+                                      session: AsyncSession = Depends(db_helper.read_session_dependency)):
     return await building_repository.get_buildings_in_bounds(session=session, lat_min=lat_min, lat_max=lat_max,
-                                                             lon_min=lon_min, lon_max=lon_max)
+                                                             lon_min=lon_min, lon_max=lon_max,
+                                                             limit=page.limit, after=page.after)
 
 
-@router.get('/buildings_in_radius', response_model=list[BuildingRead],
+@router.get('/buildings_in_radius', response_model=Page[BuildingRead],
+            dependencies=[Depends(conditional("building"))],
             summary="Получить список всех зданий из базы данных, "
                     "находящихся в выбранных координатах(Радиус).",
             description="Эндпоинт для получения списка всех "
                         "зданий из базы данных, находящихся в выбранных координатах широты и долготы. "
                         "Проверка по радиусу.")
 async def all_organizations_in_radius(center_lat: float, center_lon: float, radius_km: float,
-                                      session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                      _: None = Depends(verify_api_key)):
+                                      page: PageParams = Depends(page_params),
+                                      session: AsyncSession = Depends(db_helper.read_session_dependency)):
     return await building_repository.get_buildings_in_radius(session=session, center_lat=center_lat,
-                                                             center_lon=center_lon, radius_km=radius_km)
+                                                             center_lon=center_lon, radius_km=radius_km,
+                                                             limit=page.limit, after=page.after)
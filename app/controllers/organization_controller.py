@@ -1,45 +1,122 @@
-from http.client import HTTPException
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.bulk import read_bulk_items, bulk_result
+from app.core.conditional import conditional
 from app.core.db_helper import db_helper
 from app.repositories import organization_repository
-from app.schemas.organization import OrganizationRead, OrganizationCreate, OrganizationUpdate
-from app.core.dependencies import verify_api_key
+from app.repositories.activity_repository import ACTIVITY_TREE_CACHE_TAG
+from app.repositories.organization_repository import (expanded_organization_item, organization_item,
+                                                      organization_row_tags)
+from app.schemas.organization import (OrganizationRead, OrganizationCreate, OrganizationUpdate, OrganizationNearestRead,
+                                      OrganizationExpandedRead, OrganizationSearchRead, OrganizationBulkItem)
+from app.repositories.activity_tree_cache import activity_tree_cache
+from app.repositories.suggest_index import suggest_index
+from app.core.dependencies import verify_api_key, page_params, PageParams, expand_param
+from app.core.streaming import stream_ndjson, stream_rows_page
+from app.schemas.bulk import BulkResult
+from app.schemas.pagination import Page, SearchPage
+from app.schemas.suggestion import SuggestionRead
 
-router = APIRouter(tags=['organizations'])
+router = APIRouter(tags=['organizations'], dependencies=[Depends(verify_api_key)])
 
+# Таблицы, от которых зависят ответы эндпоинтов чтения организаций (телефоны - при expand=true).
+ORGANIZATION_TABLES = ("organization", "activity", "building", "phone_number")
 
-@router.get('/all_organizations', response_model=list[OrganizationRead],
+
+def _page_tags(result: dict) -> set[str]:
+    return {tag for organization in result["items"] for tag in organization_row_tags(organization)}
+
+
+def _activity_page_tags(result: dict, activity_id: int, **_) -> set[str]:
+    subtree = activity_tree_cache.descendants(activity_id)
+    return _page_tags(result) | {ACTIVITY_TREE_CACHE_TAG} | {f"activity:{node_id}" for node_id in subtree}
+
+
+@router.get('/all_organizations', response_model=Page[OrganizationExpandedRead],
+            dependencies=[Depends(conditional(*ORGANIZATION_TABLES))],
             summary="Получить список всех организаций из базы данных",
-            description="Эндпоинт для получения списка всех организаций из базы данных.")
-async def read_all_organizations(session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                 _: None = Depends(verify_api_key)):
-    return await organization_repository.get_all_organizations(session=session)
+            description="Эндпоинт для получения списка всех организаций из базы данных. "
+                        "Результат разбит на страницы (limit/after), stream=true отдаёт все записи потоком.")
+async def read_all_organizations(page: PageParams = Depends(page_params),
+                                 expand: bool = Depends(expand_param),
+                                 stream: bool = Query(False, description="Отдать все записи потоком"),
+                                 session: AsyncSession = Depends(db_helper.read_session_dependency)):
+    if stream:
+        stmt = organization_repository.all_organizations_query(after=page.after, expand=expand)
+        return StreamingResponse(stream_rows_page(stmt, expanded_organization_item if expand else organization_item),
+                                 media_type="application/json")
+    return ORJSONResponse(await organization_repository.get_all_organizations(session=session, limit=page.limit,
+                                                                              after=page.after, expand=expand))
 
 
-@router.get('/organization/{organization_id}', response_model=OrganizationRead,
+@router.get('/export', response_class=StreamingResponse,
+            dependencies=[Depends(conditional(*ORGANIZATION_TABLES))],
+            summary="Выгрузить организации в формате NDJSON",
+            description="Эндпоинт для потоковой выгрузки организаций вместе со зданием, видами деятельности и "
+                        "телефонами (одна организация на строку). Можно отфильтровать по зданию, виду деятельности "
+                        "(с учётом вложенных) и прямоугольной области (lat_min, lat_max, lon_min, lon_max).")
+async def export_organizations(building_id: int | None = None, activity_id: int | None = None,
+                               lat_min: float | None = None, lat_max: float | None = None,
+                               lon_min: float | None = None, lon_max: float | None = None,
+                               session: AsyncSession = Depends(db_helper.read_session_dependency)):
+    bounds = (lat_min, lat_max, lon_min, lon_max)
+    if any(value is None for value in bounds):
+        if any(value is not None for value in bounds):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                                detail="Для фильтра по области нужны все параметры lat_min, lat_max, lon_min, lon_max")
+        bounds = None
+    activity_ids = None
+    if activity_id is not None:
+        activity_ids = await activity_tree_cache.get_subtree(session, activity_id)
+        if activity_ids is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Activity not found")
+    stmt = organization_repository.export_organizations_query(building_id=building_id, activity_ids=activity_ids,
+                                                              bounds=bounds)
+    return StreamingResponse(stream_ndjson(stmt, expanded_organization_item), media_type="application/x-ndjson")
+
+
+@router.get('/organization/{organization_id}', response_model=OrganizationExpandedRead,
+            dependencies=[Depends(conditional(*ORGANIZATION_TABLES))],
             summary="Получить организацию из базы данных по ID",
             description="Эндпоинт для получения конкретной организации из базы данных по её ID.")
+@response_cache.cached("organization", OrganizationExpandedRead,
+                       tags=lambda result, **_: organization_row_tags(result), trusted=True)
 async def get_organization_by_id(organization_id: int,
-                                 session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                 _: None = Depends(verify_api_key)):
-    organization = await organization_repository.get_organization_by_id(session=session,
-                                                                        organization_id=organization_id)
+                                 expand: bool = Depends(expand_param),
+                                 session: AsyncSession = Depends(db_helper.read_session_dependency)):
+    organization = await organization_repository.read_organization_by_id(session=session,
+                                                                         organization_id=organization_id,
+                                                                         expand=expand)
     if organization is not None:
         return organization
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Организация с ID {organization_id} не найдена!")
 
 
+@router.post('/bulk', response_model=BulkResult,
+             summary="Массовое добавление и обновление организаций",
+             description="Эндпоинт для загрузки организаций пачкой: JSON-массив или NDJSON (Content-Type: "
+                         "application/x-ndjson). Строки с id обновляют существующие записи. Ошибки отдельных строк "
+                         "возвращаются в errors и не прерывают загрузку, ids - id записей в порядке строк.")
+async def bulk_upsert_organizations(request: Request,
+                                    session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
+    total, items, errors = await read_bulk_items(request, OrganizationBulkItem)
+    ids, write_errors = await organization_repository.bulk_upsert_organizations(session=session, items=items)
+    return bulk_result(total, ids, errors + write_errors)
+
+
 @router.post('/', response_model=OrganizationRead,
              status_code=status.HTTP_201_CREATED,
              summary="Добавить новую организацию в базу данных",
              description="Эндпоинт для добавления организации в базу данных.")
 async def create_organization(organization_in: OrganizationCreate,
-                              session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                              _: None = Depends(verify_api_key)):
+                              session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     return await organization_repository.create_organization(session=session, organization_in=organization_in)
 
 
@@ -47,8 +124,7 @@ async def create_organization(organization_in: OrganizationCreate,
             summary="Обновить все данные по организации",
             description="Эндпоинт для обновления данных по организации.")
 async def update_organization(organization_id: int, organization_update: OrganizationUpdate,
-                              session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                              _: None = Depends(verify_api_key)):
+                              session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     organization = await organization_repository.get_organization_by_id(session=session,
                                                                         organization_id=organization_id)
     if not organization:
@@ -61,8 +137,7 @@ async def update_organization(organization_id: int, organization_update: Organiz
               summary="Обновить некоторые данные по организации",
               description="Эндпоинт для частичного обновления данных по организации.")
 async def update_organization_partial(organization_id: int, organization_update: OrganizationUpdate,
-                                      session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                      _: None = Depends(verify_api_key)):
+                                      session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     organization = await organization_repository.get_organization_by_id(session=session,
                                                                         organization_id=organization_id)
     if not organization:
@@ -76,8 +151,7 @@ async def update_organization_partial(organization_id: int, organization_update:
                description="Эндпоинт для удаления организации. "
                            "Необходимо ввести ID организации, которую необходимо удалить из базы данных.")
 async def delete_organization(organization_id: int,
-                              session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                              _: None = Depends(verify_api_key)):
+                              session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     organization = await organization_repository.get_organization_by_id(session=session,
                                                                         organization_id=organization_id)
     if not organization:
@@ -86,74 +160,146 @@ async def delete_organization(organization_id: int,
     return None
 
 
-@router.get('/organization_in_building', response_model=list[OrganizationRead],
+@router.get('/organization_in_building', response_model=Page[OrganizationExpandedRead],
+            dependencies=[Depends(conditional(*ORGANIZATION_TABLES))],
             summary="Получить список всех организаций из базы данных находящихся в здании.",
             description="Эндпоинт для получения списка всех "
                         "организаций из базы данных находящихся в конкретном здании.")
+@response_cache.cached("organization_in_building", Page[OrganizationExpandedRead],
+                       tags=lambda result, building_id, **_: _page_tags(result) | {f"building:{building_id}"},
+                       trusted=True)
 async def get_all_organization_located_in_building(building_id: int,
+                                                   page: PageParams = Depends(page_params),
+                                                   expand: bool = Depends(expand_param),
                                                    session: AsyncSession = Depends(
-                                                       db_helper.scoped_session_dependency),
-                                                   _: None = Depends(verify_api_key)):
+                                                       db_helper.read_session_dependency)):
     return await organization_repository.get_all_organization_located_in_building(session=session,
-                                                                                  building_id=building_id)
+                                                                                  building_id=building_id,
+                                                                                  limit=page.limit,
+                                                                                  after=page.after,
+                                                                                  expand=expand)
 
 
-@router.get('/organization_by_activity', response_model=list[OrganizationRead],
+@router.get('/organization_by_activity', response_model=Page[OrganizationExpandedRead],
+            dependencies=[Depends(conditional(*ORGANIZATION_TABLES))],
             summary="Получить список всех организаций из базы данных по виду деятельности.",
             description="Эндпоинт для получения списка всех "
                         "организаций из базы данных которые относятся к указанному виду деятельности.")
+@response_cache.cached("organization_by_activity", Page[OrganizationExpandedRead], tags=_activity_page_tags,
+                       trusted=True)
 async def get_all_organization_by_activity(activity_id: int,
-                                           session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                           _: None = Depends(verify_api_key)):
-    return await organization_repository.get_organizations_by_activity(session=session, activity_id=activity_id)
+                                           page: PageParams = Depends(page_params),
+                                           expand: bool = Depends(expand_param),
+                                           session: AsyncSession = Depends(db_helper.read_session_dependency)):
+    return await organization_repository.get_organizations_by_activity(session=session, activity_id=activity_id,
+                                                                       limit=page.limit, after=page.after,
+                                                                       expand=expand)
 
 
-@router.get('/organization_in_bounds', response_model=list[OrganizationRead],
+@router.get('/organization_in_bounds', response_model=Page[OrganizationExpandedRead],
+            dependencies=[Depends(conditional(*ORGANIZATION_TABLES))],
             summary="Получить список всех организаций из базы данных, "
                     "находящихся в выбранных координатах(Прямоугольная область).",
             description="Эндпоинт для получения списка всех "
                         "организаций из базы данных, находящихся в выбранных координатах широты и долготы. "
                         "Проверка по прямоугольной области.")
 async def all_organizations_in_bounds(lat_min: float, lat_max: float, lon_min: float, lon_max: float,
-                                      session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                      _: None = Depends(verify_api_key)):
-    return await organization_repository.get_organizations_in_bounds(session, lat_min, lat_max, lon_min, lon_max)
+                                      page: PageParams = Depends(page_params),
+                                      expand: bool = Depends(expand_param),
+                                      session: AsyncSession = Depends(db_helper.read_session_dependency)):
+    return ORJSONResponse(await organization_repository.get_organizations_in_bounds(
+        session, lat_min, lat_max, lon_min, lon_max, limit=page.limit, after=page.after, expand=expand))
 
 
-@router.get('/organization_in_radius', response_model=list[OrganizationRead],
+@router.get('/organization_in_radius', response_model=Page[OrganizationExpandedRead],
+            dependencies=[Depends(conditional(*ORGANIZATION_TABLES))],
             summary="Получить список всех организаций из базы данных, "
                     "находящихся в выбранных координатах(Радиус).",
             description="Эндпоинт для получения списка всех "
                         "организаций из базы данных, находящихся в выбранных координатах широты и долготы. "
                         "Проверка по через радиус.")
 async def all_organizations_in_radius(center_lat: float, center_lon: float, radius_km: float,
-                                      session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                      _: None = Depends(verify_api_key)):
-    return await organization_repository.get_organizations_in_radius(session=session, center_lat=center_lat,
-                                                                     center_lon=center_lon,
-                                                                     radius_km=radius_km)
+                                      page: PageParams = Depends(page_params),
+                                      expand: bool = Depends(expand_param),
+                                      session: AsyncSession = Depends(db_helper.read_session_dependency)):
+    return ORJSONResponse(await organization_repository.get_organizations_in_radius(
+        session=session, center_lat=center_lat, center_lon=center_lon, radius_km=radius_km, limit=page.limit,
+        after=page.after, expand=expand))
+
+
+@router.get('/nearest', response_model=list[OrganizationNearestRead],
+            dependencies=[Depends(conditional(*ORGANIZATION_TABLES))],
+            summary="Получить ближайшие к точке организации",
+            description="Эндпоинт для получения k ближайших к указанной точке организаций, "
+                        "отсортированных по расстоянию (в км). Можно ограничить поиск видами деятельности "
+                        "(с учётом вложенных) и максимальным радиусом.")
+async def nearest_organizations(center_lat: float, center_lon: float,
+                                k: int = Query(5, ge=1, le=100),
+                                activity_ids: list[int] | None = Query(None),
+                                radius_km: float | None = Query(None, gt=0),
+                                expand: bool = Depends(expand_param),
+                                session: AsyncSession = Depends(db_helper.read_session_dependency)):
+    return ORJSONResponse(await organization_repository.get_nearest_organizations(
+        session=session, center_lat=center_lat, center_lon=center_lon, k=k, activity_ids=activity_ids,
+        radius_km=radius_km, expand=expand))
+
 
+@router.get('/search', response_model=SearchPage[OrganizationSearchRead],
+            dependencies=[Depends(conditional(*ORGANIZATION_TABLES))],
+            summary="Поиск организаций по названию",
+            description="Эндпоинт для поиска организаций по началу названия (prefix), по подстроке (substring) "
+                        "или по похожести (fuzzy). Результаты отсортированы по убыванию оценки похожести "
+                        "и разбиты на страницы (limit/cursor).")
+async def search_organizations(q: str = Query(..., min_length=1, max_length=200),
+                               mode: Literal["prefix", "substring", "fuzzy"] = Query("substring"),
+                               limit: int = Query(settings.page_default_limit, ge=1, le=settings.page_max_limit,
+                                                  description="Максимальное количество записей на странице"),
+                               cursor: str | None = Query(None, description="Курсор: next_cursor предыдущей страницы"),
+                               expand: bool = Depends(expand_param),
+                               session: AsyncSession = Depends(db_helper.read_session_dependency)):
+    return ORJSONResponse(await organization_repository.search_organizations(session=session, query=q, mode=mode,
+                                                                             limit=limit, cursor=cursor,
+                                                                             expand=expand))
 
-@router.get("/organizations_by_activity_limited", response_model=list[OrganizationRead],
+
+@router.get('/suggest', response_model=list[SuggestionRead],
+            dependencies=[Depends(conditional(*ORGANIZATION_TABLES))],
+            summary="Подсказки по началу названия организации или вида деятельности",
+            description="Эндпоинт для автодополнения в строке поиска. Подсказки берутся из индекса в памяти "
+                        "без обращения к базе данных и сортируются по убыванию оценки.")
+async def suggest(q: str = Query(..., min_length=1, max_length=200),
+                  k: int = Query(10, ge=1, le=settings.suggest_max_k)):
+    await suggest_index.ensure_loaded(db_helper.session_factory)
+    return suggest_index.suggest(q, k)
+
+
+@router.get("/organizations_by_activity_limited", response_model=Page[OrganizationExpandedRead],
+            dependencies=[Depends(conditional(*ORGANIZATION_TABLES))],
             summary="Получить организации по виду деятельности (до 3 уровней вложенности)",
             description="Возвращает организации указанной деятельности и её подкатегорий до 3 уровней.")
+@response_cache.cached("organizations_by_activity_limited", Page[OrganizationExpandedRead], tags=_activity_page_tags,
+                       trusted=True)
 async def get_organizations_by_activity_limited_endpoint(activity_id: int,
+                                                         page: PageParams = Depends(page_params),
+                                                         expand: bool = Depends(expand_param),
                                                          session: AsyncSession = Depends(
-                                                             db_helper.scoped_session_dependency),
-                                                         _: None = Depends(verify_api_key)):
+                                                             db_helper.read_session_dependency)):
     return await organization_repository.get_organizations_by_activity_limited(session=session, activity_id=activity_id,
-                                                                               max_depth=3)
+                                                                               max_depth=3, limit=page.limit,
+                                                                               after=page.after, expand=expand)
 
 
-@router.get('/organization_by_name/{organization_name}', response_model=OrganizationRead,
+@router.get('/organization_by_name/{organization_name}', response_model=OrganizationExpandedRead,
+            dependencies=[Depends(conditional(*ORGANIZATION_TABLES))],
             summary="Получить организацию из базы данных по его названию",
             description="Эндпоинт для получения конкретной организации из базы данных по её названию.")
 async def get_organization_by_name(organization_name: str,
-                                   session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                   _: None = Depends(verify_api_key)):
+                                   expand: bool = Depends(expand_param),
+                                   session: AsyncSession = Depends(db_helper.read_session_dependency)):
     organization = await organization_repository.get_organization_by_name(session=session,
-                                                                          organization_name=organization_name)
+                                                                          organization_name=organization_name,
+                                                                          expand=expand)
     if organization is not None:
-        return organization
+        return ORJSONResponse(organization)
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                         detail=f"Организация с названием {organization_name} не найдена!")
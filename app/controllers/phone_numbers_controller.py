@@ -1,31 +1,42 @@
-from http.client import HTTPException
-
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+from app.core.bulk import read_bulk_items, bulk_result
+from app.core.conditional import conditional
 from app.core.db_helper import db_helper
 from app.repositories import phone_numbers_repository
-from app.schemas.phone_numbers import PhoneNumberRead, PhoneNumberUpdate, PhoneNumberCreate
-from app.core.dependencies import verify_api_key
+from app.schemas.phone_numbers import PhoneNumberRead, PhoneNumberUpdate, PhoneNumberCreate, PhoneNumberBulkItem
+from app.core.dependencies import verify_api_key, page_params, PageParams
+from app.core.streaming import stream_page
+from app.schemas.bulk import BulkResult
+from app.schemas.pagination import Page
 
-router = APIRouter(tags=['phone_numbers'])
+router = APIRouter(tags=['phone_numbers'], dependencies=[Depends(verify_api_key)])
 
 
-@router.get('/all_phone_numbers', response_model=list[PhoneNumberRead],
+@router.get('/all_phone_numbers', response_model=Page[PhoneNumberRead],
+            dependencies=[Depends(conditional("phone_number"))],
             summary="Получить список всех номеров телефона из базы данных",
-            description="Эндпоинт для получения списка всех номеров телефона из базы данных.")
-async def get_all_phone_numbers(session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                _: None = Depends(verify_api_key)):
-    return await phone_numbers_repository.get_all_phone_numbers(session=session)
+            description="Эндпоинт для получения списка всех номеров телефона из базы данных. "
+                        "Результат разбит на страницы (limit/after), stream=true отдаёт все записи потоком.")
+async def get_all_phone_numbers(page: PageParams = Depends(page_params),
+                                stream: bool = Query(False, description="Отдать все записи потоком"),
+                                session: AsyncSession = Depends(db_helper.read_session_dependency)):
+    if stream:
+        return StreamingResponse(stream_page(phone_numbers_repository.all_phone_numbers_query(after=page.after),
+                                             PhoneNumberRead), media_type="application/json")
+    return await phone_numbers_repository.get_all_phone_numbers(session=session, limit=page.limit,
+                                                                after=page.after)
 
 
 @router.get('/phone_numbers/{phone_number_id}', response_model=PhoneNumberRead,
+            dependencies=[Depends(conditional("phone_number"))],
             summary="Получить номер телефона из базы данных по ID",
             description="Эндпоинт для получения конкретного номера телефона из базы данных по ID.")
 async def get_phone_number_by_id(phone_number_id: int,
-                                 session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                                 _: None = Depends(verify_api_key)):
+                                 session: AsyncSession = Depends(db_helper.read_session_dependency)):
     phone_number = await phone_numbers_repository.get_phone_number_by_id(session=session,
                                                                          phone_number_id=phone_number_id)
     if phone_number is not None:
@@ -34,13 +45,24 @@ async def get_phone_number_by_id(phone_number_id: int,
                         detail=f"Номер телефона с ID {phone_number_id} не найден!")
 
 
+@router.post('/bulk', response_model=BulkResult,
+             summary="Массовое добавление и обновление телефонов",
+             description="Эндпоинт для загрузки телефонов пачкой: JSON-массив или NDJSON (Content-Type: "
+                         "application/x-ndjson). Строки с id обновляют существующие записи. Ошибки отдельных строк "
+                         "возвращаются в errors и не прерывают загрузку, ids - id записей в порядке строк.")
+async def bulk_upsert_phone_numbers(request: Request,
+                                    session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
+    total, items, errors = await read_bulk_items(request, PhoneNumberBulkItem)
+    ids, write_errors = await phone_numbers_repository.bulk_upsert_phone_numbers(session=session, items=items)
+    return bulk_result(total, ids, errors + write_errors)
+
+
 @router.post('/', response_model=PhoneNumberRead,
              status_code=status.HTTP_201_CREATED,
              summary="Добавить новый номер телефона в базу данных",
              description="Эндпоинт для добавление нового номера телефона в базу данных.")
 async def create_phone_number(phone_number_in: PhoneNumberCreate,
-                              session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                              _: None = Depends(verify_api_key)):
+                              session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     return await phone_numbers_repository.create_phone_number(session=session, phone_number_in=phone_number_in)
 
 
@@ -48,8 +70,7 @@ async def create_phone_number(phone_number_in: PhoneNumberCreate,
             summary="Обновить все данные по номеру телефона",
             description="Эндпоинт для обновления данных по номеру телефона.")
 async def update_phone_number(phone_number_id: int, phone_number_update: PhoneNumberUpdate,
-                              session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                              _: None = Depends(verify_api_key)):
+                              session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     phone_number = await phone_numbers_repository.get_phone_number_by_id(session=session,
                                                                          phone_number_id=phone_number_id)
     if not phone_number:
@@ -62,8 +83,7 @@ async def update_phone_number(phone_number_id: int, phone_number_update: PhoneNu
               summary="Обновить некоторые данные по номеру телефона",
               description="Эндпоинт для частичного обновления данных по номеру телефона.")
 async def update_phone_number(phone_number_id: int, phone_number_update: PhoneNumberUpdate,
-                              session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                              _: None = Depends(verify_api_key)):
+                              session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     phone_number = await phone_numbers_repository.get_phone_number_by_id(session=session,
                                                                          phone_number_id=phone_number_id)
     if not phone_number:
@@ -77,8 +97,7 @@ async def update_phone_number(phone_number_id: int, phone_number_update: PhoneNu
                description="Эндпоинт для удаления номера телефона. "
                            "Необходимо ввести ID номера телефона, который необходимо удалить из базы данных.")
 async def delete_phone_number(phone_number_id: int,
-                              session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                              _: None = Depends(verify_api_key)):
+                              session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
     phone_number = await phone_numbers_repository.get_phone_number_by_id(session=session,
                                                                          phone_number_id=phone_number_id)
     if not phone_number:
@@ -0,0 +1,80 @@
+import asyncio
+from contextvars import ContextVar
+
+from fastapi import HTTPException, status
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+
+from .config import settings
+from .metrics import metrics
+
+# Предел ожидания места в очереди к базе для текущего запроса; задают зависимости сессий эндпоинтов.
+admission_timeout: ContextVar[float | None] = ContextVar("admission_timeout", default=None)
+
+
+class Admission:
+    """Места для запросов к каждому движку: столько же, сколько соединений в его пуле (pool_size + max_overflow).
+
+    Запрос, не получивший место за admission_timeout, отклоняется с 503 и Retry-After, а не ждёт соединение
+    pool_timeout секунд. Фоновые задачи мест не занимают, поэтому получивший место запрос может ещё немного
+    подождать соединение в пуле.
+    """
+
+    def __init__(self):
+        self._slots: dict[Engine, asyncio.Semaphore] = {}
+
+    def slots(self, engine: Engine) -> asyncio.Semaphore:
+        if engine not in self._slots:
+            self._slots[engine] = asyncio.Semaphore(settings.db_pool_size + settings.db_max_overflow)
+        return self._slots[engine]
+
+    async def acquire(self, engine: Engine, timeout: float):
+        try:
+            await asyncio.wait_for(self.slots(engine).acquire(), timeout)
+        except TimeoutError:
+            metrics.pool_rejections += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Нет свободных соединений с базой данных, повторите запрос позже",
+                                headers={"Retry-After": str(settings.db_pool_retry_after_seconds)})
+
+
+admission = Admission()
+
+
+class AdmissionSession(Session):
+    """Сессия, которая занимает место (admission) при первом обращении к движку, а не при создании: запросы,
+    отвеченные из кэша или отклонённые проверкой ключа, мест не занимают. Места освобождаются при закрытии
+    сессии. Без admission_timeout (фоновые задачи) мест не занимает.
+
+    committed - была ли в сессии успешно зафиксирована транзакция.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._admitted: dict[Engine, asyncio.Semaphore] = {}
+        self.committed = False
+
+    def admit(self, engine: Engine) -> Engine:
+        # get_bind вызывается из greenlet асинхронной сессии, поэтому ожидание места идёт через await_only.
+        timeout = admission_timeout.get()
+        if timeout is not None and engine not in self._admitted:
+            await_only(admission.acquire(engine, timeout))
+            self._admitted[engine] = admission.slots(engine)
+        return engine
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        return self.admit(super().get_bind(mapper, clause=clause, **kwargs))
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            for slots in self._admitted.values():
+                slots.release()
+            self._admitted.clear()
+
+
+@event.listens_for(AdmissionSession, "after_commit")
+def _mark_committed(session: AdmissionSession):
+    session.committed = True
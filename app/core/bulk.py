@@ -0,0 +1,46 @@
+import json
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+
+
+async def read_bulk_items(request: Request,
+                          schema: type[BaseModel]) -> tuple[int, list[tuple[int, BaseModel]], list[dict]]:
+    """Разбирает тело запроса - JSON-массив или NDJSON (application/x-ndjson).
+
+    Возвращает число строк, провалидированные строки с их индексами и ошибки строк, не прошедших валидацию.
+    """
+    body = await request.body()
+    if "ndjson" in request.headers.get("content-type", ""):
+        raw_items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                raw_items.append(json.loads(line))
+            except ValueError as e:
+                raw_items.append(e)
+    else:
+        try:
+            raw_items = json.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=f"Некорректный JSON: {e}")
+        if not isinstance(raw_items, list):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                                detail="Ожидается JSON-массив или NDJSON")
+    items, errors = [], []
+    for index, raw in enumerate(raw_items):
+        if isinstance(raw, ValueError):
+            errors.append({"index": index, "detail": f"Некорректный JSON: {raw}"})
+            continue
+        try:
+            items.append((index, schema.model_validate(raw)))
+        except ValidationError as e:
+            errors.append({"index": index, "detail": "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())})
+    return len(raw_items), items, errors
+
+
+def bulk_result(total: int, ids: dict[int, int], errors: list[dict]) -> dict:
+    return {"ids": [ids.get(index) for index in range(total)],
+            "errors": sorted(errors, key=lambda error: error["index"])}
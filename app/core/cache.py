@@ -0,0 +1,218 @@
+import functools
+import json
+import time
+from collections import Counter, OrderedDict
+from dataclasses import asdict, is_dataclass
+from typing import Iterable
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
+
+from app.core.config import settings
+
+
+class MemoryCacheBackend:
+    """LRU-кэш в памяти процесса с временем жизни записей и индексом по тегам.
+
+    Поколение кэша увеличивается при каждой инвалидации; set с поколением, прочитанным до неё,
+    ничего не сохраняет.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, bytes, frozenset[str]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._generation = 0
+
+    def _evict(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def generation(self) -> int:
+        return self._generation
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str], generation: int | None = None):
+        if generation is not None and generation != self._generation:
+            return
+        self._evict(key)
+        tags = frozenset(tags)
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    async def invalidate(self, tags: Iterable[str]):
+        self._generation += 1
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._evict(key)
+
+    async def clear(self):
+        self._generation += 1
+        self._entries.clear()
+        self._tags.clear()
+
+
+class RedisCacheBackend:
+    """Кэш в Redis (или любом клиенте с интерфейсом redis.asyncio), общий для всех воркеров.
+
+    Для каждого тега хранится множество ключей, которые его упоминают. Поколение кэша тоже хранится
+    в Redis: инвалидация в любом воркере увеличивает его, а set проверяет поколение и пишет
+    в одной транзакции (WATCH/MULTI), поэтому ответ, посчитанный до чужой инвалидации, не сохраняется.
+    """
+
+    def __init__(self, client, ttl: float, prefix: str = "cache:"):
+        self.client = client
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self._generation_key = f"{prefix}generation"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(self.prefix + key)
+
+    async def generation(self) -> int:
+        return int(await self.client.get(self._generation_key) or 0)
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str], generation: int | None = None):
+        from redis.exceptions import WatchError
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                if generation is not None:
+                    await pipe.watch(self._generation_key)
+                    if int(await pipe.get(self._generation_key) or 0) != generation:
+                        return
+                    pipe.multi()
+                pipe.set(self.prefix + key, value, ex=self.ttl)
+                for tag in tags:
+                    pipe.sadd(self._tag_key(tag), self.prefix + key)
+                    pipe.expire(self._tag_key(tag), self.ttl)
+                await pipe.execute()
+            except WatchError:
+                # Между проверкой поколения и записью прошла инвалидация.
+                return
+
+    async def invalidate(self, tags: Iterable[str]):
+        await self.client.incr(self._generation_key)
+        for tag in tags:
+            keys = await self.client.smembers(self._tag_key(tag))
+            await self.client.delete(self._tag_key(tag), *keys)
+
+    async def clear(self):
+        keys = [key async for key in self.client.scan_iter(match=self.prefix + "*")
+                if key != self._generation_key.encode()]
+        await self.client.incr(self._generation_key)
+        if keys:
+            await self.client.delete(*keys)
+
+
+@functools.cache
+def redis_client():
+    """Общий клиент Redis для кэша ответов и версий таблиц (пакет redis нужен только при cache_backend=redis)."""
+    from redis import asyncio as redis
+
+    return redis.from_url(settings.cache_redis_url)
+
+
+def create_cache_backend():
+    if settings.cache_backend == "memory":
+        return MemoryCacheBackend(max_entries=settings.cache_max_entries, ttl=settings.cache_ttl_seconds)
+    if settings.cache_backend == "redis":
+        return RedisCacheBackend(redis_client(), ttl=settings.cache_ttl_seconds)
+    return None
+
+
+class ResponseCache:
+    """Кэш ответов эндпоинтов чтения с инвалидацией по тегам сущностей (organization:1, building:2, ...).
+
+    Записи репозиториев вызывают invalidate с тегами изменённых сущностей. Если за время
+    выполнения запроса была инвалидация (в любом воркере, если кэш общий), результат не кэшируется,
+    чтобы не сохранить устаревшие данные.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+
+    @staticmethod
+    def _key(namespace: str, kwargs: dict) -> str:
+        params = {name: asdict(value) if is_dataclass(value) else value for name, value in kwargs.items()
+                  if name != "_" and not isinstance(value, (AsyncSession, async_scoped_session))}
+        return f"{namespace}:{json.dumps(params, sort_keys=True, default=str)}"
+
+    def cached(self, namespace: str, response_model, tags, trusted: bool = False):
+        """Декоратор эндпоинта: tags(result, **параметры эндпоинта) возвращает теги записи для ответа result.
+
+        trusted=True - эндпоинт возвращает готовые dict/list из базы: они кодируются orjson без проверки
+        схемой response_model, и tags получает их же.
+        """
+        adapter = TypeAdapter(response_model)
+
+        def decorator(endpoint):
+            @functools.wraps(endpoint)
+            async def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    result = await endpoint(*args, **kwargs)
+                    return ORJSONResponse(result) if trusted else result
+                key = self._key(namespace, kwargs)
+                value = await self.backend.get(key)
+                if value is not None:
+                    self.hits[namespace] += 1
+                    return Response(content=value, media_type="application/json", headers={"X-Cache": "HIT"})
+                self.misses[namespace] += 1
+                generation = await self.backend.generation()
+                if trusted:
+                    result = await endpoint(*args, **kwargs)
+                    value = orjson.dumps(result)
+                else:
+                    result = adapter.validate_python(await endpoint(*args, **kwargs), from_attributes=True)
+                    value = adapter.dump_json(result)
+                await self.backend.set(key, value, tags(result, **kwargs), generation)
+                return Response(content=value, media_type="application/json", headers={"X-Cache": "MISS"})
+
+            return wrapper
+
+        return decorator
+
+    async def invalidate(self, *tags: str):
+        if self.backend is not None and tags:
+            await self.backend.invalidate(tags)
+
+    async def forget_local(self):
+        """Очищает кэш в памяти процесса после записи другого процесса: её теги этот кэш не видел.
+        Общий кэш в Redis записи других процессов инвалидируют сами."""
+        if isinstance(self.backend, MemoryCacheBackend):
+            await self.backend.clear()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {namespace: {"hits": self.hits[namespace], "misses": self.misses[namespace]}
+                for namespace in sorted(self.hits.keys() | self.misses.keys())}
+
+
+response_cache = ResponseCache(create_cache_backend())
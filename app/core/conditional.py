@@ -0,0 +1,160 @@
+import hashlib
+import secrets
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core.cache import redis_client
+from app.core.config import settings
+from app.core.db_helper import db_helper
+from app.core.dependencies import verify_api_key
+from app.models.table_version import table_version
+
+
+class TableVersions:
+    """Счётчики версий таблиц и время их последнего изменения.
+
+    Репозитории увеличивают версию после каждой записи, поэтому ETag ответа можно посчитать
+    до обращения к базе. Без Redis счётчики живут в памяти процесса: о записях других воркеров
+    и загрузчика воркер узнаёт через IndexPoller (mark_changed), то есть с задержкой до index_poll_seconds.
+    С cache_backend=redis счётчики общие и меняются сразу.
+
+    Кроме того, каждая запись увеличивает общий счётчик таблицы в базе (таблица table_version).
+    По нему IndexPoller узнаёт о записях других процессов. applied - версии из table_version,
+    уже учтённые данными в памяти этого процесса.
+    """
+
+    def __init__(self, client=None, engine: AsyncEngine | None = None, prefix: str = "version:"):
+        self.client = client
+        self.engine = engine
+        self.prefix = prefix
+        self.started = time.time()
+        # Версии в памяти начинаются с нуля при каждом запуске, поэтому ETag включает метку процесса.
+        self.token = "shared" if client is not None else secrets.token_hex(8)
+        self._local: dict[str, tuple[int, float]] = {}
+        self.applied: dict[str, int] = {}
+
+    def _bump_local(self, tables: tuple[str, ...]):
+        now = time.time()
+        for table in tables:
+            self._local[table] = (self._local.get(table, (0, now))[0] + 1, now)
+
+    def mark_changed(self, *tables: str):
+        """Учитывает запись другого процесса, замеченную по table_version: без Redis версии живут в памяти,
+        и без этого воркер отвечал бы 304 на данные, изменённые другими. Версии в Redis уже общие."""
+        if self.client is None:
+            self._bump_local(tables)
+
+    async def bump(self, *tables: str):
+        if self.client is None:
+            self._bump_local(tables)
+        else:
+            now = time.time()
+            pipe = self.client.pipeline(transaction=False)
+            for table in tables:
+                pipe.incr(self.prefix + table)
+                pipe.set(f"{self.prefix}{table}:modified", now)
+            await pipe.execute()
+        if self.engine is not None:
+            await self._bump_shared(tables)
+
+    async def _bump_shared(self, tables: tuple[str, ...]):
+        # Запись этого процесса уже обновила его данные в памяти. Если до неё версия совпадала с учтённой,
+        # новая тоже считается учтённой и поллер не перезагружает индексы; иначе между ними была чужая запись.
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table_version).values([{"name": table, "version": 1} for table in tables])
+        stmt = stmt.on_conflict_do_update(index_elements=[table_version.c.name],
+                                          set_={"version": table_version.c.version + 1})
+        async with self.engine.begin() as connection:
+            result = await connection.execute(stmt.returning(table_version.c.name, table_version.c.version))
+            for table, version in result:
+                if self.applied.get(table, 0) == version - 1:
+                    self.applied[table] = version
+
+    @staticmethod
+    async def fetch_shared(session: AsyncSession) -> dict[str, int]:
+        """Общие версии таблиц из table_version."""
+        result = await session.execute(select(table_version.c.name, table_version.c.version))
+        return dict(result.all())
+
+    async def get(self, tables: tuple[str, ...]) -> list[tuple[int, float]]:
+        if self.client is None:
+            return [self._local.get(table, (0, self.started)) for table in tables]
+        keys = [key for table in tables for key in (self.prefix + table, f"{self.prefix}{table}:modified")]
+        values = await self.client.mget(keys)
+        return [(int(values[i] or 0), float(values[i + 1] or self.started)) for i in range(0, len(values), 2)]
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates or etag.removeprefix("W/") in candidates
+
+
+def _not_modified_since(header: str, last_modified: float) -> bool:
+    try:
+        return int(last_modified) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def conditional(*tables: str):
+    """Зависимость для GET-эндпоинтов: ETag и Last-Modified по версиям таблиц, 304 без обращения к базе.
+
+    Заголовки ответа (ETag, Last-Modified, Cache-Control) выставляет ConditionalHeadersMiddleware.
+    """
+
+    async def dependency(request: Request, _: None = Depends(verify_api_key)):
+        versions = await table_versions.get(tables)
+        digest = hashlib.sha1(f"{request.url.path}?{request.url.query}|{table_versions.token}|{versions}".encode())
+        etag = f'W/"{digest.hexdigest()[:20]}"'
+        last_modified = max(modified for _, modified in versions)
+        route = request.scope.get("route")
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(last_modified, usegmt=True),
+            "Cache-Control": settings.http_cache_control.get(getattr(route, "path", ""),
+                                                             settings.http_cache_control_default),
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if_modified_since = request.headers.get("if-modified-since")
+        if (_etag_matches(if_none_match, etag) if if_none_match is not None
+                else if_modified_since is not None and _not_modified_since(if_modified_since, last_modified)):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        request.state.conditional_headers = headers
+        # Сессия чтения выберет только реплику, уже применившую изменения этих таблиц, иначе ответ
+        # с отстающей реплики получил бы ETag более новой версии.
+        request.state.data_modified = last_modified
+
+    return dependency
+
+
+class ConditionalHeadersMiddleware:
+    """Добавляет заголовки, посчитанные зависимостью conditional, к успешным ответам,
+    в том числе к потоковым и к ответам из кэша."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and message["status"] == status.HTTP_200_OK:
+                headers = scope.get("state", {}).get("conditional_headers")
+                if headers:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (name.lower().encode(), value.encode()) for name, value in headers.items()]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+table_versions = TableVersions(redis_client() if settings.cache_backend == "redis" else None, engine=db_helper.engine)
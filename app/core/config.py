@@ -10,12 +10,60 @@ class Settings(BaseSettings):
     postgres_db: str
     database_url: str | None = None
     db_echo: bool = False
+    db_statement_cache_size: int | None = None
+    db_prepared_statement_cache_size: int | None = None
+
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = False
+    db_pool_warm_up: bool = True
+    db_pool_admission_timeout: float | None = 1.0
+    db_pool_retry_after_seconds: int = 1
+
+    database_replica_urls: list[str] = []
+    replica_health_check_seconds: float = 5.0
+    replica_sticky_seconds: float = 5.0
+
+    slow_query_ms: float = 200.0
+    slow_query_explain: bool = True
+    query_stats_log: bool = True
 
     api_key: str
 
     api_v1_prefix: str = '/api/v1'
     alembic_prefix: str = '/alembic'
 
+    page_default_limit: int = 100
+    page_max_limit: int = 1000
+    stream_batch_size: int = 500
+    bulk_chunk_size: int = 1000
+
+    spatial_index_cell_deg: float = 0.1
+    radius_query_backend: str = 'index'
+    radius_query_use_earthdistance: bool = True
+
+    activity_max_levels: int = 3
+    index_poll_seconds: float = 5.0
+
+    search_backend: str = 'auto'
+    search_similarity_threshold: float = 0.5
+
+    suggest_max_k: int = 20
+    suggest_organization_weight: float = 1.0
+    suggest_activity_weight: float = 0.5
+    suggest_length_penalty: float = 0.01
+    suggest_inner_word_penalty: float = 0.2
+
+    cache_backend: str = 'memory'
+    cache_ttl_seconds: float = 60.0
+    cache_max_entries: int = 10000
+    cache_redis_url: str | None = None
+
+    http_cache_control_default: str = 'private, no-cache'
+    http_cache_control: dict[str, str] = {}
+
     class Config:
         env_file = BASE_DIR / ".env"
         env_file_encoding = 'utf-8'
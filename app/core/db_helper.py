@@ -1,44 +1,124 @@
+import asyncio
+
+from fastapi import Request
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, async_scoped_session, AsyncSession
 from asyncio import current_task
 
+from .admission import AdmissionSession, admission_timeout
 from .config import settings
+from .metrics import TimedQueuePool
+from .replicas import ReplicaSet, RoutingSession, read_routing
+
+
+def asyncpg_connect_args(url: str) -> dict:
+    """Настройки кэша подготовленных выражений asyncpg (None - значение драйвера по умолчанию).
+    За pgbouncer в режиме transaction нужен db_statement_cache_size=0."""
+    if not url.startswith("postgresql+asyncpg"):
+        return {}
+    connect_args = {}
+    if settings.db_statement_cache_size is not None:
+        connect_args["statement_cache_size"] = settings.db_statement_cache_size
+    if settings.db_prepared_statement_cache_size is not None:
+        connect_args["prepared_statement_cache_size"] = settings.db_prepared_statement_cache_size
+    return connect_args
+
+
+def _create_engine(url: str, echo: bool):
+    return create_async_engine(
+        url=url,
+        echo=echo,
+        future=True,
+        poolclass=TimedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=asyncpg_connect_args(url),
+    )
+
+
+def client_key(request: Request) -> str | None:
+    """Ключ клиента для чтения своих записей: заголовок X-Client-Id, иначе адрес клиента."""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else None)
 
 
 class DataBaseHelper:
-    def __init__(self, url: str, echo: bool = False):
-        self.engine = create_async_engine(
-            url=url,
-            echo=echo,
-            future=True,
-            pool_size=5,
-            max_overflow=10
-        )
+    def __init__(self, url: str, echo: bool = False, replica_urls: list[str] = ()):
+        self.engine = _create_engine(url, echo)
+        self.replicas = ReplicaSet([_create_engine(replica_url, echo) for replica_url in replica_urls],
+                                   sticky_seconds=settings.replica_sticky_seconds, primary=self.engine)
         self.session_factory = async_sessionmaker(
             bind=self.engine,
+            sync_session_class=AdmissionSession,
             autoflush=True,
             expire_on_commit=False,
             autocommit=False,
         )
+        # Сессии эндпоинтов чтения: без autoflush, изменения не фиксируются, SELECT идут на реплики.
+        self.read_session_factory = async_sessionmaker(
+            bind=self.engine,
+            sync_session_class=RoutingSession,
+            replicas=self.replicas if self.replicas.engines else None,
+            autoflush=False,
+            expire_on_commit=False,
+            autocommit=False,
+        )
+        # Общие реестры: одна сессия на задачу (запрос), удаляется в конце запроса.
+        self.scoped_session = async_scoped_session(session_factory=self.session_factory, scopefunc=current_task)
+        self.read_scoped_session = async_scoped_session(session_factory=self.read_session_factory,
+                                                        scopefunc=current_task)
+
+    @property
+    def engines(self):
+        return [self.engine, *self.replicas.engines]
+
+    async def warm_up(self):
+        """Открывает pool_size соединений каждого движка заранее, чтобы первые запросы после запуска
+        не ждали подключения."""
+        connections = await asyncio.gather(*(engine.connect() for engine in self.engines
+                                             for _ in range(settings.db_pool_size)))
+        for connection in connections:
+            await connection.close()
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
 
     def get_scoped_session(self):
-        session = async_scoped_session(
-            session_factory=self.session_factory,
-            scopefunc=current_task
-        )
-        return session
+        return self.scoped_session
 
     async def session_dependency(self) -> AsyncSession:
         async with self.session_factory() as session:
             yield session
-            await session.close()
 
-    async def scoped_session_dependency(self) -> AsyncSession:
-        session = self.get_scoped_session()
-        yield session
-        await session.close()
+    async def scoped_session_dependency(self, request: Request) -> AsyncSession:
+        admission_timeout.set(settings.db_pool_admission_timeout)
+        session = self.scoped_session()
+        try:
+            yield session
+        finally:
+            await self.scoped_session.remove()
+            # Чтение своих записей: после успешной записи чтения этого клиента какое-то время идут в основную базу.
+            if session.sync_session.committed:
+                self.replicas.mark_write(client_key(request))
+
+    async def read_session_dependency(self, request: Request) -> AsyncSession:
+        """Сессия для GET-эндпоинтов. При закрытии транзакция откатывается, соединение возвращается в пул.
+        Запросы идут на реплику, уже применившую последние изменения таблиц ответа (их время изменения
+        выставляет зависимость conditional), а в течение replica_sticky_seconds после записи того же
+        клиента - в основную базу. Тот же выбор действует для сессий потоковых ответов этого запроса."""
+        try:
+            admission_timeout.set(settings.db_pool_admission_timeout)
+            read_routing.set((self.replicas.is_sticky(client_key(request)),
+                              getattr(request.state, "data_modified", None)))
+            yield self.read_scoped_session()
+        finally:
+            await self.read_scoped_session.remove()
 
 
 db_helper = DataBaseHelper(
     url=settings.database_url,
-    echo=settings.db_echo
+    echo=settings.db_echo,
+    replica_urls=settings.database_replica_urls,
 )
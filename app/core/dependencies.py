@@ -1,4 +1,6 @@
-from fastapi import HTTPException, Header, status
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Header, Query, status
 
 from app.core.config import settings
 
@@ -6,3 +8,19 @@ from app.core.config import settings
 async def verify_api_key(x_api_key: str = Header(...)):
     if x_api_key != settings.api_key:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing API key!")
+
+
+@dataclass
+class PageParams:
+    limit: int
+    after: int | None
+
+
+async def page_params(limit: int = Query(settings.page_default_limit, ge=1, le=settings.page_max_limit,
+                                         description="Максимальное количество записей на странице"),
+                      after: int | None = Query(None, description="Курсор: next_cursor предыдущей страницы")):
+    return PageParams(limit=limit, after=after)
+
+
+async def expand_param(expand: bool = Query(False, description="Добавить в ответ здание и телефоны организации")):
+    return expand
@@ -0,0 +1,170 @@
+import time
+from bisect import bisect_left
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин. Счётчики - обычные числа: обработка запросов
+    идёт в одном потоке цикла событий, поэтому блокировки не нужны."""
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str = "") -> list[str]:
+        prefix = labels + "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class RouteMetrics:
+    def __init__(self, method: str, route: str):
+        self.labels = f'method="{method}",route="{_escape(route)}"'
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.statuses: dict[int, int] = {}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Метрики процесса в формате Prometheus. При нескольких воркерах каждый отдаёт свои значения."""
+
+    def __init__(self):
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+        self.in_flight = 0
+        self.db_query = Histogram(LATENCY_BUCKETS)
+        self.pool_wait = Histogram(LATENCY_BUCKETS)
+        self.pool_timeouts = 0
+        self.pool_rejections = 0
+
+    def observe_request(self, method: str, route: str, status_code: int, elapsed: float, size: int):
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[method, route] = RouteMetrics(method, route)
+        metrics.latency.observe(elapsed)
+        metrics.response_size.observe(size)
+        metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+
+    def render(self, pools: dict | None = None, cache_stats: dict[str, dict[str, int]] | None = None) -> str:
+        lines = [
+            "# HELP http_requests_in_flight Запросы, обрабатываемые в данный момент.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_requests_total Запросы по маршрутам и кодам ответа.",
+            "# TYPE http_requests_total counter",
+        ]
+        routes = sorted(self.routes.values(), key=lambda item: item.labels)
+        for route in routes:
+            for status_code, count in sorted(route.statuses.items()):
+                lines.append(f'http_requests_total{{{route.labels},status="{status_code}"}} {count}')
+        lines += ["# HELP http_request_duration_seconds Время обработки запроса.",
+                  "# TYPE http_request_duration_seconds histogram"]
+        for route in routes:
+            lines += route.latency.render("http_request_duration_seconds", route.labels)
+        lines += ["# HELP http_response_size_bytes Размер тела ответа.",
+                  "# TYPE http_response_size_bytes histogram"]
+        for route in routes:
+            lines += route.response_size.render("http_response_size_bytes", route.labels)
+        lines += ["# HELP db_query_duration_seconds Время выполнения SQL-запроса.",
+                  "# TYPE db_query_duration_seconds histogram"]
+        lines += self.db_query.render("db_query_duration_seconds")
+        lines += ["# HELP db_pool_wait_seconds Ожидание соединения из пула (включая открытие нового).",
+                  "# TYPE db_pool_wait_seconds histogram"]
+        lines += self.pool_wait.render("db_pool_wait_seconds")
+        lines += ["# HELP db_pool_timeouts_total Запросы соединения, не дождавшиеся его за pool_timeout.",
+                  "# TYPE db_pool_timeouts_total counter",
+                  f"db_pool_timeouts_total {self.pool_timeouts}",
+                  "# HELP db_pool_rejections_total Запросы, отклонённые с 503 из-за ожидания соединения.",
+                  "# TYPE db_pool_rejections_total counter",
+                  f"db_pool_rejections_total {self.pool_rejections}"]
+        pools = {name: pool for name, pool in (pools or {}).items() if hasattr(pool, "checkedout")}
+        for name, help_text, value in (
+                ("db_pool_size", "Размер пула.", lambda pool: pool.size()),
+                ("db_pool_checked_out", "Соединения, выданные сессиям.", lambda pool: pool.checkedout()),
+                ("db_pool_checked_in", "Свободные соединения в пуле.", lambda pool: pool.checkedin()),
+                ("db_pool_overflow", "Соединения сверх pool_size (отрицательное - ещё не открытые).",
+                 lambda pool: pool.overflow())):
+            if pools:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+                lines += [f'{name}{{engine="{engine}"}} {value(pool)}' for engine, pool in pools.items()]
+        if cache_stats is not None:
+            lines += ["# HELP response_cache_requests_total Обращения к кэшу ответов.",
+                      "# TYPE response_cache_requests_total counter"]
+            for namespace, counts in cache_stats.items():
+                for result, key in (("hit", "hits"), ("miss", "misses")):
+                    lines.append(f'response_cache_requests_total{{namespace="{namespace}",result="{result}"}} '
+                                 f'{counts[key]}')
+        return "\n".join(lines) + "\n"
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, который записывает время ожидания соединения в metrics.pool_wait."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.pool_timeouts += 1
+            raise
+        finally:
+            metrics.pool_wait.observe(time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """Время, размер ответа и код ответа по маршрутам (шаблон пути FastAPI, а не конкретный URL)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            metrics.in_flight -= 1
+            route = scope.get("route")
+            metrics.observe_request(scope["method"], route.path if route is not None else "<unmatched>",
+                                    status_code, time.perf_counter() - started, size)
+
+
+metrics = Metrics()
@@ -0,0 +1,143 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger("app.sql")
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_statement: str | None = None
+
+    def add(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_seconds += elapsed
+        if elapsed > self.slowest_seconds:
+            self.slowest_seconds = elapsed
+            self.slowest_statement = statement
+
+    def server_timing(self) -> str:
+        return (f'db;dur={self.total_seconds * 1000:.2f};desc="queries={self.count}", '
+                f'db-slowest;dur={self.slowest_seconds * 1000:.2f}')
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+# Пока выполняется EXPLAIN медленного запроса, новые медленные запросы не объясняются.
+_explaining: ContextVar[bool] = ContextVar("explaining_slow_query", default=False)
+
+
+@contextmanager
+def track_queries():
+    """Считает запросы к базе внутри блока (в том числе вне HTTP-запроса, например в бенчмарках)."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _explain(connection, statement: str, parameters) -> str:
+    dialect = connection.dialect.name
+    prefix = {"postgresql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN "}.get(dialect)
+    if prefix is None:
+        return f"EXPLAIN не поддерживается для {dialect}"
+    # Курсор драйвера не вызывает события SQLAlchemy, поэтому EXPLAIN не попадает в статистику запроса.
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join(" ".join(str(value) for value in row) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _log_slow_query(connection, statement: str, parameters, elapsed: float, executemany: bool):
+    plan = None
+    if (settings.slow_query_explain and not executemany and not _explaining.get()
+            and statement.lstrip()[:6].upper() in ("SELECT", "WITH")):
+        token = _explaining.set(True)
+        try:
+            plan = _explain(connection, statement, parameters)
+        except Exception as e:
+            plan = f"EXPLAIN не выполнен: {e}"
+        finally:
+            _explaining.reset(token)
+    logger.warning("slow_query duration_ms=%.1f statement=%r\n%s", elapsed * 1000, statement, plan or "",
+                   extra={"duration_ms": round(elapsed * 1000, 1), "statement": statement, "plan": plan})
+
+
+def instrument(engine: AsyncEngine):
+    """Подписывается на выполнение запросов движка: статистика текущего запроса и журнал медленных запросов."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - connection.info["query_started"].pop()
+        metrics.db_query.observe(elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.add(statement, elapsed)
+        if elapsed * 1000 >= settings.slow_query_ms:
+            _log_slow_query(connection, statement, parameters, elapsed, executemany)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+
+class QueryStatsMiddleware:
+    """Считает запросы к базе за HTTP-запрос: заголовок Server-Timing и строка журнала app.sql на каждый запрос.
+
+    Заголовок отражает запросы, выполненные до начала ответа; в журнал попадают и запросы
+    потоковых ответов.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = None
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timing = f"{stats.server_timing()}, app;dur={(time.perf_counter() - started) * 1000:.2f}"
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                if settings.query_stats_log:
+                    duration_ms = round((time.perf_counter() - started) * 1000, 1)
+                    logger.info("request method=%s path=%s status=%s duration_ms=%.1f queries=%d db_ms=%.1f "
+                                "slowest_ms=%.1f", scope["method"], scope["path"], status_code, duration_ms,
+                                stats.count, stats.total_seconds * 1000, stats.slowest_seconds * 1000,
+                                extra={"method": scope["method"], "path": scope["path"], "status": status_code,
+                                       "duration_ms": duration_ms, "queries": stats.count,
+                                       "db_ms": round(stats.total_seconds * 1000, 1),
+                                       "slowest_ms": round(stats.slowest_seconds * 1000, 1),
+                                       "slowest_statement": stats.slowest_statement})
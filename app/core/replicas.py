@@ -0,0 +1,129 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.sql.dml import UpdateBase
+
+from .admission import AdmissionSession
+
+logger = logging.getLogger(__name__)
+
+# Маршрутизация сессий чтения текущего запроса: (use_primary, fresh_since). Задаётся зависимостью сессии
+# чтения, поэтому её получают и сессии, которые открывают потоковые ответы.
+read_routing: ContextVar[tuple[bool, float | None]] = ContextVar("read_routing", default=(False, None))
+
+
+class ReplicaSet:
+    """Реплики для чтения: выбор по кругу среди доступных и периодическая проверка доступности.
+
+    Проверка заодно узнаёт, до какого момента реплика применила изменения основной базы (applied_until):
+    в Postgres - сравнением pg_last_wal_replay_lsn() реплики с pg_current_wal_lsn() основной базы,
+    снятым перед проверкой. Запрос читает только с реплики, которая применила последнюю запись в таблицы,
+    от которых зависит ответ, иначе - из основной базы. Без Postgres отставание не измерить,
+    и доступная реплика считается догнавшей основную базу на момент проверки.
+
+    Для чтения собственных записей запоминается время последней записи по ключу клиента (client_key):
+    в течение sticky_seconds после неё чтения этого клиента идут в основную базу. Время хранится
+    в памяти процесса.
+    """
+
+    def __init__(self, engines: list[AsyncEngine], sticky_seconds: float = 0.0, primary: AsyncEngine | None = None):
+        self.engines = engines
+        self.healthy = list(engines)
+        self.primary = primary
+        self.sticky_seconds = sticky_seconds
+        self.applied_until: dict[AsyncEngine, float] = {}
+        self._counter = itertools.count()
+        self._writes: dict[str, float] = {}
+
+    def choose(self, fresh_since: float | None = None) -> AsyncEngine | None:
+        """Реплика по кругу среди доступных; с fresh_since - только применившие изменения, сделанные
+        до этого момента (time.time())."""
+        healthy = self.healthy
+        if fresh_since is not None:
+            healthy = [engine for engine in healthy if self.applied_until.get(engine, 0.0) > fresh_since]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def mark_write(self, key: str | None):
+        if not self.engines or self.sticky_seconds <= 0 or key is None:
+            return
+        now = time.monotonic()
+        if len(self._writes) > 10000:
+            self._writes = {key: until for key, until in self._writes.items() if until > now}
+        self._writes[key] = now + self.sticky_seconds
+
+    def is_sticky(self, key: str | None) -> bool:
+        until = self._writes.get(key)
+        return until is not None and until > time.monotonic()
+
+    async def _primary_wal_position(self) -> str | None:
+        if self.primary is None or self.primary.dialect.name != "postgresql":
+            return None
+        async with self.primary.connect() as connection:
+            return (await connection.execute(text("SELECT pg_current_wal_lsn()::text"))).scalar_one()
+
+    async def _probe(self, engine: AsyncEngine, timeout: float, wal_position: str | None) -> tuple[bool, bool]:
+        """(доступна ли реплика, применила ли она WAL основной базы до wal_position)."""
+        try:
+            async with asyncio.timeout(timeout):
+                async with engine.connect() as connection:
+                    if wal_position is None:
+                        await connection.execute(text("SELECT 1"))
+                        return True, engine.dialect.name != "postgresql"
+                    applied = await connection.execute(text("SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"),
+                                                       {"lsn": wal_position})
+                    return True, bool(applied.scalar())
+        except Exception:
+            return False, False
+
+    async def check(self, timeout: float = 2.0):
+        # Всё, что зафиксировано в основной базе до started, лежит в WAL не дальше wal_position.
+        started = time.time()
+        try:
+            wal_position = await self._primary_wal_position()
+        except Exception:
+            logger.warning("Не удалось узнать позицию WAL основной базы", exc_info=True)
+            wal_position, started = None, 0.0
+        results = await asyncio.gather(*(self._probe(engine, timeout, wal_position) for engine in self.engines))
+        for engine, (ok, applied) in zip(self.engines, results):
+            if ok and applied:
+                self.applied_until[engine] = max(self.applied_until.get(engine, 0.0), started)
+        healthy = [engine for engine, (ok, _) in zip(self.engines, results) if ok]
+        if len(healthy) != len(self.healthy):
+            logger.warning("Доступно реплик: %s из %s", len(healthy), len(self.engines))
+        self.healthy = healthy
+
+    async def monitor(self, interval: float):
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+
+class RoutingSession(AdmissionSession):
+    """Сессия чтения: SELECT идут на реплику, выбранную при первом запросе сессии, а flush и
+    INSERT/UPDATE/DELETE - в основную базу. Параметры выбора берутся из read_routing: с fresh_since
+    выбирается реплика, применившая изменения до этого момента, с use_primary=True или без подходящих
+    реплик все запросы идут в основную базу."""
+
+    def __init__(self, replicas: ReplicaSet | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.replicas = replicas
+        self.use_primary, self.fresh_since = read_routing.get()
+        self._replica = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (self.use_primary or self.replicas is None or self._flushing
+                or isinstance(clause, UpdateBase)):
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        if self._replica is None:
+            replica = self.replicas.choose(self.fresh_since)
+            if replica is None:
+                return super().get_bind(mapper, clause=clause, **kwargs)
+            self._replica = replica.sync_engine
+        return self.admit(self._replica)
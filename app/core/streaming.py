@@ -0,0 +1,43 @@
+from typing import AsyncIterator, Callable
+
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import Select
+
+from app.core.config import settings
+from app.core.db_helper import db_helper
+
+
+async def stream_page(stmt: Select, schema: type[BaseModel]) -> AsyncIterator[bytes]:
+    """Отдаёт результат запроса в формате Page ({"items": [...], "next_cursor": null}) по частям,
+    читая строки серверным курсором пачками по stream_batch_size."""
+    async with db_helper.read_session_factory() as session:
+        result = await session.stream_scalars(stmt.execution_options(yield_per=settings.stream_batch_size))
+        yield b'{"items":['
+        separator = b""
+        async for partition in result.partitions():
+            yield separator + b",".join(schema.model_validate(item).model_dump_json().encode() for item in partition)
+            separator = b","
+        yield b'],"next_cursor":null}'
+
+
+async def stream_rows_page(stmt: Select, item: Callable) -> AsyncIterator[bytes]:
+    """Как stream_page, но для запросов колонок: item(row) превращает строку в dict, который кодируется orjson
+    без проверки схемой."""
+    async with db_helper.read_session_factory() as session:
+        result = await session.stream(stmt.execution_options(yield_per=settings.stream_batch_size))
+        yield b'{"items":['
+        separator = b""
+        async for partition in result.partitions():
+            yield separator + b",".join(orjson.dumps(item(row)) for row in partition)
+            separator = b","
+        yield b'],"next_cursor":null}'
+
+
+async def stream_ndjson(stmt: Select, item: Callable) -> AsyncIterator[bytes]:
+    """Отдаёт результат запроса колонок построчно в формате NDJSON через серверный курсор;
+    item(row) превращает строку в dict."""
+    async with db_helper.read_session_factory() as session:
+        result = await session.stream(stmt.execution_options(yield_per=settings.stream_batch_size))
+        async for partition in result.partitions():
+            yield b"".join(orjson.dumps(item(row)) + b"\n" for row in partition)
@@ -3,5 +3,6 @@ from app.models.organization import Organization
 from app.models.activity import Activity
 from app.models.building import Building
 from app.models.phone_numbers import PhoneNumber
+from app.models.table_version import table_version
 
-__all__ = ['Base', 'Organization', 'Activity', 'Building', 'PhoneNumber']
+__all__ = ['Base', 'Organization', 'Activity', 'Building', 'PhoneNumber', 'table_version']
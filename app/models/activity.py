@@ -15,7 +15,7 @@ class Activity(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
-    parent_id: Mapped[int | None] = mapped_column(ForeignKey("activity.id"))
+    parent_id: Mapped[int | None] = mapped_column(ForeignKey("activity.id"), index=True)
 
     parent: Mapped["Activity"] = relationship(remote_side="Activity.id", back_populates="children")
     children: Mapped[list["Activity"]] = relationship(back_populates="parent", cascade="all, delete-orphan")
@@ -1,8 +1,18 @@
-from sqlalchemy import Table, Column, ForeignKey, Integer
+from sqlalchemy import Table, Column, ForeignKey, Integer, Index
 from app.models import Base
 
 organization_activity = Table(
     "organization_activity",
     Base.metadata, Column("organization_id", ForeignKey("organization.id"), primary_key=True),
     Column("activity_id", ForeignKey("activity.id"), primary_key=True),
+    Index("ix_organization_activity_activity_id_organization_id", "activity_id", "organization_id"),
+)
+
+activity_closure = Table(
+    "activity_closure",
+    Base.metadata,
+    Column("ancestor_id", ForeignKey("activity.id", ondelete="CASCADE"), primary_key=True),
+    Column("descendant_id", ForeignKey("activity.id", ondelete="CASCADE"), primary_key=True),
+    Column("depth", Integer, nullable=False),
+    Index("ix_activity_closure_descendant_id", "descendant_id", "depth"),
 )
@@ -16,8 +16,8 @@ class Organization(Base):
     __tablename__ = "organization"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    name: Mapped[str] = mapped_column(String(200), nullable=False)
-    building_id: Mapped[int | None] = mapped_column(ForeignKey("building.id"))
+    name: Mapped[str] = mapped_column(String(200), nullable=False, index=True)
+    building_id: Mapped[int | None] = mapped_column(ForeignKey("building.id"), index=True)
 
     building: Mapped["Building"] = relationship(back_populates="organizations")
     activities: Mapped[list["Activity"]] = relationship(
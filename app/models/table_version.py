@@ -0,0 +1,12 @@
+from sqlalchemy import BigInteger, Column, String, Table
+
+from app.models import Base
+
+# Счётчики изменений таблиц, общие для всех процессов: их увеличивает каждая запись (TableVersions.bump),
+# а воркеры по ним узнают о чужих изменениях и перезагружают данные в памяти.
+table_version = Table(
+    "table_version",
+    Base.metadata,
+    Column("name", String(64), primary_key=True),
+    Column("version", BigInteger, nullable=False),
+)
@@ -1,15 +1,82 @@
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import delete, func, insert, literal, select, true, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from starlette import status
 
+from app.core.conditional import table_versions
+from app.core.cache import response_cache
+from app.core.config import settings
 from app.models import Activity
+from app.models.association_tables import activity_closure, organization_activity
+from app.repositories.activity_tree_cache import activity_tree_cache
+from app.repositories.common_dependencies import keyset, make_page
+from app.repositories.suggest_index import ACTIVITY, suggest_index
 from app.schemas.activity import ActivityUpdate, ActivityCreate
 
+# Тег кэша ответов, зависящих от формы дерева деятельностей (выборки по поддереву).
+ACTIVITY_TREE_CACHE_TAG = "activity_tree"
 
-async def get_all_activities(session: AsyncSession):
-    result = await session.execute(select(Activity).order_by(Activity.id))
-    return result.scalars().all()
+
+async def _attach_to_parent(session: AsyncSession, activity_id: int, parent_id: int | None):
+    # Все предки нового родителя становятся предками каждого узла перемещаемого поддерева.
+    if parent_id is None:
+        return
+    ancestors = aliased(activity_closure)
+    subtree = aliased(activity_closure)
+    await session.execute(insert(activity_closure).from_select(
+        ["ancestor_id", "descendant_id", "depth"],
+        select(ancestors.c.ancestor_id, subtree.c.descendant_id, ancestors.c.depth + subtree.c.depth + 1)
+        .select_from(ancestors.join(subtree, true()))
+        .where(ancestors.c.descendant_id == parent_id, subtree.c.ancestor_id == activity_id)))
+
+
+async def _detach_from_parent(session: AsyncSession, activity_id: int):
+    subtree_ids = select(activity_closure.c.descendant_id).where(activity_closure.c.ancestor_id == activity_id)
+    await session.execute(delete(activity_closure).where(
+        activity_closure.c.descendant_id.in_(subtree_ids),
+        activity_closure.c.ancestor_id.not_in(subtree_ids)))
+
+
+async def validate_activity_parent(session: AsyncSession, parent_id: int | None, activity_id: int | None = None):
+    """Проверяет, что узел (и его поддерево) можно повесить на parent_id, не создав цикл
+    и не превысив допустимую вложенность. Стоит один запрос к activity_closure."""
+    if parent_id is None:
+        return
+    parent_depth = (select(func.max(activity_closure.c.depth))
+                    .where(activity_closure.c.descendant_id == parent_id).scalar_subquery())
+    subtree_height = literal(0)
+    creates_cycle = literal(False)
+    if activity_id is not None:
+        subtree_height = (select(func.coalesce(func.max(activity_closure.c.depth), 0))
+                          .where(activity_closure.c.ancestor_id == activity_id).scalar_subquery())
+        creates_cycle = (select(activity_closure.c.ancestor_id)
+                         .where(activity_closure.c.ancestor_id == activity_id,
+                                activity_closure.c.descendant_id == parent_id).exists())
+    result = await session.execute(select(parent_depth, subtree_height, creates_cycle))
+    parent_depth, subtree_height, creates_cycle = result.one()
+    if parent_depth is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Parent activity with id {parent_id} not found")
+    if creates_cycle:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Деятельность нельзя сделать потомком самой себя")
+    if parent_depth + 1 + subtree_height >= settings.activity_max_levels:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Вложенность деятельностей ограничена {settings.activity_max_levels} уровнями")
+
+
+def all_activities_query(after: int | None = None):
+    stmt = select(Activity).order_by(Activity.id)
+    if after is not None:
+        stmt = stmt.where(Activity.id > after)
+    return stmt
+
+
+async def get_all_activities(session: AsyncSession, limit: int = settings.page_default_limit,
+                             after: int | None = None):
+    result = await session.execute(keyset(select(Activity), Activity.id, after, limit))
+    return make_page(result.scalars().all(), limit)
 
 
 async def get_activity_by_id(session: AsyncSession, activity_id: int):
@@ -22,6 +89,8 @@ async def get_activity_by_id(session: AsyncSession, activity_id: int):
                 detail=f"Activity with id {activity_id} not found"
             )
         return activity
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Ошибка при получении деятельности {activity_id}: {str(e)}")
@@ -29,14 +98,28 @@ async def get_activity_by_id(session: AsyncSession, activity_id: int):
 
 async def create_activity(session: AsyncSession, activity_in: ActivityCreate) -> Activity:
     try:
+        await validate_activity_parent(session, activity_in.parent_id)
         db_activity = Activity(
             name=activity_in.name,
             parent_id=activity_in.parent_id,
         )
         session.add(db_activity)
+        await session.flush()
+        await session.execute(insert(activity_closure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            union_all(
+                select(literal(db_activity.id), literal(db_activity.id), literal(0)),
+                select(activity_closure.c.ancestor_id, literal(db_activity.id), activity_closure.c.depth + 1)
+                .where(activity_closure.c.descendant_id == db_activity.parent_id))))
         await session.commit()
+        await table_versions.bump("activity")
+        activity_tree_cache.invalidate()
         await session.refresh(db_activity)
+        suggest_index.add(ACTIVITY, db_activity.id, db_activity.name)
+        await response_cache.invalidate(ACTIVITY_TREE_CACHE_TAG)
         return db_activity
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -44,19 +127,48 @@ async def create_activity(session: AsyncSession, activity_in: ActivityCreate) ->
 async def update_activity(session: AsyncSession, activity: Activity, activity_update: ActivityUpdate,
                           partial: bool = False):
     try:
-        for key, value in activity_update.model_dump(exclude_unset=partial).items():
+        old_parent_id = activity.parent_id
+        changes = activity_update.model_dump(exclude_unset=partial)
+        if changes.get("parent_id", old_parent_id) != old_parent_id:
+            await validate_activity_parent(session, changes["parent_id"], activity_id=activity.id)
+        for key, value in changes.items():
             setattr(activity, key, value)
+        if activity.parent_id != old_parent_id:
+            await session.flush()
+            await _detach_from_parent(session, activity.id)
+            await _attach_to_parent(session, activity.id, activity.parent_id)
         await session.commit()
+        await table_versions.bump("activity")
+        activity_tree_cache.invalidate()
         await session.refresh(activity)
+        suggest_index.add(ACTIVITY, activity.id, activity.name)
+        await response_cache.invalidate(f"activity:{activity.id}",
+                                        *([ACTIVITY_TREE_CACHE_TAG] if activity.parent_id != old_parent_id else []))
         return activity
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 async def delete_activity(session: AsyncSession, activity: Activity):
     try:
-        await session.delete(activity)
+        result = await session.execute(
+            select(activity_closure.c.descendant_id).where(activity_closure.c.ancestor_id == activity.id))
+        subtree_ids = set(result.scalars().all()) | {activity.id}
+        session.expunge(activity)
+        await session.execute(delete(organization_activity).where(organization_activity.c.activity_id.in_(subtree_ids)))
+        await session.execute(delete(activity_closure).where(activity_closure.c.descendant_id.in_(subtree_ids)))
+        await session.execute(delete(Activity).where(Activity.id.in_(subtree_ids)))
         await session.commit()
+        await table_versions.bump("activity", "organization")
+        activity_tree_cache.invalidate()
+        for activity_id in subtree_ids:
+            suggest_index.remove(ACTIVITY, activity_id)
+        await response_cache.invalidate(ACTIVITY_TREE_CACHE_TAG,
+                                        *(f"activity:{activity_id}" for activity_id in subtree_ids))
         return {"detail": "Activity deleted"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Activity
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ActivityNode:
+    id: int
+    name: str
+    parent_id: int | None
+
+
+class ActivityTreeCache:
+    """Копия дерева деятельностей в памяти процесса.
+
+    Для каждого узла заранее посчитаны потомки по уровням, поэтому поиск поддерева
+    не обращается к базе. Изменения, сделанные другими процессами, подхватывает IndexPoller.
+    """
+
+    def __init__(self):
+        self.nodes: dict[int, ActivityNode] = {}
+        self.children: dict[int | None, list[int]] = {}
+        self._levels: dict[int, list[list[int]]] = {}
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    def _build(self, rows):
+        nodes = {row.id: ActivityNode(row.id, row.name, row.parent_id) for row in rows}
+        children: dict[int | None, list[int]] = {}
+        for node in nodes.values():
+            children.setdefault(node.parent_id, []).append(node.id)
+        for ids in children.values():
+            ids.sort()
+        levels = {}
+        in_cycles = []
+        for node_id in nodes:
+            # Запись через API не допускает циклов, но строки, загруженные в обход API, не проверяются:
+            # уже посещённые узлы пропускаются, чтобы цикл не зациклил построение.
+            node_levels = [[node_id]]
+            seen = {node_id}
+            while True:
+                next_level = [child for parent in node_levels[-1] for child in children.get(parent, ())]
+                if not next_level:
+                    break
+                if seen.intersection(next_level):
+                    in_cycles.append(node_id)
+                    next_level = [child for child in next_level if child not in seen]
+                    if not next_level:
+                        break
+                seen.update(next_level)
+                node_levels.append(next_level)
+            levels[node_id] = node_levels
+        if in_cycles:
+            logger.warning("В дереве деятельностей есть циклы, затронуты узлы: %s", sorted(in_cycles)[:20])
+        self.nodes, self.children, self._levels = nodes, children, levels
+
+    async def _load(self, session: AsyncSession):
+        result = await session.execute(select(Activity.id, Activity.name, Activity.parent_id))
+        self._build(result.all())
+        self.loaded = True
+
+    async def load(self, session: AsyncSession):
+        async with self._lock:
+            await self._load(session)
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.loaded:
+            return
+        async with self._lock:
+            if not self.loaded:
+                await self._load(session)
+
+    def invalidate(self):
+        self.loaded = False
+
+    def descendants(self, activity_id: int, max_depth: int | None = None) -> list[int]:
+        levels = self._levels.get(activity_id, [])
+        if max_depth is not None:
+            levels = levels[:max_depth + 1]
+        return [node_id for level in levels for node_id in level]
+
+    async def get_subtree(self, session: AsyncSession, activity_id: int,
+                          max_depth: int | None = None) -> list[int] | None:
+        """Поддерево деятельности или None, если её нет в кэше. Неизвестный id кэш не перезагружает, иначе
+        запросы с несуществующими id перечитывали бы дерево из базы каждый раз: деятельности, созданные этим
+        процессом, попадают в кэш сразу, а созданные другими - после проверки версий IndexPoller."""
+        await self.ensure_loaded(session)
+        if activity_id not in self.nodes:
+            return None
+        return self.descendants(activity_id, max_depth)
+
+
+activity_tree_cache = ActivityTreeCache()
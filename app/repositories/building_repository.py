@@ -5,14 +5,27 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+from app.core.conditional import table_versions
+from app.core.cache import response_cache
+from app.core.config import settings
 from app.models import Building
-from app.repositories.common_dependencies import haversine_distance
-from app.schemas.building import BuildingUpdate, BuildingCreate
+from app.repositories.common_dependencies import bulk_write, keyset, make_page, upsert_rows
+from app.repositories.geo_filters import bounds_clause, radius_clause
+from app.repositories.spatial_index import building_index
+from app.schemas.building import BuildingUpdate, BuildingCreate, BuildingBulkItem
 
 
-async def get_all_buildings(session: AsyncSession):
-    result = await session.execute(select(Building).order_by(Building.id))
-    return result.scalars().all()
+def all_buildings_query(after: int | None = None):
+    stmt = select(Building).order_by(Building.id)
+    if after is not None:
+        stmt = stmt.where(Building.id > after)
+    return stmt
+
+
+async def get_all_buildings(session: AsyncSession, limit: int = settings.page_default_limit,
+                            after: int | None = None):
+    result = await session.execute(keyset(select(Building), Building.id, after, limit))
+    return make_page(result.scalars().all(), limit)
 
 
 async def get_building_by_id(session: AsyncSession, building_id: int) -> Building:
@@ -25,6 +38,8 @@ async def get_building_by_id(session: AsyncSession, building_id: int) -> Buildin
                 detail=f"Building with id {building_id} not found",
             )
         return building
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Ошибка при получении здания {building_id}: {str(e)}")
@@ -39,8 +54,12 @@ async def create_building(session: AsyncSession, building_in: BuildingCreate) ->
         )
         session.add(db_building)
         await session.commit()
+        await table_versions.bump("building")
         await session.refresh(db_building)
+        building_index.add(db_building.id, db_building.latitude, db_building.longitude)
         return db_building
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -51,17 +70,48 @@ async def update_building(session: AsyncSession, building: Building,
         for key, value in building_update.model_dump(exclude_unset=partial).items():
             setattr(building, key, value)
         await session.commit()
+        await table_versions.bump("building")
         await session.refresh(building)
+        building_index.add(building.id, building.latitude, building.longitude)
+        await response_cache.invalidate(f"building:{building.id}")
         return building
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 async def delete_building(session: AsyncSession, building: Building):
     try:
+        building_id = building.id
         await session.delete(building)
         await session.commit()
+        await table_versions.bump("building")
+        building_index.remove(building_id)
+        await response_cache.invalidate(f"building:{building_id}")
         return {"detail": "Building deleted"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+async def bulk_upsert_buildings(session: AsyncSession,
+                                items: list[tuple[int, BuildingBulkItem]]) -> tuple[dict[int, int], list[dict]]:
+    """Массовая вставка зданий; строки с id обновляют существующие. Возвращает id по индексам строк и ошибки."""
+    rows = {index: item.model_dump() for index, item in items}
+    ids, errors = {}, []
+    try:
+        async for written in bulk_write(session, list(rows.items()),
+                                        lambda s, chunk: upsert_rows(s, Building.__table__, chunk), errors):
+            for index, building_id in written:
+                ids[index] = building_id
+                building_index.add(building_id, rows[index]["latitude"], rows[index]["longitude"])
+            await table_versions.bump("building")
+            await response_cache.invalidate(*(f"building:{building_id}" for _, building_id in written))
+        return ids, errors
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -72,17 +122,24 @@ async def get_buildings_in_bounds(
         lat_max: float,
         lon_min: float,
         lon_max: float,
+        limit: int = settings.page_default_limit,
+        after: int | None = None,
 ):
     result = await session.execute(
-        select(Building).where(Building.latitude.between(lat_min, lat_max),
-                               Building.longitude.between(lon_min, lon_max)).order_by(Building.id))
-    return result.scalars().all()
+        keyset(select(Building).where(bounds_clause(lat_min, lat_max, lon_min, lon_max)), Building.id, after, limit))
+    return make_page(result.scalars().all(), limit)
 
 
 async def get_buildings_in_radius(session: AsyncSession,
-                                  center_lat: float, center_lon: float, radius_km: float):
-    result = await session.execute(select(Building))
-    buildings = result.scalars().all()
-    nearby_buildings = [b for b in buildings
-                        if haversine_distance(center_lat, center_lon, b.latitude, b.longitude) <= radius_km]
-    return nearby_buildings
+                                  center_lat: float, center_lon: float, radius_km: float,
+                                  limit: int = settings.page_default_limit, after: int | None = None):
+    if settings.radius_query_backend == "sql":
+        result = await session.execute(keyset(
+            select(Building).where(await radius_clause(session, center_lat, center_lon, radius_km)),
+            Building.id, after, limit))
+        return make_page(result.scalars().all(), limit)
+    await building_index.ensure_loaded(session)
+    building_ids = sorted(building_id for building_id in building_index.query_radius(center_lat, center_lon, radius_km)
+                          if after is None or building_id > after)[:limit + 1]
+    result = await session.execute(select(Building).where(Building.id.in_(building_ids)).order_by(Building.id))
+    return make_page(result.scalars().all(), limit)
@@ -1,6 +1,18 @@
 import math
 
+import orjson
+from sqlalchemy import Table, cast, func, insert, literal_column, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from app.core.config import settings
+
 EARTH_RADIUS_KM = 6371.0
+ID_CHUNK_SIZE = 10000
+
+_extensions: dict[str, bool] = {}
 
 
 def haversine_distance(latitude1, longitude1, latitude2, longitude2):
@@ -10,3 +22,182 @@ def haversine_distance(latitude1, longitude1, latitude2, longitude2):
     a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
     c = 2 * math.asin(math.sqrt(a))
     return EARTH_RADIUS_KM * c
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> tuple[float, float, float, float]:
+    """Прямоугольник (lat_min, lat_max, lon_min, lon_max), гарантированно содержащий круг радиуса radius_km.
+
+    Если круг пересекает 180-й меридиан, то lon_min > lon_max.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    lat_min = latitude - math.degrees(angular)
+    lat_max = latitude + math.degrees(angular)
+    if lat_min <= -90 or lat_max >= 90 or angular >= math.pi / 2:
+        return max(lat_min, -90.0), min(lat_max, 90.0), -180.0, 180.0
+    dlon = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(math.radians(latitude)))))
+    lon_min = longitude - dlon
+    lon_max = longitude + dlon
+    if lon_min < -180:
+        lon_min += 360
+    if lon_max > 180:
+        lon_max -= 360
+    return lat_min, lat_max, lon_min, lon_max
+
+
+def chunked(items, size: int = ID_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def keyset(stmt, id_column, after: int | None, limit: int):
+    if after is not None:
+        stmt = stmt.where(id_column > after)
+    return stmt.order_by(id_column).limit(limit + 1)
+
+
+def make_page(items, limit: int, key=lambda item: item.id) -> dict:
+    items = list(items)
+    next_cursor = key(items[limit - 1]) if len(items) > limit else None
+    return {"items": items[:limit], "next_cursor": next_cursor}
+
+
+class json_object(FunctionElement):
+    """JSON-объект из пар ключ-значение: json_build_object в Postgres, json_object в SQLite."""
+    inherit_cache = True
+
+    def __init__(self, **fields):
+        super().__init__(*(item for key, value in fields.items() for item in (literal_column(f"'{key}'"), value)))
+
+
+class json_array_agg(FunctionElement):
+    """Агрегат в JSON-массив: json_agg в Postgres (NULL для пустой группы), json_group_array в SQLite."""
+    inherit_cache = True
+
+
+@compiles(json_object)
+def _compile_json_object(element, compiler, **kw):
+    return f"json_object({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_object, "postgresql")
+def _compile_json_object_postgresql(element, compiler, **kw):
+    return f"json_build_object({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_array_agg)
+def _compile_json_array_agg(element, compiler, **kw):
+    return f"json_group_array({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_array_agg, "postgresql")
+def _compile_json_array_agg_postgresql(element, compiler, **kw):
+    return f"json_agg({compiler.process(element.clauses, **kw)})"
+
+
+def load_json(value):
+    """Значение JSON-агрегата из строки результата: драйверы отдают его текстом (asyncpg, aiosqlite)
+    или уже разобранным."""
+    if isinstance(value, (str, bytes)):
+        return orjson.loads(value)
+    return value
+
+
+async def extension_available(session: AsyncSession, name: str) -> bool:
+    """Установлено ли расширение Postgres. Результат запоминается на время жизни процесса."""
+    if name not in _extensions:
+        if session.bind.dialect.name != "postgresql":
+            _extensions[name] = False
+        else:
+            result = await session.execute(text("SELECT 1 FROM pg_extension WHERE extname = :name"), {"name": name})
+            _extensions[name] = result.scalar_one_or_none() is not None
+    return _extensions[name]
+
+
+async def existing_ids(session: AsyncSession, id_column, ids) -> set[int]:
+    found = set()
+    for chunk in chunked(set(ids)):
+        result = await session.execute(select(id_column).where(id_column.in_(chunk)))
+        found.update(result.scalars().all())
+    return found
+
+
+def _upsert_insert(session: AsyncSession, table: Table):
+    if session.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(table)
+
+
+async def _advance_sequence(session: AsyncSession, table: Table):
+    """Сдвигает последовательность id вперёд до max(id), если явно заданные id её обогнали: иначе следующая
+    обычная вставка получит занятый id. setval не откатывается вместе с транзакцией и не должен сдвигать
+    последовательность назад, ниже значений, уже выданных параллельным вставкам, поэтому вызывается только
+    когда max(id) больше последнего выданного значения."""
+    from sqlalchemy.dialects.postgresql import REGCLASS
+
+    sequence = func.pg_get_serial_sequence(table.name, "id")
+    max_id = select(func.max(table.c.id)).scalar_subquery()
+    last_value = func.coalesce(func.pg_sequence_last_value(cast(sequence, REGCLASS)), 0)
+    await session.execute(select(func.setval(sequence, max_id)).where(max_id > last_value))
+
+
+async def upsert_rows(session: AsyncSession, table: Table, rows: list[dict]) -> list[int]:
+    """Многострочная вставка с RETURNING id. Строки с заданным id обновляют существующие (ON CONFLICT (id) DO UPDATE).
+
+    Возвращает id в порядке строк.
+    """
+    ids: list[int | None] = [None] * len(rows)
+    new_rows = [(position, row) for position, row in enumerate(rows) if row.get("id") is None]
+    known_rows = [(position, row) for position, row in enumerate(rows) if row.get("id") is not None]
+    if new_rows:
+        result = await session.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            [{key: value for key, value in row.items() if key != "id"} for _, row in new_rows])
+        for (position, _), row_id in zip(new_rows, result.scalars()):
+            ids[position] = row_id
+    if known_rows:
+        stmt = _upsert_insert(session, table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={key: stmt.excluded[key] for key in known_rows[0][1] if key != "id"})
+        result = await session.execute(stmt.returning(table.c.id, sort_by_parameter_order=True),
+                                       [row for _, row in known_rows])
+        for (position, _), row_id in zip(known_rows, result.scalars()):
+            ids[position] = row_id
+        if session.bind.dialect.name == "postgresql":
+            await _advance_sequence(session, table)
+    return ids
+
+
+def _error_detail(error: Exception) -> str:
+    if isinstance(error, DBAPIError) and error.orig is not None:
+        return str(error.orig).strip().splitlines()[0]
+    return str(error)
+
+
+async def bulk_write(session: AsyncSession, items: list[tuple[int, dict]], write_chunk, errors: list[dict]):
+    """Записывает строки пачками по bulk_chunk_size, каждая пачка - отдельная транзакция.
+
+    write_chunk(session, rows) возвращает id записанных строк по порядку. Если пачка целиком не прошла,
+    её строки повторяются по одной в точках сохранения, а ошибки попадают в errors как {"index", "detail"}.
+    После фиксации каждой пачки выдаёт список пар (индекс строки, id).
+    """
+    for chunk in chunked(items, settings.bulk_chunk_size):
+        try:
+            ids = await write_chunk(session, [row for _, row in chunk])
+            await session.commit()
+            yield list(zip((index for index, _ in chunk), ids))
+            continue
+        except DBAPIError:
+            await session.rollback()
+        written = []
+        for index, row in chunk:
+            try:
+                async with session.begin_nested():
+                    written.append((index, (await write_chunk(session, [row]))[0]))
+            except DBAPIError as e:
+                errors.append({"index": index, "detail": _error_detail(e)})
+        await session.commit()
+        yield written
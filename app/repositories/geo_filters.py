@@ -0,0 +1,37 @@
+from sqlalchemy import Float, and_, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import Building
+from app.repositories.common_dependencies import EARTH_RADIUS_KM, bounding_box, extension_available
+
+
+def bounds_clause(lat_min: float, lat_max: float, lon_min: float, lon_max: float):
+    latitude = Building.latitude.between(lat_min, lat_max)
+    if lon_min <= lon_max:
+        return and_(latitude, Building.longitude.between(lon_min, lon_max))
+    return and_(latitude, or_(Building.longitude >= lon_min, Building.longitude <= lon_max))
+
+
+def haversine_sql(latitude: float, longitude: float):
+    dlat = func.radians(Building.latitude - latitude, type_=Float)
+    dlon = func.radians(Building.longitude - longitude, type_=Float)
+    a = (func.power(func.sin(dlat / 2), 2)
+         + func.cos(func.radians(latitude)) * func.cos(func.radians(Building.latitude))
+         * func.power(func.sin(dlon / 2), 2))
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(a))
+
+
+async def earthdistance_available(session: AsyncSession) -> bool:
+    return await extension_available(session, "earthdistance")
+
+
+async def radius_clause(session: AsyncSession, center_lat: float, center_lon: float, radius_km: float):
+    if settings.radius_query_use_earthdistance and await earthdistance_available(session):
+        center = func.ll_to_earth(center_lat, center_lon)
+        point = func.ll_to_earth(Building.latitude, Building.longitude)
+        radius_m = radius_km * 1000
+        return and_(func.earth_box(center, radius_m).op("@>")(point),
+                    func.earth_distance(center, point) <= radius_m)
+    return and_(bounds_clause(*bounding_box(center_lat, center_lon, radius_km)),
+                haversine_sql(center_lat, center_lon) <= radius_km)
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.cache import response_cache
+from app.core.conditional import table_versions
+from app.repositories.activity_tree_cache import activity_tree_cache
+from app.repositories.name_search_index import organization_name_index
+from app.repositories.spatial_index import building_index
+from app.repositories.suggest_index import suggest_index
+
+logger = logging.getLogger(__name__)
+
+
+class IndexPoller:
+    """Перезагружает данные в памяти процесса (индексы и дерево деятельностей), когда их таблицы меняет
+    другой процесс.
+
+    Каждая запись, в том числе загрузчика app.tools.load, увеличивает общий счётчик таблицы в table_version.
+    Поллер раз в index_poll_seconds читает эти счётчики одним запросом и перезагружает только то, что зависит
+    от изменившихся таблиц. Записи этого процесса уже учтены (table_versions.applied) и перезагрузку не вызывают.
+    Заодно меняются версии таблиц для ETag и очищается кэш ответов в памяти процесса, иначе воркер отдавал бы
+    304 и закэшированные ответы по старым данным. Запись в обход приложения (например, через psql) счётчик
+    не меняет: после неё его нужно увеличить вручную.
+    """
+
+    def __init__(self, indexes: list[tuple[str, object, tuple[str, ...]]]):
+        self.indexes = indexes
+
+    async def load(self, session: AsyncSession, *names: str):
+        """Загружает индексы names (все, если не заданы). Версии снимаются до загрузки: запись,
+        попавшая между ними, перезагрузит индекс ещё раз."""
+        table_versions.applied.update(await table_versions.fetch_shared(session))
+        for name, index, _ in self.indexes:
+            if not names or name in names:
+                await index.load(session)
+
+    async def refresh_if_stale(self, session: AsyncSession) -> list[str]:
+        versions = await table_versions.fetch_shared(session)
+        changed = {table for table, version in versions.items() if table_versions.applied.get(table, 0) != version}
+        if not changed:
+            return []
+        table_versions.mark_changed(*changed)
+        await response_cache.forget_local()
+        reloaded = []
+        for name, index, tables in self.indexes:
+            if index.loaded and changed.intersection(tables):
+                await index.load(session)
+                reloaded.append(name)
+        for table in changed:
+            table_versions.applied[table] = versions[table]
+        return reloaded
+
+    async def poll(self, session_factory: async_sessionmaker, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with session_factory() as session:
+                    reloaded = await self.refresh_if_stale(session)
+                if reloaded:
+                    logger.info("Данные в памяти перезагружены: %s", ", ".join(reloaded))
+            except Exception:
+                logger.warning("Не удалось проверить версии таблиц", exc_info=True)
+
+
+index_poller = IndexPoller([
+    ("activity_tree", activity_tree_cache, ("activity",)),
+    ("building", building_index, ("building",)),
+    ("suggest", suggest_index, ("organization", "activity")),
+    ("organization_name", organization_name_index, ("organization",)),
+])
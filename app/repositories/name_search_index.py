@@ -0,0 +1,129 @@
+import asyncio
+from collections import Counter
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import Organization
+
+
+def normalize_name(value: str) -> str:
+    return " ".join(value.casefold().replace("ё", "е").split())
+
+
+def trigrams(value: str, pad_end: bool = True) -> set[str]:
+    """Триграммы слов строки, как в pg_trgm: слово дополняется двумя пробелами слева и одним справа.
+
+    С pad_end=False последнее слово не дополняется справа - так ищутся строки, начинающиеся с value.
+    """
+    words = value.split()
+    grams = set()
+    for position, word in enumerate(words):
+        padded = "  " + word + (" " if pad_end or position < len(words) - 1 else "")
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NgramIndex:
+    """Инвертированный индекс по триграммам названий организаций в памяти процесса.
+
+    Используется для поиска по названию, когда база не поддерживает pg_trgm.
+    Оценка совпадения, как и similarity в pg_trgm, - доля общих триграмм; для нечёткого поиска,
+    как и word_similarity, - доля триграмм запроса, найденных в названии.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.5):
+        self.similarity_threshold = similarity_threshold
+        self._names: dict[int, str] = {}
+        self._grams: dict[int, set[str]] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._lock = asyncio.Lock()
+        self.loaded = False
+
+    def add(self, item_id: int, name: str):
+        self.remove(item_id)
+        normalized = normalize_name(name)
+        grams = trigrams(normalized)
+        self._names[item_id] = normalized
+        self._grams[item_id] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(item_id)
+
+    def remove(self, item_id: int):
+        self._names.pop(item_id, None)
+        for gram in self._grams.pop(item_id, ()):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(item_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def clear(self):
+        self._names.clear()
+        self._grams.clear()
+        self._postings.clear()
+
+    def _similarity(self, query_grams: set[str], item_id: int) -> float:
+        grams = self._grams[item_id]
+        shared = len(query_grams & grams)
+        return shared / (len(query_grams) + len(grams) - shared)
+
+    def _containing(self, grams: set[str]) -> set[int]:
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        if not postings:
+            return set(self._names)
+        found = set(postings[0])
+        for ids in postings[1:]:
+            found &= ids
+        return found
+
+    def search(self, query: str, mode: str = "substring") -> list[tuple[int, float]]:
+        """Пары (id, оценка), отсортированные по убыванию оценки, затем по id."""
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        query_grams = trigrams(normalized)
+        if mode == "prefix":
+            candidates = self._containing(trigrams(normalized, pad_end=False))
+            matched = [item_id for item_id in candidates if self._names[item_id].startswith(normalized)]
+        elif mode == "substring":
+            inner = {gram for gram in query_grams if " " not in gram}
+            candidates = self._containing(inner)
+            matched = [item_id for item_id in candidates if normalized in self._names[item_id]]
+        else:
+            counts = Counter(item_id for gram in query_grams for item_id in self._postings.get(gram, ()))
+            hits = [(item_id, shared / len(query_grams)) for item_id, shared in counts.items()
+                    if shared / len(query_grams) >= self.similarity_threshold]
+            hits.sort(key=lambda hit: (-hit[1], hit[0]))
+            return hits
+        hits = [(item_id, self._similarity(query_grams, item_id)) for item_id in matched]
+        hits.sort(key=lambda hit: (-hit[1], hit[0]))
+        return hits
+
+    def _build(self, rows) -> "NgramIndex":
+        index = NgramIndex(self.similarity_threshold)
+        for organization_id, name in rows:
+            index.add(organization_id, name)
+        return index
+
+    async def _load(self, session: AsyncSession):
+        # Новый индекс строится в отдельном потоке и подменяет старый целиком, как в SpatialGridIndex.
+        rows = (await session.execute(select(Organization.id, Organization.name))).all()
+        index = await asyncio.to_thread(self._build, rows)
+        self._names, self._grams, self._postings = index._names, index._grams, index._postings
+        self.loaded = True
+
+    async def load(self, session: AsyncSession):
+        async with self._lock:
+            await self._load(session)
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.loaded:
+            return
+        async with self._lock:
+            if not self.loaded:
+                await self._load(session)
+
+
+organization_name_index = NgramIndex(similarity_threshold=settings.search_similarity_threshold)
@@ -1,22 +1,122 @@
+import bisect
 import math
+from operator import itemgetter
 from typing import List
 
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import and_, delete, exists, func, insert, or_, select
 from sqlalchemy.orm import selectinload
 from starlette import status
 
-from app.models import Organization, Activity, Building
+from app.core.conditional import table_versions
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.models import Organization, Activity, Building, PhoneNumber
 from app.models.association_tables import organization_activity
-from app.repositories.common_dependencies import haversine_distance
-from app.schemas.organization import OrganizationUpdate, OrganizationCreate, OrganizationRead
+from app.repositories.activity_tree_cache import activity_tree_cache
+from app.repositories.common_dependencies import (bulk_write, chunked, existing_ids, extension_available,
+                                                  json_array_agg, json_object, keyset, load_json, make_page,
+                                                  upsert_rows)
+from app.repositories.geo_filters import bounds_clause, radius_clause
+from app.repositories.name_search_index import organization_name_index
+from app.repositories.spatial_index import building_index
+from app.repositories.suggest_index import ORGANIZATION, suggest_index
+from app.schemas.organization import OrganizationUpdate, OrganizationCreate, OrganizationBulkItem
 
+_item_id = itemgetter("id")
+
+
+def organization_cache_tags(organization) -> set[str]:
+    """Теги кэша ответов, упоминающих организацию: она сама, её здание и виды деятельности."""
+    tags = {f"organization:{organization.id}", f"building:{organization.building_id}"}
+    tags.update(f"activity:{activity.id}" for activity in organization.activities or ())
+    return tags
+
+
+def organization_row_tags(item: dict) -> set[str]:
+    """Теги кэша для организации в виде словаря из organization_item."""
+    tags = {f"organization:{item['id']}", f"building:{item['building_id']}"}
+    tags.update(f"activity:{activity['id']}" for activity in item["activities"])
+    return tags
+
+
+def organization_rows_query(expand: bool = False):
+    """Организации строками без ORM-объектов одним запросом: id, name, building_id и виды деятельности
+    JSON-массивом (коррелированный подзапрос вместо selectinload). С expand=True ещё здание JSON-объектом
+    и телефоны JSON-массивом."""
+    activities = (select(json_array_agg(json_object(id=Activity.id, name=Activity.name, parent_id=Activity.parent_id)))
+                  .select_from(organization_activity.join(Activity,
+                                                          Activity.id == organization_activity.c.activity_id))
+                  .where(organization_activity.c.organization_id == Organization.id)
+                  .scalar_subquery())
+    stmt = select(Organization.id, Organization.name, Organization.building_id, activities.label("activities"))
+    if expand:
+        building = (select(json_object(id=Building.id, address=Building.address, latitude=Building.latitude,
+                                       longitude=Building.longitude))
+                    .where(Building.id == Organization.building_id)
+                    # Выборки по области и радиусу сами соединяются со зданиями: без этого подзапрос
+                    # скоррелировал бы и building и остался бы без FROM.
+                    .correlate_except(Building)
+                    .scalar_subquery())
+        phones = (select(json_array_agg(json_object(id=PhoneNumber.id, number=PhoneNumber.number,
+                                                    organization_id=PhoneNumber.organization_id)))
+                  .where(PhoneNumber.organization_id == Organization.id)
+                  .scalar_subquery())
+        stmt = stmt.add_columns(building.label("building"), phones.label("phones"))
+    return stmt
+
+
+def organization_item(row, expand: bool = False) -> dict:
+    """Словарь в форме OrganizationRead (OrganizationExpandedRead при expand=True) из строки
+    organization_rows_query. Данные из базы не проверяются схемой."""
+    item = {"id": row[0], "name": row[1], "building_id": row[2], "activities": load_json(row[3]) or []}
+    if expand:
+        item["building"] = load_json(row[4])
+        item["phones"] = load_json(row[5]) or []
+    return item
+
+
+def expanded_organization_item(row) -> dict:
+    return organization_item(row, expand=True)
+
+
+async def _organization_items(session: AsyncSession, stmt, expand: bool = False) -> list[dict]:
+    result = await session.execute(stmt)
+    return [organization_item(row, expand) for row in result.all()]
+
+
+async def _organization_item(session: AsyncSession, stmt, expand: bool) -> dict | None:
+    row = (await session.execute(stmt)).first()
+    return organization_item(row, expand) if row is not None else None
+
+
+def all_organizations_query(after: int | None = None, expand: bool = False):
+    stmt = organization_rows_query(expand).order_by(Organization.id)
+    if after is not None:
+        stmt = stmt.where(Organization.id > after)
+    return stmt
+
+
+def export_organizations_query(building_id: int | None = None, activity_ids: list[int] | None = None,
+                               bounds: tuple[float, float, float, float] | None = None):
+    stmt = organization_rows_query(expand=True).order_by(Organization.id)
+    if building_id is not None:
+        stmt = stmt.where(Organization.building_id == building_id)
+    if activity_ids is not None:
+        stmt = stmt.where(Organization.id.in_(
+            select(organization_activity.c.organization_id)
+            .where(organization_activity.c.activity_id.in_(activity_ids))))
+    if bounds is not None:
+        stmt = stmt.where(Organization.building_id.in_(select(Building.id).where(bounds_clause(*bounds))))
+    return stmt
 
-async def get_all_organizations(session: AsyncSession):
-    result = await session.execute(
-        select(Organization).options(selectinload(Organization.activities)).order_by(Organization.id))
-    return result.scalars().all()
+
+async def get_all_organizations(session: AsyncSession, limit: int = settings.page_default_limit,
+                                after: int | None = None, expand: bool = False):
+    items = await _organization_items(session, keyset(organization_rows_query(expand), Organization.id, after, limit),
+                                      expand)
+    return make_page(items, limit, key=_item_id)
 
 
 async def get_organization_by_id(session: AsyncSession, organization_id: int) -> Organization:
@@ -30,22 +130,43 @@ async def get_organization_by_id(session: AsyncSession, organization_id: int) ->
                 detail=f"Organization with id {organization_id} not found"
             )
         return organization
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Ошибка при получении организации {organization_id}: {str(e)}")
 
 
-async def get_organization_by_name(session: AsyncSession, organization_name: str) -> Organization:
+async def read_organization_by_id(session: AsyncSession, organization_id: int, expand: bool = False) -> dict:
+    """Организация для ответа эндпоинта чтения: словарь из одного запроса (см. organization_rows_query)."""
     try:
-        result = await session.execute(select(Organization).options(selectinload(Organization.activities)).where(
-            Organization.name == organization_name))
-        organization = result.scalar_one_or_none()
+        organization = await _organization_item(
+            session, organization_rows_query(expand).where(Organization.id == organization_id), expand)
+        if not organization:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Organization with id {organization_id} not found"
+            )
+        return organization
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail=f"Ошибка при получении организации {organization_id}: {str(e)}")
+
+
+async def get_organization_by_name(session: AsyncSession, organization_name: str, expand: bool = False) -> dict:
+    try:
+        organization = await _organization_item(session, organization_rows_query(expand).where(
+            Organization.name == organization_name).order_by(Organization.id).limit(1), expand)
         if not organization:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Organization with name {organization_name} not found"
             )
         return organization
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Ошибка при получении организации {organization_name}: {str(e)}")
@@ -58,69 +179,152 @@ async def create_organization(session: AsyncSession, organization_in: Organizati
         db_org.activities = result.scalars().all()
     session.add(db_org)
     await session.commit()
+    await table_versions.bump("organization")
     await session.refresh(db_org)
     await session.refresh(db_org, attribute_names=["activities"])
+    if organization_name_index.loaded:
+        organization_name_index.add(db_org.id, db_org.name)
+    suggest_index.add(ORGANIZATION, db_org.id, db_org.name)
+    await response_cache.invalidate(*organization_cache_tags(db_org))
     return db_org
 
 
 async def update_organization(session: AsyncSession, organization: Organization,
                               organization_update: OrganizationUpdate, partial: bool = False) -> Organization:
     try:
+        old_tags = organization_cache_tags(organization)
         for key, value in organization_update.model_dump(exclude_unset=partial).items():
             setattr(organization, key, value)
         await session.commit()
+        await table_versions.bump("organization")
         await session.refresh(organization)
+        if organization_name_index.loaded:
+            organization_name_index.add(organization.id, organization.name)
+        suggest_index.add(ORGANIZATION, organization.id, organization.name)
+        await response_cache.invalidate(*old_tags | organization_cache_tags(organization))
         return organization
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 async def delete_organization(session: AsyncSession, organization: Organization):
     try:
+        organization_id = organization.id
+        tags = organization_cache_tags(organization)
         await session.delete(organization)
         await session.commit()
+        await table_versions.bump("organization", "phone_number")
+        organization_name_index.remove(organization_id)
+        suggest_index.remove(ORGANIZATION, organization_id)
+        await response_cache.invalidate(*tags)
         return {"detail": "Organization deleted"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-async def get_all_organization_located_in_building(session: AsyncSession, building_id: int):
-    result = await session.execute(
-        select(Organization).options(selectinload(Organization.activities)).where(
-            Organization.building_id == building_id).order_by(Organization.id))
-    return result.scalars().all()
+async def _write_organizations(session: AsyncSession, rows: list[dict]) -> list[int]:
+    ids = await upsert_rows(session, Organization.__table__,
+                            [{key: row[key] for key in ("id", "name", "building_id")} for row in rows])
+    replaced = [organization_id for organization_id, row in zip(ids, rows)
+                if row["id"] is not None and row["activity_ids"] is not None]
+    if replaced:
+        await session.execute(delete(organization_activity)
+                              .where(organization_activity.c.organization_id.in_(replaced)))
+    links = [{"organization_id": organization_id, "activity_id": activity_id}
+             for organization_id, row in zip(ids, rows) for activity_id in dict.fromkeys(row["activity_ids"] or ())]
+    if links:
+        await session.execute(insert(organization_activity), links)
+    return ids
 
 
-async def get_descendants(session: AsyncSession, activity_id: int, visited=None) -> List[int]:
-    if visited is None:
-        visited = set()
-    if activity_id in visited:
-        return []
-    visited.add(activity_id)
+async def bulk_upsert_organizations(session: AsyncSession, items: list[tuple[int, OrganizationBulkItem]]
+                                    ) -> tuple[dict[int, int], list[dict]]:
+    """Массовая вставка организаций; строки с id обновляют существующие (и заменяют их виды деятельности,
+    если передан activity_ids). Здания и виды деятельности всех строк проверяются заранее одним запросом.
+    Возвращает id по индексам строк и ошибки."""
+    ids, errors = {}, []
+    try:
+        building_ids = await existing_ids(session, Building.id,
+                                          {item.building_id for _, item in items if item.building_id is not None})
+        activity_ids = await existing_ids(session, Activity.id,
+                                          {activity_id for _, item in items for activity_id in item.activity_ids or ()})
+        rows = {}
+        for index, item in items:
+            missing = [activity_id for activity_id in item.activity_ids or () if activity_id not in activity_ids]
+            if item.building_id is not None and item.building_id not in building_ids:
+                errors.append({"index": index, "detail": f"Building with id {item.building_id} not found"})
+            elif missing:
+                errors.append({"index": index, "detail": f"Activities with ids {missing} not found"})
+            else:
+                rows[index] = item.model_dump()
 
-    descendants = [activity_id]
-    result = await session.execute(select(Activity).where(Activity.parent_id == activity_id))
-    children = result.scalars().all()
-    for child in children:
-        descendants.extend(await get_descendants(session, child.id, visited))
-    return descendants
+        stale_tags = set()
+        for chunk in chunked(row["id"] for row in rows.values() if row["id"] is not None):
+            result = await session.execute(select(Organization).options(selectinload(Organization.activities))
+                                           .where(Organization.id.in_(chunk)))
+            for organization in result.scalars().all():
+                stale_tags |= organization_cache_tags(organization)
+        session.expunge_all()
 
+        async for written in bulk_write(session, list(rows.items()), _write_organizations, errors):
+            tags = set()
+            for index, organization_id in written:
+                ids[index] = organization_id
+                row = rows[index]
+                if organization_name_index.loaded:
+                    organization_name_index.add(organization_id, row["name"])
+                suggest_index.add(ORGANIZATION, organization_id, row["name"])
+                tags |= {f"organization:{organization_id}", f"building:{row['building_id']}"}
+                tags.update(f"activity:{activity_id}" for activity_id in row["activity_ids"] or ())
+            await table_versions.bump("organization")
+            await response_cache.invalidate(*tags, *stale_tags)
+            stale_tags = set()
+        return ids, errors
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+async def get_all_organization_located_in_building(session: AsyncSession, building_id: int,
+                                                   limit: int = settings.page_default_limit,
+                                                   after: int | None = None, expand: bool = False):
+    items = await _organization_items(session, keyset(
+        organization_rows_query(expand).where(Organization.building_id == building_id), Organization.id, after,
+        limit), expand)
+    return make_page(items, limit, key=_item_id)
+
+
+async def get_descendants(session: AsyncSession, activity_id: int) -> List[int]:
+    return await activity_tree_cache.get_subtree(session, activity_id) or []
 
-async def get_organizations_by_activity(session: AsyncSession, activity_id: int):
+
+async def _get_organizations_by_activity_subtree(session: AsyncSession, activity_id: int, limit: int,
+                                                 after: int | None = None, max_depth: int | None = None,
+                                                 expand: bool = False):
+    all_activity_ids = await activity_tree_cache.get_subtree(session, activity_id, max_depth=max_depth)
+    if all_activity_ids is None:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    items = await _organization_items(session, keyset(
+        organization_rows_query(expand)
+        .where(Organization.id.in_(
+            select(organization_activity.c.organization_id)
+            .where(organization_activity.c.activity_id.in_(all_activity_ids)))),
+        Organization.id, after, limit), expand)
+    return make_page(items, limit, key=_item_id)
+
+
+async def get_organizations_by_activity(session: AsyncSession, activity_id: int,
+                                        limit: int = settings.page_default_limit, after: int | None = None,
+                                        expand: bool = False):
     try:
-        result = await session.execute(select(Activity).where(Activity.id == activity_id))
-        activity = result.scalar_one_or_none()
-        if not activity:
-            raise HTTPException(status_code=404, detail="Activity not found")
-        all_activity_ids = await get_descendants(session, activity_id)
-        result = await session.execute(
-            select(Organization)
-            .join(organization_activity, Organization.id == organization_activity.c.organization_id)
-            .options(selectinload(Organization.activities))
-            .where(organization_activity.c.activity_id.in_(all_activity_ids))
-            .order_by(Organization.id))
-        orgs = result.scalars().all()
-        return [OrganizationRead.model_validate(o) for o in orgs]
+        return await _get_organizations_by_activity_subtree(session, activity_id, limit, after, expand=expand)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -130,56 +334,181 @@ async def get_organizations_in_bounds(
         lat_min: float,
         lat_max: float,
         lon_min: float,
-        lon_max: float):
-    result = await session.execute(
-        select(Organization).join(Organization.building).options(selectinload(Organization.activities)).where(
-            Building.latitude.between(lat_min, lat_max),
-            Building.longitude.between(lon_min, lon_max)))
-    return result.scalars().all()
+        lon_max: float,
+        limit: int = settings.page_default_limit,
+        after: int | None = None,
+        expand: bool = False):
+    items = await _organization_items(session, keyset(
+        organization_rows_query(expand).join(Organization.building)
+        .where(bounds_clause(lat_min, lat_max, lon_min, lon_max)), Organization.id, after, limit), expand)
+    return make_page(items, limit, key=_item_id)
 
 
 async def get_organizations_in_radius(session: AsyncSession,
-                                      center_lat: float, center_lon: float, radius_km: float, ):
-    result = await session.execute(
-        select(Organization).options(selectinload(Organization.building), selectinload(Organization.activities))
-        .join(Organization.building))
-    organizations = result.scalars().unique().all()
-    nearby_orgs = [org for org in organizations
-                   if org.building and haversine_distance(center_lat, center_lon, org.building.latitude,
-                                                          org.building.longitude) <= radius_km]
-    return nearby_orgs
+                                      center_lat: float, center_lon: float, radius_km: float,
+                                      limit: int = settings.page_default_limit, after: int | None = None,
+                                      expand: bool = False):
+    if settings.radius_query_backend == "sql":
+        items = await _organization_items(session, keyset(
+            organization_rows_query(expand).join(Organization.building)
+            .where(await radius_clause(session, center_lat, center_lon, radius_km)), Organization.id, after, limit),
+            expand)
+        return make_page(items, limit, key=_item_id)
+    await building_index.ensure_loaded(session)
+    nearby_orgs = []
+    for building_ids in chunked(building_index.query_radius(center_lat, center_lon, radius_km)):
+        nearby_orgs.extend(await _organization_items(session, keyset(
+            organization_rows_query(expand).where(Organization.building_id.in_(building_ids)), Organization.id,
+            after, limit), expand))
+    nearby_orgs.sort(key=_item_id)
+    return make_page(nearby_orgs[:limit + 1], limit, key=_item_id)
 
 
-async def get_descendants_limited(session: AsyncSession, activity_id: int, max_depth: int = 3) -> list[int]:
-    descendants = [activity_id]
-    current_level = [activity_id]
-
-    for _ in range(max_depth):
-        result = await session.execute(
-            select(Activity.id).where(Activity.parent_id.in_(current_level))
-        )
-        next_level = [row[0] for row in result.all()]
-        if not next_level:
+async def get_nearest_organizations(session: AsyncSession, center_lat: float, center_lon: float, k: int,
+                                    activity_ids: list[int] | None = None, radius_km: float | None = None,
+                                    expand: bool = False):
+    all_activity_ids = None
+    if activity_ids:
+        all_activity_ids = set()
+        for activity_id in activity_ids:
+            subtree = await activity_tree_cache.get_subtree(session, activity_id)
+            if subtree is None:
+                raise HTTPException(status_code=404, detail=f"Activity {activity_id} not found")
+            all_activity_ids.update(subtree)
+        # Без организаций в поддеревьях обход колец прошёл бы весь индекс зданий впустую.
+        has_organizations = await session.execute(select(exists().where(
+            organization_activity.c.activity_id.in_(all_activity_ids))))
+        if not has_organizations.scalar():
+            return []
+    await building_index.ensure_loaded(session)
+
+    found: list[tuple[float, dict]] = []
+    batch_size = max(2 * k, 16)
+    nearest = building_index.iter_nearest(center_lat, center_lon)
+    while len(found) < k:
+        distances = {}
+        for building_id, distance in nearest:
+            if radius_km is not None and distance > radius_km:
+                break
+            distances[building_id] = distance
+            if len(distances) >= batch_size:
+                break
+        if not distances:
             break
-        descendants.extend(next_level)
-        current_level = next_level
+        stmt = organization_rows_query(expand).where(Organization.building_id.in_(list(distances)))
+        if all_activity_ids is not None:
+            stmt = stmt.where(Organization.id.in_(
+                select(organization_activity.c.organization_id)
+                .where(organization_activity.c.activity_id.in_(all_activity_ids))))
+        found.extend((distances[item["building_id"]], item)
+                     for item in await _organization_items(session, stmt, expand))
+        if len(distances) < batch_size:
+            break
+        batch_size *= 2
 
-    return descendants
+    found.sort(key=lambda item: (item[0], item[1]["id"]))
+    return [{**item, "distance_km": distance} for distance, item in found[:k]]
 
 
-async def get_organizations_by_activity_limited(session: AsyncSession, activity_id: int, max_depth: int = 3):
+async def get_descendants_limited(session: AsyncSession, activity_id: int, max_depth: int = 3) -> list[int]:
+    return await activity_tree_cache.get_subtree(session, activity_id, max_depth=max_depth) or []
+
+
+async def get_organizations_by_activity_limited(session: AsyncSession, activity_id: int, max_depth: int = 3,
+                                                limit: int = settings.page_default_limit, after: int | None = None,
+                                                expand: bool = False):
     try:
-        result = await session.execute(select(Activity).where(Activity.id == activity_id))
-        activity = result.scalar_one_or_none()
-        if not activity:
-            raise HTTPException(status_code=404, detail="Activity not found")
-        all_activity_ids = await get_descendants_limited(session, activity_id, max_depth=max_depth)
-        result = await session.execute(
-            select(Organization)
-            .join(organization_activity, Organization.id == organization_activity.c.organization_id)
-            .where(organization_activity.c.activity_id.in_(all_activity_ids))
-            .options(selectinload(Organization.activities))
-            .order_by(Organization.id))
-        return result.scalars().all()
+        return await _get_organizations_by_activity_subtree(session, activity_id, limit, after, max_depth=max_depth,
+                                                            expand=expand)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def _use_trigram_search(session: AsyncSession) -> bool:
+    if settings.search_backend == "trgm":
+        return True
+    if settings.search_backend == "memory":
+        return False
+    return await extension_available(session, "pg_trgm")
+
+
+async def _trigram_search(session: AsyncSession, query: str, mode: str, after: tuple[float, int] | None, limit: int,
+                          expand: bool):
+    normalized = query.lower()
+    name = func.lower(Organization.name)
+    score = func.similarity(name, normalized)
+    if mode == "prefix":
+        condition = name.like(_escape_like(normalized) + "%", escape="\\")
+    elif mode == "substring":
+        condition = name.like("%" + _escape_like(normalized) + "%", escape="\\")
+    else:
+        await session.execute(select(func.set_config("pg_trgm.word_similarity_threshold",
+                                                     str(settings.search_similarity_threshold), True)))
+        score = func.word_similarity(normalized, name)
+        condition = name.op("%>")(normalized)
+    if after is not None:
+        after_score, after_id = after
+        condition = and_(condition, or_(score < after_score, and_(score == after_score, Organization.id > after_id)))
+    result = await session.execute(
+        organization_rows_query(expand).add_columns(score).where(condition)
+        .order_by(score.desc(), Organization.id).limit(limit))
+    return [(organization_item(row, expand), row[-1]) for row in result.all()]
+
+
+async def _index_search(session: AsyncSession, query: str, mode: str, after: tuple[float, int] | None, limit: int,
+                        expand: bool):
+    await organization_name_index.ensure_loaded(session)
+    ranked = organization_name_index.search(query, mode)
+    start = 0
+    if after is not None:
+        start = bisect.bisect_right(ranked, (-after[0], after[1]), key=lambda hit: (-hit[1], hit[0]))
+    ranked = ranked[start:start + limit]
+    if not ranked:
+        return []
+    items = await _organization_items(session, organization_rows_query(expand).where(
+        Organization.id.in_([organization_id for organization_id, _ in ranked])), expand)
+    organizations = {item["id"]: item for item in items}
+    return [(organizations[organization_id], score) for organization_id, score in ranked
+            if organization_id in organizations]
+
+
+def search_cursor(score: float, organization_id: int) -> str:
+    return f"{score!r}:{organization_id}"
+
+
+def parse_search_cursor(cursor: str | None) -> tuple[float, int] | None:
+    if cursor is None:
+        return None
+    try:
+        score, organization_id = cursor.split(":")
+        return float(score), int(organization_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                            detail=f"Некорректный курсор поиска: {cursor}")
+
+
+async def search_organizations(session: AsyncSession, query: str, mode: str = "substring",
+                               limit: int = settings.page_default_limit, cursor: str | None = None,
+                               expand: bool = False):
+    """Поиск по названию с ранжированием по похожести. Выдача упорядочена по (оценка по убыванию, id),
+    курсор - оценка и id последней записи страницы ("оценка:id")."""
+    after = parse_search_cursor(cursor)
+    try:
+        if await _use_trigram_search(session):
+            hits = await _trigram_search(session, query, mode, after, limit + 1, expand)
+        else:
+            hits = await _index_search(session, query, mode, after, limit + 1, expand)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail=f"Ошибка при поиске организаций по названию {query}: {str(e)}")
+    items = [{**organization, "score": score} for organization, score in hits[:limit]]
+    next_cursor = search_cursor(items[-1]["score"], items[-1]["id"]) if len(hits) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
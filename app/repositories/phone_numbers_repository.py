@@ -3,17 +3,30 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from app.models import PhoneNumber
-from app.schemas.phone_numbers import PhoneNumberCreate, PhoneNumberUpdate
+from app.core.cache import response_cache
+from app.core.conditional import table_versions
+from app.core.config import settings
+from app.models import Organization, PhoneNumber
+from app.repositories.common_dependencies import bulk_write, chunked, existing_ids, keyset, make_page, upsert_rows
+from app.schemas.phone_numbers import PhoneNumberCreate, PhoneNumberUpdate, PhoneNumberBulkItem
 
 
-async def get_all_phone_numbers(session: AsyncSession):
-    result = await session.execute(select(PhoneNumber).order_by(PhoneNumber.id))
-    return result.scalars().all()
+def all_phone_numbers_query(after: int | None = None):
+    stmt = select(PhoneNumber).order_by(PhoneNumber.id)
+    if after is not None:
+        stmt = stmt.where(PhoneNumber.id > after)
+    return stmt
+
+
+async def get_all_phone_numbers(session: AsyncSession, limit: int = settings.page_default_limit,
+                                after: int | None = None):
+    result = await session.execute(keyset(select(PhoneNumber), PhoneNumber.id, after, limit))
+    return make_page(result.scalars().all(), limit)
 
 
 async def get_phone_number_by_id(session: AsyncSession, phone_number_id: int):
-    phone_number = await session.execute(select(PhoneNumber).where(PhoneNumber.id == phone_number_id))
+    result = await session.execute(select(PhoneNumber).where(PhoneNumber.id == phone_number_id))
+    phone_number = result.scalar_one_or_none()
     if not phone_number:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -30,8 +43,13 @@ async def create_phone_number(session: AsyncSession, phone_number_in: PhoneNumbe
         )
         session.add(db_phone_number)
         await session.commit()
+        await table_versions.bump("phone_number")
         await session.refresh(db_phone_number)
+        # Телефоны входят в развёрнутые ответы организаций (expand=true).
+        await response_cache.invalidate(f"organization:{db_phone_number.organization_id}")
         return db_phone_number
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -39,19 +57,62 @@ async def create_phone_number(session: AsyncSession, phone_number_in: PhoneNumbe
 async def update_phone_number(session: AsyncSession, phone_number: PhoneNumber,
                               phone_number_update: PhoneNumberUpdate, partial: bool = False):
     try:
+        old_organization_id = phone_number.organization_id
         for key, value in phone_number_update.model_dump(exclude_unset=partial).items():
             setattr(phone_number, key, value)
         await session.commit()
+        await table_versions.bump("phone_number")
         await session.refresh(phone_number)
+        await response_cache.invalidate(f"organization:{old_organization_id}",
+                                        f"organization:{phone_number.organization_id}")
         return phone_number
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 async def delete_phone_number(session: AsyncSession, phone_number: PhoneNumber):
     try:
+        organization_id = phone_number.organization_id
         await session.delete(phone_number)
         await session.commit()
+        await table_versions.bump("phone_number")
+        await response_cache.invalidate(f"organization:{organization_id}")
         return {"detail": "Phone number deleted"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+async def bulk_upsert_phone_numbers(session: AsyncSession,
+                                    items: list[tuple[int, PhoneNumberBulkItem]]) -> tuple[dict[int, int], list[dict]]:
+    """Массовая вставка телефонов; строки с id обновляют существующие. Возвращает id по индексам строк и ошибки."""
+    ids, errors = {}, []
+    try:
+        organization_ids = await existing_ids(session, Organization.id, {item.organization_id for _, item in items})
+        rows = []
+        for index, item in items:
+            if item.organization_id not in organization_ids:
+                errors.append({"index": index, "detail": f"Organization with id {item.organization_id} not found"})
+            else:
+                rows.append((index, item.model_dump()))
+        # Телефоны, которые переносятся в другую организацию, нужно убрать и из ответов прежней.
+        stale_tags = set()
+        for chunk in chunked(row["id"] for _, row in rows if row["id"] is not None):
+            result = await session.execute(select(PhoneNumber.organization_id).where(PhoneNumber.id.in_(chunk)))
+            stale_tags.update(f"organization:{organization_id}" for organization_id in result.scalars())
+        rows_by_index = dict(rows)
+        async for written in bulk_write(session, rows,
+                                        lambda s, chunk: upsert_rows(s, PhoneNumber.__table__, chunk), errors):
+            ids.update(written)
+            await table_versions.bump("phone_number")
+            await response_cache.invalidate(*stale_tags, *(f"organization:{rows_by_index[index]['organization_id']}"
+                                                           for index, _ in written))
+            stale_tags = set()
+        return ids, errors
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
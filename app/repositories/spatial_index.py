@@ -0,0 +1,182 @@
+import asyncio
+import math
+
+import numpy as np
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import Building
+from app.repositories.common_dependencies import EARTH_RADIUS_KM, bounding_box
+from app.repositories.vectorized_distance import haversine_vector, within_radius
+
+
+class SpatialGridIndex:
+    """Сетка по (широта, долгота) с ячейками фиксированного размера в градусах.
+
+    Хранит координаты зданий в памяти процесса, чтобы поиск по радиусу
+    просматривал только ячейки, пересекающие ограничивающий прямоугольник.
+    """
+
+    def __init__(self, cell_deg: float):
+        self.cell_deg = cell_deg
+        self._lon_cells = math.ceil(360 / cell_deg)
+        self._lon_cell_deg = 360 / self._lon_cells
+        self._points: dict[int, tuple[float, float]] = {}
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        self._lock = asyncio.Lock()
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return (math.floor(latitude / self.cell_deg),
+                math.floor((longitude + 180) / self._lon_cell_deg) % self._lon_cells)
+
+    def add(self, point_id: int, latitude: float, longitude: float):
+        self.remove(point_id)
+        self._points[point_id] = (latitude, longitude)
+        self._cells.setdefault(self._cell(latitude, longitude), set()).add(point_id)
+
+    def remove(self, point_id: int):
+        point = self._points.pop(point_id, None)
+        if point is None:
+            return
+        key = self._cell(*point)
+        cell = self._cells.get(key)
+        if cell is not None:
+            cell.discard(point_id)
+            if not cell:
+                del self._cells[key]
+
+    def clear(self):
+        self._points.clear()
+        self._cells.clear()
+
+    def _lon_cells_between(self, lon_min: float, lon_max: float) -> list[int]:
+        if lon_min > lon_max:
+            lon_max += 360
+        first = math.floor((lon_min + 180) / self._lon_cell_deg)
+        last = math.floor((lon_max + 180) / self._lon_cell_deg)
+        if last - first + 1 >= self._lon_cells:
+            return list(range(self._lon_cells))
+        return [lon_cell % self._lon_cells for lon_cell in range(first, last + 1)]
+
+    def _candidate_cells(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float):
+        lat_cells = range(math.floor(lat_min / self.cell_deg), math.floor(lat_max / self.cell_deg) + 1)
+        lon_cells = self._lon_cells_between(lon_min, lon_max)
+        if len(lat_cells) * len(lon_cells) > len(self._cells):
+            lon_cells = set(lon_cells)
+            for (lat_cell, lon_cell), cell in self._cells.items():
+                if lat_cell in lat_cells and lon_cell in lon_cells:
+                    yield cell
+            return
+        for lat_cell in lat_cells:
+            for lon_cell in lon_cells:
+                cell = self._cells.get((lat_cell, lon_cell))
+                if cell:
+                    yield cell
+
+    def query_radius(self, latitude: float, longitude: float, radius_km: float) -> list[int]:
+        candidates = [point_id for cell in self._candidate_cells(*bounding_box(latitude, longitude, radius_km))
+                      for point_id in cell]
+        if not candidates:
+            return []
+        points = [self._points[point_id] for point_id in candidates]
+        latitudes = [point[0] for point in points]
+        longitudes = [point[1] for point in points]
+        return [candidates[i] for i in within_radius(latitude, longitude, latitudes, longitudes, radius_km)]
+
+    def _ring_cells(self, lat_cell: int, lon_cell: int, ring: int):
+        if ring == 0:
+            yield lat_cell, lon_cell
+            return
+        for lon_offset in range(-ring, ring + 1):
+            yield lat_cell - ring, lon_cell + lon_offset
+            yield lat_cell + ring, lon_cell + lon_offset
+        for lat_offset in range(-ring + 1, ring):
+            yield lat_cell + lat_offset, lon_cell - ring
+            yield lat_cell + lat_offset, lon_cell + ring
+
+    def _ring_lower_bound_km(self, latitude: float, ring: int) -> float:
+        # Нижняя граница расстояния до точек за пределами уже просмотренных колец.
+        lat_bound = EARTH_RADIUS_KM * math.radians(ring * self.cell_deg)
+        if 2 * ring + 1 >= self._lon_cells:
+            return lat_bound
+        far_lat = min(90.0, abs(latitude) + (ring + 1) * self.cell_deg)
+        dlon = min(math.pi, math.radians(ring * self._lon_cell_deg))
+        a = math.cos(math.radians(latitude)) * math.cos(math.radians(far_lat)) * math.sin(dlon / 2) ** 2
+        lon_bound = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(max(0.0, min(1.0, a))))
+        return min(lat_bound, lon_bound)
+
+    def _distances(self, latitude: float, longitude: float, point_ids: list[int]) -> np.ndarray:
+        points = [self._points[point_id] for point_id in point_ids]
+        return haversine_vector(latitude, longitude, [p[0] for p in points], [p[1] for p in points])
+
+    def iter_nearest(self, latitude: float, longitude: float):
+        """Выдаёт пары (id, расстояние в км) в порядке возрастания расстояния, расширяя кольца ячеек."""
+        lat_cell, lon_cell = self._cell(latitude, longitude)
+        lat_cells = range(math.floor(-90 / self.cell_deg), math.floor(90 / self.cell_deg) + 1)
+        visited_cells = set()
+        pending_ids = np.empty(0, dtype=np.int64)
+        pending_distances = np.empty(0, dtype=np.float64)
+        seen = 0
+        ring = 0
+        while True:
+            ring_ids = []
+            if seen < len(self._points) and (1 if ring == 0 else 8 * ring) > len(self._cells):
+                ring_ids = [point_id for key, cell in self._cells.items() if key not in visited_cells
+                            for point_id in cell]
+                visited_cells.update(self._cells)
+            elif seen < len(self._points):
+                for ring_lat, ring_lon in self._ring_cells(lat_cell, lon_cell, ring):
+                    key = ring_lat, ring_lon % self._lon_cells
+                    if ring_lat not in lat_cells or key in visited_cells:
+                        continue
+                    visited_cells.add(key)
+                    ring_ids.extend(self._cells.get(key, ()))
+            if ring_ids:
+                seen += len(ring_ids)
+                pending_ids = np.concatenate((pending_ids, np.asarray(ring_ids, dtype=np.int64)))
+                pending_distances = np.concatenate(
+                    (pending_distances, self._distances(latitude, longitude, ring_ids)))
+            bound = math.inf if seen >= len(self._points) else self._ring_lower_bound_km(latitude, ring)
+            ready = pending_distances <= bound
+            if ready.any():
+                ready_ids, ready_distances = pending_ids[ready], pending_distances[ready]
+                pending_ids, pending_distances = pending_ids[~ready], pending_distances[~ready]
+                order = np.lexsort((ready_ids, ready_distances))
+                yield from zip(ready_ids[order].tolist(), ready_distances[order].tolist())
+            if seen >= len(self._points) and pending_ids.size == 0:
+                return
+            ring += 1
+
+    def _build(self, rows) -> tuple[dict[int, tuple[float, float]], dict[tuple[int, int], set[int]]]:
+        points, cells = {}, {}
+        for building_id, latitude, longitude in rows:
+            points[building_id] = (latitude, longitude)
+            cells.setdefault(self._cell(latitude, longitude), set()).add(building_id)
+        return points, cells
+
+    async def _load(self, session: AsyncSession):
+        # Новая сетка строится в отдельном потоке и подменяет старую целиком: построение по миллиону точек
+        # не останавливает цикл событий, а запросы до подмены отвечают по старой сетке.
+        rows = (await session.execute(select(Building.id, Building.latitude, Building.longitude))).all()
+        self._points, self._cells = await asyncio.to_thread(self._build, rows)
+        self.loaded = True
+
+    async def load(self, session: AsyncSession):
+        async with self._lock:
+            await self._load(session)
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.loaded:
+            return
+        async with self._lock:
+            if not self.loaded:
+                await self._load(session)
+
+
+building_index = SpatialGridIndex(cell_deg=settings.spatial_index_cell_deg)
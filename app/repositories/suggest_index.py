@@ -0,0 +1,162 @@
+import asyncio
+import heapq
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import Activity, Organization
+from app.repositories.name_search_index import normalize_name
+
+ORGANIZATION = "organization"
+ACTIVITY = "activity"
+
+
+class SuggestIndex:
+    """Отсортированный массив ключей для подсказок по началу названия, без обращений к базе.
+
+    Ключами служат нормализованные хвосты названий, начинающиеся с каждого слова, поэтому
+    "копы" находит "Рога и Копыта". Для каждого ключа заранее посчитана оценка: вес типа
+    (организация или деятельность) минус штрафы за длину названия и за совпадение не с первого слова.
+    Префиксы с большим числом совпадений запоминаются вместе с лучшими результатами.
+    """
+
+    def __init__(self, scan_limit: int = 512, cache_size: int = 10000):
+        self.scan_limit = scan_limit
+        self.cache_size = cache_size
+        self._keys: list[tuple[str, str, int]] = []
+        self._scores: dict[tuple[str, str, int], float] = {}
+        self._entries: dict[tuple[str, int], list[tuple[str, str, int]]] = {}
+        self._names: dict[tuple[str, int], str] = {}
+        self._top: OrderedDict[str, list[tuple[float, str, int]]] = OrderedDict()
+        self._lock = asyncio.Lock()
+        self.loaded = False
+
+    @staticmethod
+    def _weight(kind: str) -> float:
+        return settings.suggest_organization_weight if kind == ORGANIZATION else settings.suggest_activity_weight
+
+    def _entity_keys(self, kind: str, item_id: int, name: str) -> list[tuple[tuple[str, str, int], float]]:
+        normalized = normalize_name(name)
+        base = self._weight(kind) - settings.suggest_length_penalty * len(normalized)
+        keys = []
+        start = 0
+        for position, word in enumerate(normalized.split(" ")):
+            score = base if position == 0 else base - settings.suggest_inner_word_penalty
+            keys.append(((normalized[start:], kind, item_id), score))
+            start += len(word) + 1
+        return keys
+
+    def add(self, kind: str, item_id: int, name: str):
+        self.remove(kind, item_id)
+        for key in self._register(kind, item_id, name):
+            insort(self._keys, key)
+            for length in range(1, len(key[0]) + 1):
+                top = self._top.get(key[0][:length])
+                if top is not None:
+                    self._merge(top, self._scores[key], kind, item_id)
+
+    def _register(self, kind: str, item_id: int, name: str) -> list[tuple[str, str, int]]:
+        entries = []
+        for key, score in self._entity_keys(kind, item_id, name):
+            if key not in self._scores:
+                self._scores[key] = score
+                entries.append(key)
+        self._entries[kind, item_id] = entries
+        self._names[kind, item_id] = name
+        return entries
+
+    def remove(self, kind: str, item_id: int):
+        entries = self._entries.pop((kind, item_id), None)
+        if entries is None:
+            return
+        del self._names[kind, item_id]
+        for key in entries:
+            position = bisect_left(self._keys, key)
+            del self._keys[position]
+            del self._scores[key]
+            for length in range(1, len(key[0]) + 1):
+                self._top.pop(key[0][:length], None)
+
+    def clear(self):
+        self._keys.clear()
+        self._scores.clear()
+        self._entries.clear()
+        self._names.clear()
+        self._top.clear()
+
+    def _merge(self, top: list[tuple[float, str, int]], score: float, kind: str, item_id: int):
+        for position, (old_score, old_kind, old_id) in enumerate(top):
+            if (old_kind, old_id) == (kind, item_id):
+                if score <= old_score:
+                    return
+                del top[position]
+                break
+        top.append((score, kind, item_id))
+        top.sort(key=lambda item: (-item[0], item[1], item[2]))
+        del top[settings.suggest_max_k:]
+
+    def _best(self, lo: int, hi: int, k: int) -> list[tuple[float, str, int]]:
+        best: dict[tuple[str, int], float] = {}
+        for key in self._keys[lo:hi]:
+            entity = key[1], key[2]
+            score = self._scores[key]
+            if score > best.get(entity, float("-inf")):
+                best[entity] = score
+        return heapq.nsmallest(k, ((score, kind, item_id) for (kind, item_id), score in best.items()),
+                               key=lambda item: (-item[0], item[1], item[2]))
+
+    def suggest(self, prefix: str, k: int = 10) -> list[dict]:
+        normalized = normalize_name(prefix)
+        if not normalized:
+            return []
+        top = self._top.get(normalized)
+        if top is not None:
+            self._top.move_to_end(normalized)
+        else:
+            lo = bisect_left(self._keys, (normalized,))
+            hi = bisect_left(self._keys, (normalized + "\U0010ffff",), lo)
+            if hi - lo <= self.scan_limit:
+                top = self._best(lo, hi, k)
+            else:
+                top = self._top[normalized] = self._best(lo, hi, settings.suggest_max_k)
+                if len(self._top) > self.cache_size:
+                    self._top.popitem(last=False)
+        return [{"kind": kind, "id": item_id, "name": self._names[kind, item_id], "score": round(score, 4)}
+                for score, kind, item_id in top[:k]]
+
+    def _build(self, rows: dict[str, list]) -> "SuggestIndex":
+        index = SuggestIndex(self.scan_limit, self.cache_size)
+        for kind, items in rows.items():
+            for item_id, name in items:
+                index._keys.extend(index._register(kind, item_id, name))
+        index._keys.sort()
+        return index
+
+    async def _load(self, session: AsyncSession):
+        # Новый индекс строится в отдельном потоке и подменяет старый целиком, когда прочитаны обе таблицы:
+        # подсказки во время перезагрузки отвечают по старым данным, а не по пустому индексу.
+        rows = {}
+        for kind, model in ((ORGANIZATION, Organization), (ACTIVITY, Activity)):
+            rows[kind] = (await session.execute(select(model.id, model.name))).all()
+        index = await asyncio.to_thread(self._build, rows)
+        self._keys, self._scores, self._entries, self._names, self._top = (
+            index._keys, index._scores, index._entries, index._names, index._top)
+        self.loaded = True
+
+    async def load(self, session: AsyncSession):
+        async with self._lock:
+            await self._load(session)
+
+    async def ensure_loaded(self, session_factory):
+        if self.loaded:
+            return
+        async with self._lock:
+            if not self.loaded:
+                async with session_factory() as session:
+                    await self._load(session)
+
+
+suggest_index = SuggestIndex()
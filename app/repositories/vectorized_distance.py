@@ -0,0 +1,44 @@
+import numpy as np
+
+from app.repositories.common_dependencies import EARTH_RADIUS_KM
+
+
+def _haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_vector(latitude: float, longitude: float, latitudes, longitudes) -> np.ndarray:
+    """Расстояния (км) от одной точки до массива точек."""
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon2 = np.radians(np.asarray(longitudes, dtype=np.float64))
+    return _haversine(lat1, lon1, lat2, lon2)
+
+
+def haversine_matrix(center_latitudes, center_longitudes, latitudes, longitudes) -> np.ndarray:
+    """Матрица расстояний (км) формы (число центров, число точек) за один проход."""
+    lat1 = np.radians(np.asarray(center_latitudes, dtype=np.float64))[:, np.newaxis]
+    lon1 = np.radians(np.asarray(center_longitudes, dtype=np.float64))[:, np.newaxis]
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))[np.newaxis, :]
+    lon2 = np.radians(np.asarray(longitudes, dtype=np.float64))[np.newaxis, :]
+    return _haversine(lat1, lon1, lat2, lon2)
+
+
+def within_radius(latitude: float, longitude: float, latitudes, longitudes, radius_km: float) -> np.ndarray:
+    """Индексы точек, попадающих в радиус."""
+    return np.flatnonzero(haversine_vector(latitude, longitude, latitudes, longitudes) <= radius_km)
+
+
+def nearest_k(latitude: float, longitude: float, latitudes, longitudes, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Индексы и расстояния k ближайших точек, отсортированные по возрастанию расстояния."""
+    distances = haversine_vector(latitude, longitude, latitudes, longitudes)
+    if k <= 0 or distances.size == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+    if k < distances.size:
+        indices = np.argpartition(distances, k - 1)[:k]
+    else:
+        indices = np.arange(distances.size)
+    order = np.argsort(distances[indices], kind="stable")
+    indices = indices[order]
+    return indices, distances[indices]
@@ -11,6 +11,13 @@ class BuildingCreate(BuildingBase):
     pass
 
 
+class BuildingBulkItem(BaseModel):
+    id: int | None = None
+    address: str
+    latitude: float
+    longitude: float
+
+
 class BuildingRead(BaseModel):
     id: int
     address: str
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class BulkError(BaseModel):
+    index: int
+    detail: str
+
+
+class BulkResult(BaseModel):
+    ids: list[int | None]
+    errors: list[BulkError] = []
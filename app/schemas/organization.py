@@ -1,6 +1,8 @@
 from pydantic import BaseModel
 
 from app.schemas.activity import ActivityRead
+from app.schemas.building import BuildingRead
+from app.schemas.phone_numbers import PhoneNumberRead
 
 
 class OrganizationBase(BaseModel):
@@ -13,6 +15,13 @@ class OrganizationCreate(OrganizationBase):
     pass
 
 
+class OrganizationBulkItem(BaseModel):
+    id: int | None = None
+    name: str
+    building_id: int | None = None
+    activity_ids: list[int] | None = None
+
+
 class OrganizationRead(BaseModel):
     id: int
     name: str
@@ -23,6 +32,21 @@ class OrganizationRead(BaseModel):
         from_attributes = True
 
 
+class OrganizationExpandedRead(OrganizationRead):
+    """Организация со зданием и телефонами (поля есть в ответе только при expand=true)."""
+    building_id: int | None
+    building: BuildingRead | None = None
+    phones: list[PhoneNumberRead] | None = None
+
+
+class OrganizationNearestRead(OrganizationExpandedRead):
+    distance_km: float
+
+
+class OrganizationSearchRead(OrganizationExpandedRead):
+    score: float
+
+
 class OrganizationUpdate(BaseModel):
     name: str | None = None
     building_id: int | None = None
@@ -0,0 +1,16 @@
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: int | None = None
+
+
+class SearchPage(BaseModel, Generic[T]):
+    """Страница выдачи поиска: next_cursor - оценка и id последней записи ("оценка:id")."""
+    items: list[T]
+    next_cursor: str | None = None
@@ -10,6 +10,12 @@ class PhoneNumberCreate(PhoneNumberBase):
     pass
 
 
+class PhoneNumberBulkItem(BaseModel):
+    id: int | None = None
+    number: str
+    organization_id: int
+
+
 class PhoneNumberRead(BaseModel):
     id: int
     number: str
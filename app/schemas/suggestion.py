@@ -0,0 +1,10 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class SuggestionRead(BaseModel):
+    kind: Literal["organization", "activity"]
+    id: int
+    name: str
+    score: float
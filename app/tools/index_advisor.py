@@ -0,0 +1,189 @@
+"""Проверка планов запросов репозиториев на последовательное сканирование таблиц.
+
+Выполняет типовые чтения из репозиториев на текущей базе (DATABASE_URL), перехватывает
+отправленные SQL-запросы и для каждого выполняет EXPLAIN. На Postgres план строится
+с enable_seqscan = off, поэтому Seq Scan в отчёте означает, что подходящего индекса нет.
+
+    python -m app.tools.index_advisor [--verbose]
+
+Код возврата 1, если найден хотя бы один запрос с последовательным сканированием.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import dataclass, field
+
+from fastapi import HTTPException
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.core.db_helper import db_helper
+from app.models import Activity, Building, Organization, PhoneNumber
+from app.repositories import (activity_repository, building_repository, organization_repository,
+                              phone_numbers_repository)
+from app.repositories.activity_tree_cache import activity_tree_cache
+from app.repositories.common_dependencies import extension_available
+from app.repositories.name_search_index import organization_name_index
+from app.repositories.spatial_index import building_index
+
+
+@dataclass
+class CapturedQuery:
+    label: str
+    statement: str
+    parameters: tuple | dict
+    seq_scans: list[str] = field(default_factory=list)
+
+
+async def _samples(session: AsyncSession) -> dict:
+    organization = (await session.execute(select(Organization.id, Organization.name, Organization.building_id)
+                                          .order_by(Organization.id).limit(1))).first()
+    building = (await session.execute(select(Building.id, Building.latitude, Building.longitude)
+                                      .order_by(Building.id).limit(1))).first()
+    return {
+        "organization_id": organization.id if organization else 1,
+        "organization_name": organization.name if organization else "",
+        "building_id": building.id if building else 1,
+        "latitude": building.latitude if building else 0.0,
+        "longitude": building.longitude if building else 0.0,
+        "activity_id": (await session.execute(select(func.min(Activity.id)))).scalar() or 1,
+        "phone_number_id": (await session.execute(select(func.min(PhoneNumber.id)))).scalar() or 1,
+    }
+
+
+def _repository_calls(sample: dict) -> list[tuple[str, callable]]:
+    lat, lon = sample["latitude"], sample["longitude"]
+    name = sample["organization_name"]
+    export = organization_repository.export_organizations_query(building_id=sample["building_id"])
+    return [
+        ("organization_repository.get_all_organizations",
+         lambda s: organization_repository.get_all_organizations(s, limit=10, after=sample["organization_id"])),
+        ("organization_repository.get_organization_by_id",
+         lambda s: organization_repository.get_organization_by_id(s, sample["organization_id"])),
+        ("organization_repository.get_organization_by_name",
+         lambda s: organization_repository.get_organization_by_name(s, name)),
+        ("organization_repository.get_all_organization_located_in_building",
+         lambda s: organization_repository.get_all_organization_located_in_building(s, sample["building_id"])),
+        ("organization_repository.get_organizations_by_activity",
+         lambda s: organization_repository.get_organizations_by_activity(s, sample["activity_id"])),
+        ("organization_repository.get_organizations_in_bounds",
+         lambda s: organization_repository.get_organizations_in_bounds(s, lat - 0.01, lat + 0.01,
+                                                                       lon - 0.01, lon + 0.01)),
+        ("organization_repository.get_organizations_in_radius",
+         lambda s: organization_repository.get_organizations_in_radius(s, lat, lon, 1.0)),
+        ("organization_repository.get_nearest_organizations",
+         lambda s: organization_repository.get_nearest_organizations(s, lat, lon, k=5)),
+        ("organization_repository.search_organizations(prefix)",
+         lambda s: organization_repository.search_organizations(s, name[:3] or "a", mode="prefix")),
+        ("organization_repository.search_organizations(substring)",
+         lambda s: organization_repository.search_organizations(s, name[1:4] or "a", mode="substring")),
+        ("organization_repository.search_organizations(fuzzy)",
+         lambda s: organization_repository.search_organizations(s, name or "a", mode="fuzzy")),
+        ("organization_repository.export_organizations_query",
+         lambda s: s.execute(export.limit(10))),
+        ("building_repository.get_all_buildings",
+         lambda s: building_repository.get_all_buildings(s, limit=10, after=sample["building_id"])),
+        ("building_repository.get_building_by_id",
+         lambda s: building_repository.get_building_by_id(s, sample["building_id"])),
+        ("building_repository.get_buildings_in_bounds",
+         lambda s: building_repository.get_buildings_in_bounds(s, lat - 0.01, lat + 0.01, lon - 0.01, lon + 0.01)),
+        ("building_repository.get_buildings_in_radius",
+         lambda s: building_repository.get_buildings_in_radius(s, lat, lon, 1.0)),
+        ("activity_repository.get_all_activities",
+         lambda s: activity_repository.get_all_activities(s, limit=10, after=sample["activity_id"])),
+        ("activity_repository.get_activity_by_id",
+         lambda s: activity_repository.get_activity_by_id(s, sample["activity_id"])),
+        ("activity_repository.validate_activity_parent",
+         lambda s: activity_repository.validate_activity_parent(s, sample["activity_id"])),
+        ("phone_numbers_repository.get_all_phone_numbers",
+         lambda s: phone_numbers_repository.get_all_phone_numbers(s, limit=10, after=sample["phone_number_id"])),
+        ("phone_numbers_repository.get_phone_number_by_id",
+         lambda s: phone_numbers_repository.get_phone_number_by_id(s, sample["phone_number_id"])),
+    ]
+
+
+async def capture_queries() -> list[CapturedQuery]:
+    async with db_helper.session_factory() as session:
+        sample = await _samples(session)
+        # Загрузка индексов в памяти и проверка расширений читают таблицы целиком, их в отчёт не включаем.
+        await building_index.ensure_loaded(session)
+        await activity_tree_cache.ensure_loaded(session)
+        await organization_name_index.ensure_loaded(session)
+        for extension in ("pg_trgm", "earthdistance"):
+            await extension_available(session, extension)
+
+    captured: list[CapturedQuery] = []
+    current_label = [""]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append(CapturedQuery(current_label[0], statement, parameters))
+
+    event.listen(db_helper.engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        for label, call in _repository_calls(sample):
+            current_label[0] = label
+            async with db_helper.session_factory() as session:
+                try:
+                    await call(session)
+                except HTTPException:
+                    pass
+    finally:
+        event.remove(db_helper.engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+def _plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _plan_nodes(child)
+
+
+async def find_seq_scans(connection: AsyncConnection, query: CapturedQuery) -> list[str]:
+    if connection.dialect.name == "postgresql":
+        await connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        result = await connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + query.statement, query.parameters)
+        plan = result.scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return sorted({node["Relation Name"] for node in _plan_nodes(plan[0]["Plan"])
+                       if node["Node Type"] == "Seq Scan"})
+    result = await connection.exec_driver_sql("EXPLAIN QUERY PLAN " + query.statement, query.parameters)
+    # В SQLite полный проход по таблице выглядит как "SCAN <таблица>" без "USING ... INDEX".
+    return sorted({row[-1].split()[1] for row in result
+                   if row[-1].startswith("SCAN ") and "INDEX" not in row[-1] and row[-1] != "SCAN CONSTANT ROW"})
+
+
+async def main(verbose: bool = False) -> int:
+    queries = await capture_queries()
+    async with db_helper.engine.connect() as connection:
+        for query in queries:
+            transaction = await connection.begin()
+            try:
+                query.seq_scans = await find_seq_scans(connection, query)
+            finally:
+                await transaction.rollback()
+    await db_helper.engine.dispose()
+
+    seen = set()
+    problems = 0
+    for query in queries:
+        if (query.label, query.statement) in seen:
+            continue
+        seen.add((query.label, query.statement))
+        if query.seq_scans:
+            problems += 1
+            print(f"SEQ SCAN  {query.label}: {', '.join(query.seq_scans)}")
+        else:
+            print(f"ok        {query.label}")
+        if verbose or query.seq_scans:
+            print("          " + " ".join(query.statement.split()))
+    print(f"\nЗапросов проверено: {len(seen)}, с последовательным сканированием: {problems}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Поиск последовательных сканирований в запросах репозиториев")
+    parser.add_argument("--verbose", action="store_true", help="печатать SQL всех запросов")
+    sys.exit(asyncio.run(main(verbose=parser.parse_args().verbose)))
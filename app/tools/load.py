@@ -0,0 +1,263 @@
+"""Массовая загрузка справочника в Postgres через COPY.
+
+    python -m app.tools.load --buildings buildings.csv --activities activities.ndjson \
+        --organizations organizations.csv --organization-activities links.csv --phones phones.csv
+
+Файлы - CSV с заголовком или NDJSON (.ndjson/.jsonl), любой из них можно не указывать. Колонки:
+
+    buildings                id, address, latitude, longitude
+    activities               id, name, parent_id
+    organizations            id, name, building_id
+    organization-activities  organization_id, activity_id
+    phones                   organization_id, number
+
+id в файлах - идентификаторы источника, ссылки между файлами задаются ими. В базе записи получают
+новые id из последовательностей таблиц, поэтому загрузка не конфликтует с уже имеющимися данными.
+Строки читаются потоком и копируются во временные таблицы через asyncpg copy_records_to_table,
+после чего ссылки разрешаются и данные переносятся в основные таблицы запросами INSERT ... SELECT.
+Вся загрузка выполняется в одной транзакции: при ошибке (дубли id, превышение вложенности
+деятельностей) база остаётся без изменений.
+
+После загрузки увеличиваются общие версии таблиц (table_version): работающие воркеры API не позже чем
+через index_poll_seconds перезагружают индексы в памяти и дерево деятельностей, меняют ETag ответов
+и очищают кэш ответов в памяти. Общий кэш в Redis загрузчик очищает сам. Перезапуск воркеров не нужен.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.cache import response_cache
+from app.core.conditional import table_versions
+from app.core.config import settings
+from app.core.db_helper import db_helper
+
+logger = logging.getLogger("app.tools.load")
+
+# Временная таблица, целевая таблица (чья последовательность выдаёт id) и колонки файла с типами.
+STAGES = {
+    "buildings": ("stage_building", "building",
+                  {"src_id": int, "address": str, "latitude": float, "longitude": float}),
+    "activities": ("stage_activity", "activity", {"src_id": int, "name": str, "parent_src_id": int}),
+    "organizations": ("stage_organization", "organization", {"src_id": int, "name": str, "building_src_id": int}),
+    "organization_activities": ("stage_organization_activity", None,
+                                {"organization_src_id": int, "activity_src_id": int}),
+    "phones": ("stage_phone", None, {"organization_src_id": int, "number": str}),
+}
+# Имена колонок в файлах.
+FILE_COLUMNS = {
+    "src_id": "id", "parent_src_id": "parent_id", "building_src_id": "building_id",
+    "organization_src_id": "organization_id", "activity_src_id": "activity_id",
+}
+PG_TYPES = {int: "bigint", float: "double precision", str: "text"}
+NULLABLE = {"parent_src_id", "building_src_id"}
+
+
+class LoadError(Exception):
+    pass
+
+
+def _read_rows(path: Path):
+    with path.open(encoding="utf-8", newline="") as file:
+        if path.suffix in (".ndjson", ".jsonl"):
+            for line_number, line in enumerate(file, 1):
+                if line.strip():
+                    yield line_number, json.loads(line)
+        else:
+            yield from enumerate(csv.DictReader(file), 2)
+
+
+async def _records(path: Path, columns: dict, stats: dict):
+    for line_number, row in _read_rows(path):
+        try:
+            record = []
+            for column, kind in columns.items():
+                value = row.get(FILE_COLUMNS.get(column, column))
+                if value in (None, ""):
+                    if column not in NULLABLE:
+                        raise ValueError(f"не заполнено поле {FILE_COLUMNS.get(column, column)}")
+                    record.append(None)
+                else:
+                    record.append(kind(value))
+        except (TypeError, ValueError) as e:
+            stats["invalid"] += 1
+            if stats["invalid"] <= 10:
+                logger.warning("%s:%s пропущена строка: %s", path.name, line_number, e)
+            continue
+        stats["read"] += 1
+        yield tuple(record)
+
+
+async def _stage(connection: AsyncConnection, kind: str, path: Path, batch_size: int) -> dict:
+    table, target, columns = STAGES[kind]
+    id_column = ""
+    if target is not None:
+        sequence = (await connection.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"),
+                                             {"table": target})).scalar_one()
+        id_column = f", id bigint NOT NULL DEFAULT nextval('{sequence}')"
+    definition = ", ".join(f"{column} {PG_TYPES[column_type]}" for column, column_type in columns.items())
+    await connection.execute(text(f"CREATE TEMP TABLE {table} ({definition}{id_column}) ON COMMIT DROP"))
+
+    stats = {"read": 0, "invalid": 0}
+    raw = await connection.get_raw_connection()
+    records = _records(path, columns, stats)
+    batch = []
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            await raw.driver_connection.copy_records_to_table(table, records=batch, columns=list(columns))
+            batch = []
+    if batch:
+        await raw.driver_connection.copy_records_to_table(table, records=batch, columns=list(columns))
+
+    if "src_id" in columns:
+        await connection.execute(text(f"CREATE INDEX ON {table} (src_id)"))
+        duplicates = (await connection.execute(text(
+            f"SELECT src_id FROM {table} GROUP BY src_id HAVING count(*) > 1 LIMIT 10"))).scalars().all()
+        if duplicates:
+            raise LoadError(f"{path.name}: повторяющиеся id {duplicates}")
+    await connection.execute(text(f"ANALYZE {table}"))
+    logger.info("%s: прочитано %s строк, пропущено %s", path.name, stats["read"], stats["invalid"])
+    return stats
+
+
+async def _execute(connection: AsyncConnection, sql: str) -> int:
+    return (await connection.execute(text(sql))).rowcount
+
+
+async def _load_activities(connection: AsyncConnection) -> dict:
+    # Узлы с неизвестным родителем отбрасываются вместе со всеми потомками.
+    orphans = 0
+    while removed := await _execute(connection, """
+            DELETE FROM stage_activity s
+            WHERE s.parent_src_id IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM stage_activity p WHERE p.src_id = s.parent_src_id)"""):
+        orphans += removed
+    # Глубже activity_max_levels обходить не нужно: такой узел уже ошибка. Узлы циклов недостижимы от корней.
+    await connection.execute(text(f"""
+        CREATE TEMP TABLE stage_activity_depth ON COMMIT DROP AS
+        WITH RECURSIVE tree AS (
+            SELECT src_id, 0 AS depth FROM stage_activity WHERE parent_src_id IS NULL
+            UNION ALL
+            SELECT s.src_id, tree.depth + 1 FROM stage_activity s JOIN tree ON s.parent_src_id = tree.src_id
+            WHERE tree.depth <= {int(settings.activity_max_levels)}
+        )
+        SELECT src_id, depth FROM tree"""))
+    too_deep = (await connection.execute(text(
+        "SELECT src_id FROM stage_activity_depth WHERE depth >= :max_levels ORDER BY src_id LIMIT 10"),
+        {"max_levels": settings.activity_max_levels})).scalars().all()
+    if too_deep:
+        raise LoadError(f"activities: вложенность превышает {settings.activity_max_levels} уровня, "
+                        f"например у id {too_deep}")
+    cycles = await _execute(connection, """
+        DELETE FROM stage_activity s
+        WHERE NOT EXISTS (SELECT 1 FROM stage_activity_depth d WHERE d.src_id = s.src_id)""")
+
+    inserted = await _execute(connection, """
+        INSERT INTO activity (id, name, parent_id)
+        SELECT s.id, s.name, p.id FROM stage_activity s LEFT JOIN stage_activity p ON p.src_id = s.parent_src_id""")
+    await connection.execute(text("""
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE closure AS (
+            SELECT id AS ancestor_id, id AS descendant_id, src_id, 0 AS depth FROM stage_activity
+            UNION ALL
+            SELECT closure.ancestor_id, s.id, s.src_id, closure.depth + 1
+            FROM stage_activity s JOIN closure ON s.parent_src_id = closure.src_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM closure"""))
+    return {"inserted": inserted, "rejected": orphans + cycles}
+
+
+async def _load(connection: AsyncConnection, files: dict[str, Path], batch_size: int) -> dict:
+    report = {}
+    for kind, path in files.items():
+        report[kind] = await _stage(connection, kind, path, batch_size)
+    for kind in STAGES:
+        if kind not in files:
+            table, target, columns = STAGES[kind]
+            definition = ", ".join(f"{column} {PG_TYPES[column_type]}" for column, column_type in columns.items())
+            id_column = ", id bigint" if target is not None else ""
+            await connection.execute(text(f"CREATE TEMP TABLE {table} ({definition}{id_column}) ON COMMIT DROP"))
+
+    if "buildings" in files:
+        report["buildings"]["inserted"] = await _execute(connection, """
+            INSERT INTO building (id, address, latitude, longitude)
+            SELECT id, address, latitude, longitude FROM stage_building""")
+    if "activities" in files:
+        report["activities"].update(await _load_activities(connection))
+    if "organizations" in files:
+        # Ссылка на здание разрешается только среди загружаемых зданий.
+        rejected = await _execute(connection, """
+            DELETE FROM stage_organization s
+            WHERE s.building_src_id IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM stage_building b WHERE b.src_id = s.building_src_id)""")
+        report["organizations"]["rejected"] = rejected
+        report["organizations"]["inserted"] = await _execute(connection, """
+            INSERT INTO organization (id, name, building_id)
+            SELECT s.id, s.name, b.id FROM stage_organization s
+            LEFT JOIN stage_building b ON b.src_id = s.building_src_id""")
+    if "organization_activities" in files:
+        report["organization_activities"]["inserted"] = await _execute(connection, """
+            INSERT INTO organization_activity (organization_id, activity_id)
+            SELECT DISTINCT o.id, a.id FROM stage_organization_activity s
+            JOIN stage_organization o ON o.src_id = s.organization_src_id
+            JOIN stage_activity a ON a.src_id = s.activity_src_id""")
+    if "phones" in files:
+        report["phones"]["inserted"] = await _execute(connection, """
+            INSERT INTO phone_number (number, organization_id)
+            SELECT s.number, o.id FROM stage_phone s JOIN stage_organization o ON o.src_id = s.organization_src_id""")
+    for stats in report.values():
+        stats.setdefault("rejected", stats["read"] - stats.get("inserted", 0))
+    return report
+
+
+async def main(files: dict[str, Path], batch_size: int) -> int:
+    if db_helper.engine.dialect.name != "postgresql":
+        logger.error("Загрузчик работает только с Postgres (DATABASE_URL=postgresql+asyncpg://...)")
+        return 2
+    started = time.perf_counter()
+    try:
+        async with db_helper.engine.begin() as connection:
+            report = await _load(connection, files, batch_size)
+        async with db_helper.engine.begin() as connection:
+            for table in ("building", "activity", "activity_closure", "organization", "organization_activity",
+                          "phone_number"):
+                await connection.execute(text(f"ANALYZE {table}"))
+        await table_versions.bump("building", "activity", "organization", "phone_number")
+        if settings.cache_backend == "redis":
+            await response_cache.backend.clear()
+    except LoadError as e:
+        logger.error("Загрузка отменена: %s", e)
+        return 1
+    finally:
+        await db_helper.engine.dispose()
+
+    elapsed = time.perf_counter() - started
+    for kind, stats in report.items():
+        logger.info("%s: добавлено %s, отклонено %s, пропущено при чтении %s",
+                    kind, stats.get("inserted", 0), stats["rejected"], stats["invalid"])
+    logger.info("Загрузка завершена за %.1f с", elapsed)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Массовая загрузка справочника в Postgres через COPY")
+    parser.add_argument("--buildings", type=Path)
+    parser.add_argument("--activities", type=Path)
+    parser.add_argument("--organizations", type=Path)
+    parser.add_argument("--organization-activities", type=Path)
+    parser.add_argument("--phones", type=Path)
+    parser.add_argument("--batch-size", type=int, default=10000, help="строк в одном вызове COPY")
+    args = parser.parse_args()
+    selected = {kind: getattr(args, kind) for kind in STAGES if getattr(args, kind) is not None}
+    if not selected:
+        parser.error("нужно указать хотя бы один файл")
+    sys.exit(asyncio.run(main(selected, args.batch_size)))
@@ -0,0 +1,48 @@
+"""Микробенчмарки функций репозиториев на синтетических данных (см. conftest.py)."""
+import pytest
+
+from benchmarks.datagen import CENTER_LAT, CENTER_LON
+
+from app.core.config import settings
+from app.repositories import organization_repository
+from app.repositories.activity_repository import validate_activity_parent
+from app.repositories.common_dependencies import haversine_distance
+from app.repositories.suggest_index import suggest_index
+
+RADIUS_KM = 2.0
+
+
+def bench_haversine_distance(benchmark):
+    benchmark(haversine_distance, CENTER_LAT, CENTER_LON, CENTER_LAT + 0.05, CENTER_LON + 0.08)
+
+
+def bench_get_descendants(benchmark, call, dataset):
+    benchmark(call, organization_repository.get_descendants, dataset.root_activity_ids[0])
+
+
+def bench_validate_activity_parent(benchmark, call, dataset):
+    # Проверка глубины по activity_closure при создании деятельности.
+    benchmark(call, validate_activity_parent, dataset.root_activity_ids[0])
+
+
+@pytest.mark.parametrize("backend", ["index", "sql"])
+def bench_get_organizations_in_radius(benchmark, call, monkeypatch, backend):
+    monkeypatch.setattr(settings, "radius_query_backend", backend)
+    benchmark(call, organization_repository.get_organizations_in_radius, CENTER_LAT, CENTER_LON, RADIUS_KM)
+
+
+def bench_get_organizations_by_activity(benchmark, call, dataset):
+    benchmark(call, organization_repository.get_organizations_by_activity, dataset.root_activity_ids[0])
+
+
+def bench_get_nearest_organizations(benchmark, call):
+    benchmark(call, organization_repository.get_nearest_organizations, CENTER_LAT, CENTER_LON, 10)
+
+
+@pytest.mark.parametrize("mode, query", [("prefix", "Рога и Ко"), ("substring", "и Копыта"), ("fuzzy", "Капыта")])
+def bench_search_organizations(benchmark, call, mode, query):
+    benchmark(call, organization_repository.search_organizations, query, mode)
+
+
+def bench_suggest(benchmark, dataset):
+    benchmark(suggest_index.suggest, "рог", 10)
@@ -0,0 +1,55 @@
+"""Фикстуры микробенчмарков.
+
+Размер данных - BENCH_SCALE (1k, 10k, 100k, 1m; по умолчанию 10k). Данные генерируются один раз
+и переиспользуются следующими запусками, пока число организаций в базе совпадает с планом.
+"""
+import asyncio
+import os
+
+import pytest
+
+from benchmarks.datagen import SCALES, ensure_generated, plan
+
+from app.core.db_helper import db_helper
+from app.repositories.activity_tree_cache import activity_tree_cache
+from app.repositories.name_search_index import organization_name_index
+from app.repositories.spatial_index import building_index
+from app.repositories.suggest_index import suggest_index
+
+
+@pytest.fixture(scope="session")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(db_helper.engine.dispose())
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def dataset(loop):
+    dataset = plan(SCALES[os.environ.get("BENCH_SCALE", "10k")])
+    loop.run_until_complete(ensure_generated(db_helper.engine, dataset))
+
+    async def load_indexes():
+        async with db_helper.session_factory() as session:
+            await building_index.load(session)
+            await activity_tree_cache.load(session)
+            await suggest_index.load(session)
+            await organization_name_index.ensure_loaded(session)
+
+    loop.run_until_complete(load_indexes())
+    return dataset
+
+
+@pytest.fixture(scope="session")
+def call(loop, dataset):
+    """call(function, *args) выполняет function(session, *args) в новой сессии, как это делает запрос API."""
+
+    def call(function, *args, **kwargs):
+        async def run():
+            async with db_helper.session_factory() as session:
+                return await function(session, *args, **kwargs)
+
+        return loop.run_until_complete(run())
+
+    return call
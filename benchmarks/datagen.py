@@ -0,0 +1,186 @@
+"""Синтетические данные для бенчмарков: здания, дерево деятельностей, организации, связи и телефоны.
+
+Размер задаётся числом организаций (1k ... 1M), остальное масштабируется пропорционально:
+зданий в 10 раз меньше, у каждой организации 1-3 деятельности и 1-2 телефона, дерево
+деятельностей глубиной activity_max_levels с ветвлением 5. id назначаются подряд с 1,
+поэтому план данных (plan) известен без обращения к базе.
+
+Генерация очищает таблицы справочника - запускайте её только на отдельной базе.
+
+Запуск: BENCH_DATABASE_URL=... python -m benchmarks.datagen --scale 100k
+"""
+import argparse
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from itertools import islice
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from benchmarks.environment import configure
+
+configure()
+
+from app.core.config import settings
+from app.core.db_helper import db_helper
+from app.models import Activity, Base, Building, Organization, PhoneNumber
+from app.models.association_tables import activity_closure, organization_activity
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+CENTER_LAT, CENTER_LON = 55.75, 37.61
+SPREAD_DEG = 0.3
+BRANCHING = 5
+INSERT_CHUNK = 10_000
+NAME_WORDS = ("Рога", "Копыта", "Молоко", "Авто", "Сервис", "Торг", "Строй", "Маркет", "Лайн", "Групп")
+
+
+@dataclass(frozen=True)
+class Dataset:
+    organizations: int
+    buildings: int
+    activity_roots: int
+    seed: int = 42
+
+    @property
+    def activities(self) -> int:
+        return self.activity_roots * sum(BRANCHING ** level for level in range(settings.activity_max_levels))
+
+    @property
+    def root_activity_ids(self) -> list[int]:
+        return list(range(1, self.activity_roots + 1))
+
+    @staticmethod
+    def organization_name(organization_id: int) -> str:
+        words = NAME_WORDS[organization_id % len(NAME_WORDS)], NAME_WORDS[organization_id // 7 % len(NAME_WORDS)]
+        return f"{words[0]} и {words[1]} {organization_id}"
+
+
+def plan(organizations: int, seed: int = 42) -> Dataset:
+    return Dataset(organizations=organizations, buildings=max(organizations // 10, 1),
+                   activity_roots=max(organizations // 2_000, 3), seed=seed)
+
+
+def _buildings(dataset: Dataset, rng: random.Random):
+    for building_id in range(1, dataset.buildings + 1):
+        yield {"id": building_id, "address": f"ул. Синтетическая, {building_id}",
+               "latitude": CENTER_LAT + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+               "longitude": CENTER_LON + rng.uniform(-SPREAD_DEG, SPREAD_DEG)}
+
+
+def _activity_tree(dataset: Dataset) -> list[tuple[int, int | None, list[int]]]:
+    """(id, parent_id, предки от корня) по уровням: сначала все корни, затем их дети и т.д."""
+    nodes = [(activity_id, None, []) for activity_id in dataset.root_activity_ids]
+    level = nodes
+    next_id = dataset.activity_roots + 1
+    for _ in range(settings.activity_max_levels - 1):
+        children = []
+        for parent_id, _, ancestors in level:
+            for _ in range(BRANCHING):
+                children.append((next_id, parent_id, ancestors + [parent_id]))
+                next_id += 1
+        nodes.extend(children)
+        level = children
+    return nodes
+
+
+def _activities(tree):
+    for activity_id, parent_id, ancestors in tree:
+        yield {"id": activity_id, "name": f"Деятельность {len(ancestors) + 1}.{activity_id}", "parent_id": parent_id}
+
+
+def _closure(tree):
+    for activity_id, _, ancestors in tree:
+        yield {"ancestor_id": activity_id, "descendant_id": activity_id, "depth": 0}
+        for depth, ancestor_id in enumerate(reversed(ancestors), 1):
+            yield {"ancestor_id": ancestor_id, "descendant_id": activity_id, "depth": depth}
+
+
+def _organizations(dataset: Dataset, rng: random.Random):
+    for organization_id in range(1, dataset.organizations + 1):
+        yield {"id": organization_id, "name": dataset.organization_name(organization_id),
+               "building_id": rng.randint(1, dataset.buildings)}
+
+
+def _organization_activities(dataset: Dataset, rng: random.Random):
+    for organization_id in range(1, dataset.organizations + 1):
+        for activity_id in rng.sample(range(1, dataset.activities + 1), rng.randint(1, 3)):
+            yield {"organization_id": organization_id, "activity_id": activity_id}
+
+
+def _phones(dataset: Dataset, rng: random.Random):
+    phone_id = 1
+    for organization_id in range(1, dataset.organizations + 1):
+        for _ in range(rng.randint(1, 2)):
+            yield {"id": phone_id, "number": f"8-9{rng.randint(0, 99):02d}-{rng.randint(0, 9_999_999):07d}",
+                   "organization_id": organization_id}
+            phone_id += 1
+
+
+async def _insert(connection, table, rows) -> int:
+    total = 0
+    while chunk := list(islice(rows, INSERT_CHUNK)):
+        await connection.execute(insert(table), chunk)
+        total += len(chunk)
+    return total
+
+
+async def generate(engine: AsyncEngine, dataset: Dataset) -> dict[str, int]:
+    """Пересоздаёт данные справочника по плану dataset, возвращает число вставленных строк по таблицам."""
+    rng = random.Random(dataset.seed)
+    tree = _activity_tree(dataset)
+    async with engine.begin() as connection:
+        if engine.dialect.name == "sqlite":
+            await connection.run_sync(Base.metadata.create_all)
+        for table in (PhoneNumber.__table__, organization_activity, Organization.__table__, activity_closure,
+                      Activity.__table__, Building.__table__):
+            await connection.execute(delete(table))
+        counts = {
+            "building": await _insert(connection, Building.__table__, _buildings(dataset, rng)),
+            "activity": await _insert(connection, Activity.__table__, _activities(tree)),
+            "activity_closure": await _insert(connection, activity_closure, _closure(tree)),
+            "organization": await _insert(connection, Organization.__table__, _organizations(dataset, rng)),
+            "organization_activity": await _insert(connection, organization_activity,
+                                                   _organization_activities(dataset, rng)),
+            "phone_number": await _insert(connection, PhoneNumber.__table__, _phones(dataset, rng)),
+        }
+        if engine.dialect.name == "postgresql":
+            for table in ("building", "activity", "organization", "phone_number"):
+                await connection.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+    if engine.dialect.name == "postgresql":
+        async with engine.connect() as connection:
+            await connection.execution_options(isolation_level="AUTOCOMMIT")
+            await connection.execute(text("VACUUM ANALYZE"))
+    return counts
+
+
+async def ensure_generated(engine: AsyncEngine, dataset: Dataset) -> bool:
+    """Генерирует данные, если в базе другое число организаций. Возвращает True, если генерировал."""
+    try:
+        async with engine.connect() as connection:
+            existing = (await connection.execute(select(func.count()).select_from(Organization))).scalar_one()
+    except Exception:
+        existing = None
+    if existing == dataset.organizations:
+        return False
+    await generate(engine, dataset)
+    return True
+
+
+async def main(scale: str, seed: int):
+    started = time.perf_counter()
+    counts = await generate(db_helper.engine, plan(SCALES[scale], seed))
+    await db_helper.engine.dispose()
+    for table, count in counts.items():
+        print(f"{table:>22} {count:>10}")
+    print(f"Готово за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных для бенчмарков")
+    parser.add_argument("--scale", choices=SCALES, default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(main(args.scale, args.seed))
@@ -0,0 +1,45 @@
+"""Сравнение скалярного haversine_distance с векторизованным расчётом на 10k/100k/1M точек.
+
+Запуск: python -m benchmarks.haversine_benchmark
+"""
+import time
+
+import numpy as np
+
+from app.repositories.common_dependencies import haversine_distance
+from app.repositories.vectorized_distance import haversine_matrix, haversine_vector, nearest_k
+
+CENTER_LAT, CENTER_LON, RADIUS_KM = 55.75, 37.61, 10.0
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+def _best_of(func, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    rng = np.random.default_rng(42)
+    print(f"{'points':>10} {'scalar, s':>12} {'vector, s':>12} {'speedup':>9} {'top-10, s':>12} {'16x, s':>10}")
+    for size in SIZES:
+        latitudes = rng.uniform(55.0, 56.5, size)
+        longitudes = rng.uniform(36.5, 38.5, size)
+        points = list(zip(latitudes.tolist(), longitudes.tolist()))
+
+        scalar = _best_of(lambda: [p for p in points
+                                   if haversine_distance(CENTER_LAT, CENTER_LON, p[0], p[1]) <= RADIUS_KM],
+                          repeat=1 if size >= 1_000_000 else 3)
+        vector = _best_of(lambda: np.flatnonzero(
+            haversine_vector(CENTER_LAT, CENTER_LON, latitudes, longitudes) <= RADIUS_KM))
+        top_k = _best_of(lambda: nearest_k(CENTER_LAT, CENTER_LON, latitudes, longitudes, 10))
+        centers = rng.uniform(55.0, 56.5, 16), rng.uniform(36.5, 38.5, 16)
+        matrix = _best_of(lambda: haversine_matrix(*centers, latitudes, longitudes), repeat=1)
+        print(f"{size:>10} {scalar:>12.4f} {vector:>12.4f} {scalar / vector:>8.1f}x {top_k:>12.4f} {matrix:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Нагрузочный прогон всех GET-эндпоинтов приложения через httpx.ASGITransport, без сети.
+
+Для каждого маршрута из main.app выполняется --requests запросов в --concurrency потоков и считаются
+p50/p95/p99 задержки и пропускная способность. Результат сохраняется в JSON (по умолчанию в
+benchmarks/.results/load/), с --compare прогон сравнивается с сохранённым: рост p95 больше
+--threshold считается регрессией и завершает скрипт с кодом 1. Число SQL-запросов на запрос берётся
+из заголовка Server-Timing; его рост тоже считается регрессией (признак N+1).
+
+Кэш ответов по умолчанию выключен, чтобы измерять запросы к базе; --cache включает его.
+База и размер данных - как у микробенчмарков (BENCH_DATABASE_URL, см. benchmarks/environment.py).
+
+Запуск: python -m benchmarks.load_driver --scale 10k --requests 500 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+from fastapi.routing import APIRoute
+
+from benchmarks.datagen import CENTER_LAT, CENTER_LON, SCALES, Dataset, ensure_generated, plan
+from benchmarks.environment import RESULTS_DIR
+
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.db_helper import db_helper
+from main import app, lifespan
+
+RADIUS_KM = 2.0
+QUERIES = re.compile(r'desc="queries=(\d+)"')
+BOUNDS = {"lat_min": CENTER_LAT - 0.02, "lat_max": CENTER_LAT + 0.02,
+          "lon_min": CENTER_LON - 0.03, "lon_max": CENTER_LON + 0.03}
+
+
+def sample_requests(dataset: Dataset) -> dict[str, tuple[str, dict]]:
+    """URL и параметры запроса для каждого GET-маршрута. Маршруты без записи здесь пропускаются с предупреждением."""
+    organization_id = dataset.organizations // 2 or 1
+    building_id = dataset.buildings // 2 or 1
+    activity_id = dataset.root_activity_ids[0]
+    radius = {"center_lat": CENTER_LAT, "center_lon": CENTER_LON, "radius_km": RADIUS_KM}
+    return {
+        "/": ("/", {}),
+        "/organizations/all_organizations": ("/organizations/all_organizations", {}),
+        "/organizations/export": ("/organizations/export", {"building_id": building_id}),
+        "/organizations/organization/{organization_id}": (f"/organizations/organization/{organization_id}", {}),
+        "/organizations/organization_in_building": ("/organizations/organization_in_building",
+                                                    {"building_id": building_id}),
+        "/organizations/organization_by_activity": ("/organizations/organization_by_activity",
+                                                    {"activity_id": activity_id}),
+        "/organizations/organizations_by_activity_limited": ("/organizations/organizations_by_activity_limited",
+                                                             {"activity_id": activity_id}),
+        "/organizations/organization_in_bounds": ("/organizations/organization_in_bounds", BOUNDS),
+        "/organizations/organization_in_radius": ("/organizations/organization_in_radius", radius),
+        "/organizations/nearest": ("/organizations/nearest", {"center_lat": CENTER_LAT, "center_lon": CENTER_LON,
+                                                              "k": 10}),
+        "/organizations/search": ("/organizations/search", {"q": "Рога и Ко", "mode": "prefix"}),
+        "/organizations/suggest": ("/organizations/suggest", {"q": "рог"}),
+        "/organizations/organization_by_name/{organization_name}": (
+            f"/organizations/organization_by_name/{dataset.organization_name(organization_id)}", {}),
+        "/activities/all_activities": ("/activities/all_activities", {}),
+        "/activities/activity/{activity_id}": (f"/activities/activity/{activity_id}", {}),
+        "/buildings/all_buildings": ("/buildings/all_buildings", {}),
+        "/buildings/building/{building_id}": (f"/buildings/building/{building_id}", {}),
+        "/buildings/buildings_in_bounds": ("/buildings/buildings_in_bounds", BOUNDS),
+        "/buildings/buildings_in_radius": ("/buildings/buildings_in_radius", radius),
+        "/phone_numbers/all_phone_numbers": ("/phone_numbers/all_phone_numbers", {}),
+        "/phone_numbers/phone_numbers/{phone_number_id}": ("/phone_numbers/phone_numbers/1", {}),
+    }
+
+
+async def warm_up(client: httpx.AsyncClient, url: str, params: dict, requests: int):
+    for _ in range(requests):
+        await client.get(url, params=params)
+
+
+async def drive(client: httpx.AsyncClient, url: str, params: dict, requests: int, concurrency: int) -> dict:
+    latencies = []
+    statuses = Counter()
+    queries = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal queries
+        for _ in pending:
+            started = time.perf_counter()
+            response = await client.get(url, params=params)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+            if match := QUERIES.search(response.headers.get("server-timing", "")):
+                queries = max(queries, int(match[1]))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": requests,
+        "p50_ms": round(percentiles[49] * 1000, 3),
+        "p95_ms": round(percentiles[94] * 1000, 3),
+        "p99_ms": round(percentiles[98] * 1000, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "queries": queries,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for route, stats in results["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if before and stats["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{route}: p95 {before['p95_ms']} -> {stats['p95_ms']} мс")
+        if before and stats["queries"] > before.get("queries", stats["queries"]):
+            regressions.append(f"{route}: SQL-запросов {before['queries']} -> {stats['queries']}")
+    return regressions
+
+
+async def main(args) -> int:
+    try:
+        return await run(args)
+    finally:
+        await db_helper.dispose()
+
+
+async def run(args) -> int:
+    dataset = plan(SCALES[args.scale])
+    await ensure_generated(db_helper.engine, dataset)
+    if not args.cache:
+        response_cache.backend = None
+    samples = sample_requests(dataset)
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "database": db_helper.engine.dialect.name,
+        "scale": args.scale,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "cache": args.cache,
+        "routes": {},
+    }
+    async with lifespan(app), httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load",
+                                                headers={"x-api-key": settings.api_key}, timeout=None) as client:
+        for route in app.routes:
+            if not isinstance(route, APIRoute) or "GET" not in route.methods:
+                continue
+            if route.path not in samples:
+                print(f"{route.path}: нет параметров запроса в sample_requests, пропущен", file=sys.stderr)
+                continue
+            url, params = samples[route.path]
+            await warm_up(client, url, params, args.warmup)
+            stats = results["routes"][route.path] = await drive(client, url, params, args.requests,
+                                                                 args.concurrency)
+            print(f"{route.path:<60} p50 {stats['p50_ms']:>8.2f}  p95 {stats['p95_ms']:>8.2f}  "
+                  f"p99 {stats['p99_ms']:>8.2f} мс  {stats['throughput_rps']:>8.1f} rps  "
+                  f"{stats['queries']:>3} sql  {stats['statuses']}")
+
+    output = args.output or RESULTS_DIR / "load" / f"{results['created'].replace(':', '')}-{args.scale}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Результаты сохранены в {output}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text(encoding="utf-8")), args.threshold)
+        for regression in regressions:
+            print(f"Регрессия: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон GET-эндпоинтов")
+    parser.add_argument("--scale", choices=SCALES, default="10k")
+    parser.add_argument("--requests", type=int, default=500, help="запросов на маршрут, не меньше 2")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=10, help="запросов на маршрут перед замером")
+    parser.add_argument("--cache", action="store_true", help="не выключать кэш ответов")
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path, help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимый рост p95, доля")
+    sys.exit(asyncio.run(main(parser.parse_args())))
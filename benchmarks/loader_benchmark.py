@@ -0,0 +1,85 @@
+"""Сравнение загрузки зданий и организаций через COPY (app.tools.load) и через REST.
+
+Пути: загрузчик COPY, эндпоинты /bulk (NDJSON) и построчные POST. Нужен Postgres с применёнными
+миграциями (DATABASE_URL=postgresql+asyncpg://...); данные добавляются в базу и не удаляются.
+
+Запуск: python -m benchmarks.loader_benchmark [число организаций, по умолчанию 10000]
+"""
+import asyncio
+import csv
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from app.core.config import settings
+from app.tools import load
+from main import app
+
+POST_ROWS = 1_000
+
+
+def _write_csv(path: Path, header: list[str], rows):
+    with path.open("w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+async def _copy(directory: Path, size: int) -> float:
+    buildings = directory / "buildings.csv"
+    organizations = directory / "organizations.csv"
+    rng = random.Random(42)
+    _write_csv(buildings, ["id", "address", "latitude", "longitude"],
+               ((i, f"ул. Тестовая, {i}", rng.uniform(55, 56), rng.uniform(37, 38)) for i in range(size // 10)))
+    _write_csv(organizations, ["id", "name", "building_id"],
+               ((i, f"Организация {i}", i % (size // 10)) for i in range(size)))
+    started = time.perf_counter()
+    if await load.main({"buildings": buildings, "organizations": organizations}, batch_size=10_000):
+        raise RuntimeError("загрузчик завершился с ошибкой")
+    return time.perf_counter() - started
+
+
+async def _bulk(client: httpx.AsyncClient, size: int) -> float:
+    started = time.perf_counter()
+    buildings = "\n".join(json.dumps({"address": f"ул. Тестовая, {i}", "latitude": 55.5, "longitude": 37.5})
+                          for i in range(size // 10))
+    response = await client.post("/buildings/bulk", content=buildings,
+                                 headers={"content-type": "application/x-ndjson"})
+    building_ids = response.json()["ids"]
+    for start in range(0, size, settings.bulk_chunk_size * 10):
+        chunk = "\n".join(json.dumps({"name": f"Организация {i}", "building_id": building_ids[i % len(building_ids)]})
+                          for i in range(start, min(start + settings.bulk_chunk_size * 10, size)))
+        response = await client.post("/organizations/bulk", content=chunk,
+                                     headers={"content-type": "application/x-ndjson"})
+        response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def _post(client: httpx.AsyncClient, rows: int) -> float:
+    started = time.perf_counter()
+    for i in range(rows):
+        response = await client.post("/organizations/", json={"name": f"Организация {i}", "activity_ids": []})
+        response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def main(size: int):
+    with tempfile.TemporaryDirectory() as directory:
+        copy = await _copy(Path(directory), size)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark",
+                                 headers={"x-api-key": settings.api_key}, timeout=None) as client:
+        bulk = await _bulk(client, size)
+        post = await _post(client, min(size, POST_ROWS)) * size / min(size, POST_ROWS)
+    print(f"{'path':>10} {'rows':>10} {'seconds':>10} {'rows/s':>10}")
+    for name, elapsed in (("copy", copy), ("bulk", bulk), ("post*", post)):
+        print(f"{name:>10} {size:>10} {elapsed:>10.2f} {size / elapsed:>10.0f}")
+    print(f"* построчные POST: {min(size, POST_ROWS)} запросов, время пересчитано на {size} строк")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000))
@@ -0,0 +1,74 @@
+"""Сессий в секунду: прежний жизненный цикл сессии запроса против общего реестра и сессии чтения.
+
+Каждая "сессия" - то, что делает типичный GET: получить сессию из зависимости, выполнить запрос
+организации по id и закрыть сессию. Прежний вариант воспроизводит старый scoped_session_dependency:
+новый реестр async_scoped_session на каждый запрос без remove() и autoflush=True.
+
+Запуск: python -m benchmarks.session_benchmark [--sessions 5000] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import time
+from asyncio import current_task
+from functools import partial
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_scoped_session
+from starlette.requests import Request
+
+from benchmarks.datagen import SCALES, ensure_generated, plan
+
+from app.core.db_helper import db_helper
+from app.models import Organization
+
+
+async def legacy_session_dependency():
+    session = async_scoped_session(session_factory=db_helper.session_factory, scopefunc=current_task)
+    yield session
+    await session.close()
+
+
+async def _request(dependency, organization_id: int):
+    # Как FastAPI: зависимость возобновляется после обработчика и должна завершиться.
+    generator = dependency()
+    session = await anext(generator)
+    await session.execute(select(Organization).where(Organization.id == organization_id))
+    async for _ in generator:
+        pass
+
+
+async def measure(dependency, sessions: int, concurrency: int, organizations: int) -> float:
+    pending = iter(range(sessions))
+
+    async def worker():
+        for number in pending:
+            # Как и запросы API, каждая сессия выполняется в своей задаче.
+            await asyncio.create_task(_request(dependency, number % organizations + 1))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return sessions / (time.perf_counter() - started)
+
+
+async def main(sessions: int, concurrency: int):
+    dataset = plan(SCALES["1k"])
+    await ensure_generated(db_helper.engine, dataset)
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    variants = (("legacy scoped", legacy_session_dependency),
+                ("shared scoped", partial(db_helper.scoped_session_dependency, request)),
+                ("read session", partial(db_helper.read_session_dependency, request)))
+    try:
+        for name, dependency in variants:
+            await measure(dependency, min(sessions, 200), concurrency, dataset.organizations)
+            rate = await measure(dependency, sessions, concurrency, dataset.organizations)
+            print(f"{name:>14} {rate:>10.0f} sessions/s  pool: {db_helper.engine.pool.status()}")
+    finally:
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение жизненного цикла сессий")
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.concurrency))
@@ -1,12 +1,53 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
 from app.controllers.organization_controller import router as organization_router
 from app.controllers.activity_controller import router as activity_router
 from app.controllers.building_controller import router as building_router
 from app.controllers.phone_numbers_controller import router as phone_numbers_router
+from app.core.conditional import ConditionalHeadersMiddleware
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.db_helper import db_helper
+from app.core.metrics import MetricsMiddleware, metrics
+from app.core.query_stats import QueryStatsMiddleware, instrument
+from app.repositories.index_poller import index_poller
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        if settings.db_pool_warm_up:
+            await db_helper.warm_up()
+        async with db_helper.session_factory() as session:
+            await index_poller.load(session, "activity_tree", "building", "suggest")
+    except Exception:
+        logger.warning("Не удалось загрузить индексы в памяти при старте, "
+                       "они будут загружены при первом запросе", exc_info=True)
+    tasks = [asyncio.create_task(index_poller.poll(db_helper.session_factory, settings.index_poll_seconds))]
+    if db_helper.replicas.engines:
+        tasks.append(asyncio.create_task(db_helper.replicas.monitor(settings.replica_health_check_seconds)))
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await db_helper.dispose()
 
-app = FastAPI(title="Secunda API")
+
+app = FastAPI(title="Secunda API", lifespan=lifespan)
+app.add_middleware(ConditionalHeadersMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+for engine in db_helper.engines:
+    instrument(engine)
 app.include_router(organization_router, prefix="/organizations")
 app.include_router(activity_router, prefix="/activities")
 app.include_router(building_router, prefix="/buildings")
@@ -18,5 +59,13 @@ async def root():
     return {"message": "Hello User!"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    pools = {"primary": db_helper.engine.pool}
+    pools.update((f"replica-{number}", engine.pool) for number, engine in enumerate(db_helper.replicas.engines, 1))
+    return PlainTextResponse(metrics.render(pools, response_cache.stats()),
+                             media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", reload=True)
@@ -0,0 +1,107 @@
+"""Фикстуры тестов API.
+
+Тесты идут на SQLite-файле во временном каталоге, как бенчмарки без BENCH_DATABASE_URL. Таблицы
+создаются заново перед каждым тестом, индексы и кэши в памяти процесса сбрасываются.
+"""
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+import httpx
+import pytest
+
+DATABASE_DIR = Path(tempfile.mkdtemp(prefix="secunda-tests-"))
+API_KEY = "test"
+
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DATABASE_DIR / 'test.db'}"
+os.environ["DB_ECHO"] = "false"
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["DATABASE_REPLICA_URLS"] = "[]"
+os.environ["API_KEY"] = API_KEY
+for name in ("POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB"):
+    os.environ.setdefault(name, "test")
+
+from app.core.cache import response_cache  # noqa: E402
+from app.core.conditional import table_versions  # noqa: E402
+from app.core.db_helper import db_helper  # noqa: E402
+from app.models import Base  # noqa: E402
+from app.repositories.activity_tree_cache import activity_tree_cache  # noqa: E402
+from app.repositories.name_search_index import organization_name_index  # noqa: E402
+from app.repositories.spatial_index import building_index  # noqa: E402
+from app.repositories.suggest_index import suggest_index  # noqa: E402
+from main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(db_helper.dispose())
+    loop.close()
+
+
+@pytest.fixture
+def run(loop):
+    """run(coroutine) выполняет корутину в общем цикле событий тестов."""
+    return loop.run_until_complete
+
+
+def reset_state():
+    for index in (building_index, suggest_index, organization_name_index):
+        index.clear()
+        index.loaded = False
+    activity_tree_cache.invalidate()
+    response_cache.hits.clear()
+    response_cache.misses.clear()
+    table_versions._local.clear()
+    table_versions.applied.clear()
+
+
+@pytest.fixture
+def db(run):
+    async def recreate():
+        async with db_helper.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+            await connection.run_sync(Base.metadata.create_all)
+        if response_cache.backend is not None:
+            await response_cache.backend.clear()
+
+    run(recreate())
+    reset_state()
+    yield db_helper
+
+
+@pytest.fixture
+def api(run, db):
+    """api(method, url, **kwargs) выполняет запрос к приложению с API-ключом и возвращает ответ httpx."""
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test",
+                               headers={"x-api-key": API_KEY})
+
+    def api(method: str, url: str, **kwargs) -> httpx.Response:
+        return run(client.request(method, url, **kwargs))
+
+    yield api
+    run(client.aclose())
+
+
+@pytest.fixture
+def activity_tree(api):
+    """Дерево деятельностей: Еда -> (Мясная продукция -> Колбасы, Молочная продукция) и Автомобили.
+
+    Возвращает словарь имя -> id."""
+    ids = {}
+    for name, parent in (("Еда", None), ("Мясная продукция", "Еда"), ("Колбасы", "Мясная продукция"),
+                         ("Молочная продукция", "Еда"), ("Автомобили", None)):
+        response = api("POST", "/activities/", json={"name": name, "parent_id": ids.get(parent)})
+        assert response.status_code == 201, response.text
+        ids[name] = response.json()["id"]
+    return ids
+
+
+@pytest.fixture
+def building(api):
+    response = api("POST", "/buildings/", json={"address": "г. Москва, ул. Ленина 1", "latitude": 55.75,
+                                                "longitude": 37.62})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
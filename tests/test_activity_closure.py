@@ -0,0 +1,72 @@
+from sqlalchemy import select
+
+from app.models import Activity
+from app.models.association_tables import activity_closure
+
+
+def read_closure(run, db) -> tuple[set[tuple[int, int, int]], set[tuple[int, int, int]]]:
+    """Строки activity_closure и строки, которые должны быть в ней по parent_id деятельностей."""
+
+    async def read():
+        async with db.session_factory() as session:
+            closure = set((await session.execute(select(activity_closure))).tuples().all())
+            parents = dict((await session.execute(select(Activity.id, Activity.parent_id))).tuples().all())
+        return closure, parents
+
+    closure, parents = run(read())
+    expected = set()
+    for activity_id in parents:
+        ancestor, depth = activity_id, 0
+        while ancestor is not None:
+            expected.add((ancestor, activity_id, depth))
+            ancestor, depth = parents[ancestor], depth + 1
+    return closure, expected
+
+
+def test_closure_follows_created_tree(run, db, activity_tree):
+    closure, expected = read_closure(run, db)
+
+    assert closure == expected
+    assert (activity_tree["Еда"], activity_tree["Колбасы"], 2) in closure
+
+
+def test_closure_follows_moved_subtree(api, run, db, activity_tree):
+    response = api("PATCH", f"/activities/{activity_tree['Мясная продукция']}",
+                   json={"parent_id": activity_tree["Автомобили"]})
+    assert response.status_code == 200, response.text
+
+    closure, expected = read_closure(run, db)
+    assert closure == expected
+    assert (activity_tree["Автомобили"], activity_tree["Колбасы"], 2) in closure
+    assert not any(ancestor == activity_tree["Еда"] and descendant == activity_tree["Колбасы"]
+                   for ancestor, descendant, _ in closure)
+
+
+def test_closure_follows_subtree_moved_to_root(api, run, db, activity_tree):
+    response = api("PUT", f"/activities/{activity_tree['Мясная продукция']}",
+                   json={"name": "Мясная продукция", "parent_id": None})
+    assert response.status_code == 200, response.text
+
+    closure, expected = read_closure(run, db)
+    assert closure == expected
+
+
+def test_closure_drops_deleted_activity(api, run, db, activity_tree):
+    response = api("DELETE", f"/activities/{activity_tree['Молочная продукция']}")
+    assert response.status_code == 204, response.text
+
+    closure, expected = read_closure(run, db)
+    assert closure == expected
+    assert not any(activity_tree["Молочная продукция"] in row[:2] for row in closure)
+
+
+def test_subtree_lookup_sees_moved_activity(api, activity_tree, building):
+    organization = api("POST", "/organizations/", json={"name": "ООО Колбасы", "building_id": building,
+                                                        "activity_ids": [activity_tree["Колбасы"]]}).json()
+    params = {"activity_id": activity_tree["Автомобили"]}
+    assert api("GET", "/organizations/organization_by_activity", params=params).json()["items"] == []
+
+    api("PATCH", f"/activities/{activity_tree['Мясная продукция']}", json={"parent_id": activity_tree["Автомобили"]})
+
+    items = api("GET", "/organizations/organization_by_activity", params=params).json()["items"]
+    assert [item["id"] for item in items] == [organization["id"]]
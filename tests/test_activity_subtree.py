@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import insert
+
+from app.core.conditional import TableVersions
+from app.models import Activity
+from app.models.association_tables import activity_closure
+from app.repositories.activity_tree_cache import activity_tree_cache
+from app.repositories.index_poller import index_poller
+
+
+@pytest.fixture
+def organizations(api, activity_tree, building):
+    """Организации по одной на вид деятельности: имя деятельности -> id организации."""
+    ids = {}
+    for activity, activity_id in activity_tree.items():
+        response = api("POST", "/organizations/", json={"name": f"ООО {activity}", "building_id": building,
+                                                        "activity_ids": [activity_id]})
+        assert response.status_code == 201, response.text
+        ids[activity] = response.json()["id"]
+    return ids
+
+
+def organization_ids(response) -> set[int]:
+    assert response.status_code == 200, response.text
+    return {item["id"] for item in response.json()["items"]}
+
+
+def test_subtree_includes_nested_activities(api, activity_tree, organizations):
+    response = api("GET", "/organizations/organization_by_activity", params={"activity_id": activity_tree["Еда"]})
+
+    assert organization_ids(response) == {organizations[name] for name in
+                                          ("Еда", "Мясная продукция", "Колбасы", "Молочная продукция")}
+
+
+def test_subtree_of_leaf_is_the_leaf_itself(api, activity_tree, organizations):
+    response = api("GET", "/organizations/organization_by_activity", params={"activity_id": activity_tree["Колбасы"]})
+
+    assert organization_ids(response) == {organizations["Колбасы"]}
+
+
+def test_subtree_pages_follow_cursor(api, activity_tree, organizations):
+    seen = []
+    params = {"activity_id": activity_tree["Еда"], "limit": 3}
+    while True:
+        page = api("GET", "/organizations/organization_by_activity", params=params).json()
+        seen += [item["id"] for item in page["items"]]
+        if page["next_cursor"] is None:
+            break
+        params["after"] = page["next_cursor"]
+
+    assert seen == sorted(organizations[name] for name in
+                          ("Еда", "Мясная продукция", "Колбасы", "Молочная продукция"))
+
+
+def test_limited_subtree_matches_full_subtree_within_three_levels(api, activity_tree, organizations):
+    full = api("GET", "/organizations/organization_by_activity", params={"activity_id": activity_tree["Еда"]})
+    limited = api("GET", "/organizations/organizations_by_activity_limited",
+                  params={"activity_id": activity_tree["Еда"]})
+
+    assert organization_ids(limited) == organization_ids(full)
+
+
+def test_unknown_activity_is_not_found(api, organizations):
+    response = api("GET", "/organizations/organization_by_activity", params={"activity_id": 10_000})
+
+    assert response.status_code == 404
+
+
+def test_unknown_activity_does_not_reload_tree(api, activity_tree, organizations, monkeypatch):
+    api("GET", "/organizations/organization_by_activity", params={"activity_id": activity_tree["Еда"]})
+
+    async def load(session):
+        raise AssertionError("дерево не должно перечитываться")
+
+    monkeypatch.setattr(activity_tree_cache, "_load", load)
+
+    for _ in range(3):
+        assert api("GET", "/organizations/organization_by_activity", params={"activity_id": 10_000}).status_code == 404
+
+
+def test_activity_created_by_another_process_appears_after_poll(api, run, db, activity_tree, organizations):
+    async def create_elsewhere():
+        async with db.session_factory() as session:
+            await index_poller.load(session)
+            activity_id = (await session.execute(insert(Activity).values(name="Сыры", parent_id=activity_tree["Еда"])
+                                                 .returning(Activity.id))).scalar_one()
+            await session.execute(insert(activity_closure).values(
+                [{"ancestor_id": activity_tree["Еда"], "descendant_id": activity_id, "depth": 1},
+                 {"ancestor_id": activity_id, "descendant_id": activity_id, "depth": 0}]))
+            await session.commit()
+        await TableVersions(engine=db.engine).bump("activity")
+        return activity_id
+
+    activity_id = run(create_elsewhere())
+    assert api("GET", "/organizations/organization_by_activity", params={"activity_id": activity_id}).status_code == 404
+
+    async def refresh():
+        async with db.session_factory() as session:
+            return await index_poller.refresh_if_stale(session)
+
+    assert "activity_tree" in run(refresh())
+    response = api("GET", "/organizations/organization_by_activity", params={"activity_id": activity_id})
+    assert response.status_code == 200 and response.json()["items"] == []
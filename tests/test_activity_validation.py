@@ -0,0 +1,55 @@
+import logging
+from types import SimpleNamespace
+
+from app.repositories.activity_tree_cache import ActivityTreeCache
+
+
+def test_activity_cannot_become_its_own_parent(api, activity_tree):
+    activity_id = activity_tree["Еда"]
+
+    response = api("PATCH", f"/activities/{activity_id}", json={"parent_id": activity_id})
+
+    assert response.status_code == 400
+
+
+def test_activity_cannot_move_under_its_descendant(api, activity_tree):
+    response = api("PATCH", f"/activities/{activity_tree['Еда']}", json={"parent_id": activity_tree["Колбасы"]})
+
+    assert response.status_code == 400
+    assert api("GET", f"/activities/activity/{activity_tree['Еда']}").json()["parent_id"] is None
+
+
+def test_fourth_level_is_rejected(api, activity_tree):
+    response = api("POST", "/activities/", json={"name": "Сырокопчёные", "parent_id": activity_tree["Колбасы"]})
+
+    assert response.status_code == 400
+
+
+def test_moving_subtree_checks_its_height(api, activity_tree):
+    # Мясная продукция -> Колбасы под Молочной продукцией дала бы 4 уровня.
+    too_deep = api("PATCH", f"/activities/{activity_tree['Мясная продукция']}",
+                   json={"parent_id": activity_tree["Молочная продукция"]})
+    fits = api("PATCH", f"/activities/{activity_tree['Молочная продукция']}",
+               json={"parent_id": activity_tree["Мясная продукция"]})
+
+    assert too_deep.status_code == 400
+    assert fits.status_code == 200, fits.text
+
+
+def test_unknown_parent_is_not_found(api, activity_tree):
+    response = api("POST", "/activities/", json={"name": "Сироты", "parent_id": 10_000})
+
+    assert response.status_code == 404
+
+
+def test_tree_cache_survives_cycle_in_stored_rows(caplog):
+    rows = [SimpleNamespace(id=1, name="Еда", parent_id=3), SimpleNamespace(id=2, name="Мясо", parent_id=1),
+            SimpleNamespace(id=3, name="Колбасы", parent_id=2), SimpleNamespace(id=4, name="Авто", parent_id=None)]
+    cache = ActivityTreeCache()
+
+    with caplog.at_level(logging.WARNING):
+        cache._build(rows)
+
+    assert sorted(cache.descendants(1)) == [1, 2, 3]
+    assert cache.descendants(4) == [4]
+    assert "циклы" in caplog.text
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from app.core.admission import admission
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+@pytest.fixture
+def organization(api, building):
+    return api("POST", "/organizations/", json={"name": "ООО Рога и Копыта", "building_id": building}).json()
+
+
+@pytest.fixture
+def exhausted_pool(run, db, monkeypatch):
+    """Занимает все места запросов к основной базе, пока идёт тест."""
+    monkeypatch.setattr(settings, "db_pool_admission_timeout", 0.2)
+    slots = admission.slots(db.engine.sync_engine)
+    size = settings.db_pool_size + settings.db_max_overflow
+
+    async def acquire_all():
+        for _ in range(size):
+            await asyncio.wait_for(slots.acquire(), 1)
+
+    run(acquire_all())
+    yield
+    for _ in range(size):
+        slots.release()
+
+
+def test_request_is_rejected_when_pool_is_exhausted(api, organization, exhausted_pool):
+    rejections = metrics.pool_rejections
+
+    response = api("GET", f"/buildings/building/{organization['building_id']}")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(settings.db_pool_retry_after_seconds)
+    assert metrics.pool_rejections == rejections + 1
+
+
+def test_write_is_rejected_with_503_not_500(api, organization, exhausted_pool):
+    response = api("POST", "/buildings/", json={"address": "Новое", "latitude": 1, "longitude": 1})
+
+    assert response.status_code == 503
+
+
+def test_cache_hit_does_not_need_a_connection(api, organization, request):
+    url = f"/organizations/organization/{organization['id']}"
+    assert api("GET", url).headers["x-cache"] == "MISS"
+    request.getfixturevalue("exhausted_pool")
+
+    response = api("GET", url)
+
+    assert response.status_code == 200
+    assert response.headers["x-cache"] == "HIT"
+
+
+def test_invalid_api_key_is_rejected_before_taking_a_connection(api, organization, exhausted_pool):
+    response = api("POST", "/buildings/", headers={"x-api-key": "wrong"},
+                   json={"address": "Новое", "latitude": 1, "longitude": 1})
+
+    assert response.status_code == 401
+
+
+
+def test_sessions_release_their_places(api, organization):
+    for _ in range(2 * (settings.db_pool_size + settings.db_max_overflow)):
+        assert api("GET", f"/organizations/organization/{organization['id']}").status_code == 200
+        api("PATCH", f"/organizations/{organization['id']}", json={"name": "ООО Рога"})
@@ -0,0 +1,67 @@
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models import Building
+from app.repositories.common_dependencies import bulk_write, upsert_rows
+
+
+def building_row(number: int, **values) -> dict:
+    return {"id": None, "address": f"Здание {number}", "latitude": 55.0 + number / 100, "longitude": 37.0, **values}
+
+
+def test_failed_chunk_is_retried_row_by_row(run, db, monkeypatch):
+    monkeypatch.setattr(settings, "bulk_chunk_size", 3)
+    # Строка 4 нарушает NOT NULL: её пачка откатывается и повторяется построчно в точках сохранения.
+    items = [(index, building_row(index, **({"latitude": None} if index == 4 else {}))) for index in range(7)]
+
+    async def write():
+        errors, written = [], []
+        async with db.session_factory() as session:
+            async for chunk in bulk_write(session, items, lambda s, rows: upsert_rows(s, Building.__table__, rows),
+                                          errors):
+                written.append(chunk)
+        async with db.session_factory() as session:
+            addresses = (await session.execute(select(Building.address).order_by(Building.id))).scalars().all()
+        return written, errors, addresses
+
+    written, errors, addresses = run(write())
+
+    assert [[index for index, _ in chunk] for chunk in written] == [[0, 1, 2], [3, 5], [6]]
+    assert [error["index"] for error in errors] == [4]
+    assert addresses == [f"Здание {index}" for index in range(7) if index != 4]
+
+
+def test_bulk_endpoint_reports_ids_and_errors_by_row(api):
+    response = api("POST", "/buildings/bulk", json=[
+        {"address": "Здание 0", "latitude": 55.0, "longitude": 37.0},
+        {"address": "Здание 1", "latitude": "не число", "longitude": 37.0},
+        {"address": "Здание 2", "latitude": 55.2, "longitude": 37.0},
+    ])
+
+    result = response.json()
+    assert response.status_code == 200, response.text
+    assert result["ids"][1] is None and None not in (result["ids"][0], result["ids"][2])
+    assert [error["index"] for error in result["errors"]] == [1]
+
+
+def test_bulk_rows_with_id_update_existing_records(api, building):
+    response = api("POST", "/buildings/bulk", headers={"content-type": "application/x-ndjson"},
+                   content='{"id": %d, "address": "Новый адрес", "latitude": 1, "longitude": 2}\n'
+                           '{"address": "Здание", "latitude": 3, "longitude": 4}\n' % building)
+
+    ids = response.json()["ids"]
+    assert ids[0] == building and ids[1] != building
+    assert api("GET", f"/buildings/building/{building}").json()["address"] == "Новый адрес"
+    assert api("POST", "/buildings/", json={"address": "Ещё", "latitude": 0, "longitude": 0}).json()["id"] > ids[1]
+
+
+def test_bulk_organizations_check_references_before_writing(api, building, activity_tree):
+    response = api("POST", "/organizations/bulk", json=[
+        {"name": "ООО Есть", "building_id": building, "activity_ids": [activity_tree["Еда"]]},
+        {"name": "ООО Нет здания", "building_id": 10_000},
+        {"name": "ООО Нет деятельности", "building_id": building, "activity_ids": [10_000]},
+    ])
+
+    result = response.json()
+    assert result["ids"][0] is not None and result["ids"][1:] == [None, None]
+    assert [error["index"] for error in result["errors"]] == [1, 2]
@@ -0,0 +1,94 @@
+import pytest
+
+from app.core.conditional import TableVersions
+from app.repositories.index_poller import index_poller
+from conftest import API_KEY
+
+
+@pytest.fixture
+def organization(api, building):
+    return api("POST", "/organizations/", json={"name": "ООО Рога и Копыта", "building_id": building}).json()
+
+
+def test_read_returns_validators(api, organization):
+    response = api("GET", f"/organizations/organization/{organization['id']}")
+
+    assert response.headers["etag"].startswith('W/"')
+    assert "last-modified" in response.headers
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+def test_matching_etag_returns_not_modified(api, organization):
+    url = f"/organizations/organization/{organization['id']}"
+    etag = api("GET", url).headers["etag"]
+
+    response = api("GET", url, headers={"if-none-match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_matching_last_modified_returns_not_modified(api, organization):
+    last_modified = api("GET", "/organizations/all_organizations").headers["last-modified"]
+
+    response = api("GET", "/organizations/all_organizations", headers={"if-modified-since": last_modified})
+
+    assert response.status_code == 304
+
+
+def test_write_changes_etag(api, organization):
+    url = f"/organizations/organization/{organization['id']}"
+    etag = api("GET", url).headers["etag"]
+
+    api("PATCH", f"/organizations/{organization['id']}", json={"name": "ООО Рога"})
+    response = api("GET", url, headers={"if-none-match": etag})
+
+    assert response.status_code == 200
+    assert response.json()["name"] == "ООО Рога"
+    assert response.headers["etag"] != etag
+
+
+def test_etag_depends_on_query(api, organization):
+    url = f"/organizations/organization/{organization['id']}"
+
+    assert api("GET", url).headers["etag"] != api("GET", url, params={"expand": True}).headers["etag"]
+
+
+def test_write_to_unrelated_table_keeps_building_etag(api, organization, building):
+    url = f"/buildings/building/{building}"
+    etag = api("GET", url).headers["etag"]
+
+    api("PATCH", f"/organizations/{organization['id']}", json={"name": "ООО Рога"})
+
+    assert api("GET", url, headers={"if-none-match": etag}).status_code == 304
+
+
+def test_not_modified_requires_api_key(api, organization):
+    url = f"/organizations/organization/{organization['id']}"
+    etag = api("GET", url).headers["etag"]
+
+    response = api("GET", url, headers={"if-none-match": etag, "x-api-key": API_KEY + "-wrong"})
+
+    assert response.status_code == 401
+
+
+def test_write_from_another_process_changes_etag_after_poll(api, run, db, organization):
+    url = f"/organizations/organization/{organization['id']}"
+    etag = api("GET", url).headers["etag"]
+    assert api("GET", url).headers["x-cache"] == "HIT"
+
+    async def write_elsewhere():
+        async with db.session_factory() as session:
+            await index_poller.load(session)
+        # Другой воркер или загрузчик меняет только общую версию таблицы, его записи этот процесс не видел.
+        await TableVersions(engine=db.engine).bump("organization")
+        async with db.session_factory() as session:
+            await index_poller.refresh_if_stale(session)
+
+    run(write_elsewhere())
+    response = api("GET", url, headers={"if-none-match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.headers["x-cache"] == "MISS"
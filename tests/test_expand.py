@@ -0,0 +1,52 @@
+import pytest
+
+
+@pytest.fixture
+def organization(api, activity_tree, building):
+    response = api("POST", "/organizations/", json={"name": "ООО Колбасы", "building_id": building,
+                                                    "activity_ids": [activity_tree["Колбасы"]]})
+    organization = response.json()
+    api("POST", "/phone_numbers/", json={"number": "8-800-555-35-35", "organization_id": organization["id"]})
+    api("POST", "/phone_numbers/", json={"number": "2-222-222", "organization_id": organization["id"]})
+    return organization
+
+
+def test_organization_without_expand_has_no_building_and_phones(api, organization, activity_tree):
+    item = api("GET", f"/organizations/organization/{organization['id']}").json()
+
+    assert item["name"] == "ООО Колбасы"
+    assert [activity["id"] for activity in item["activities"]] == [activity_tree["Колбасы"]]
+    assert "building" not in item and "phones" not in item
+
+
+def test_expanded_organization_has_building_and_phones(api, organization, building):
+    item = api("GET", f"/organizations/organization/{organization['id']}", params={"expand": True}).json()
+
+    assert item["building"] == {"id": building, "address": "г. Москва, ул. Ленина 1", "latitude": 55.75,
+                                "longitude": 37.62}
+    assert sorted(phone["number"] for phone in item["phones"]) == ["2-222-222", "8-800-555-35-35"]
+    assert all(phone["organization_id"] == organization["id"] for phone in item["phones"])
+
+
+def test_expanded_organization_without_phones_has_empty_list(api, building):
+    organization = api("POST", "/organizations/", json={"name": "ООО Тишина", "building_id": building}).json()
+
+    item = api("GET", f"/organizations/organization/{organization['id']}", params={"expand": True}).json()
+
+    assert item["phones"] == [] and item["activities"] == []
+
+
+@pytest.mark.parametrize("url, params", [
+    ("/organizations/all_organizations", {}),
+    ("/organizations/all_organizations", {"stream": True}),
+    ("/organizations/organization_in_bounds", {"lat_min": 55, "lat_max": 56, "lon_min": 37, "lon_max": 38}),
+    ("/organizations/organization_in_radius", {"center_lat": 55.75, "center_lon": 37.62, "radius_km": 1}),
+])
+def test_lists_expand_like_single_organization(api, organization, url, params):
+    single = api("GET", f"/organizations/organization/{organization['id']}", params={"expand": True}).json()
+
+    plain = api("GET", url, params=params).json()["items"]
+    expanded = api("GET", url, params={**params, "expand": True}).json()["items"]
+
+    assert expanded == [single]
+    assert plain == [{key: single[key] for key in ("id", "name", "building_id", "activities")}]
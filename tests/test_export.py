@@ -0,0 +1,69 @@
+import orjson
+import pytest
+
+from app.core.config import settings
+
+
+@pytest.fixture
+def organizations(api, activity_tree, building):
+    """Организации в Москве (по одной на вид деятельности) и одна в Твери: имя -> id."""
+    tver = api("POST", "/buildings/", json={"address": "г. Тверь", "latitude": 56.86, "longitude": 35.9}).json()["id"]
+    ids = {}
+    for activity, activity_id in activity_tree.items():
+        ids[activity] = api("POST", "/organizations/", json={"name": f"ООО {activity}", "building_id": building,
+                                                             "activity_ids": [activity_id]}).json()["id"]
+    ids["Тверь"] = api("POST", "/organizations/", json={"name": "ООО Тверь", "building_id": tver}).json()["id"]
+    api("POST", "/phone_numbers/", json={"number": "2-222-222", "organization_id": ids["Еда"]})
+    return ids
+
+
+def export(api, **params) -> list[dict]:
+    response = api("GET", "/organizations/export", params=params)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.endswith("\n")
+    return [orjson.loads(line) for line in response.text.splitlines()]
+
+
+def test_export_streams_every_organization_in_batches(api, organizations, monkeypatch):
+    monkeypatch.setattr(settings, "stream_batch_size", 2)
+
+    rows = export(api)
+
+    assert [row["id"] for row in rows] == sorted(organizations.values())
+
+
+def test_export_rows_are_expanded(api, organizations, building):
+    row = next(row for row in export(api) if row["id"] == organizations["Еда"])
+
+    assert row["building"]["id"] == building
+    assert [phone["number"] for phone in row["phones"]] == ["2-222-222"]
+    assert [activity["name"] for activity in row["activities"]] == ["Еда"]
+
+
+def test_export_filters_by_building(api, organizations, building):
+    rows = export(api, building_id=building)
+
+    assert {row["id"] for row in rows} == set(organizations.values()) - {organizations["Тверь"]}
+
+
+def test_export_filters_by_activity_subtree(api, organizations, activity_tree):
+    rows = export(api, activity_id=activity_tree["Мясная продукция"])
+
+    assert {row["id"] for row in rows} == {organizations["Мясная продукция"], organizations["Колбасы"]}
+
+
+def test_export_filters_by_bounds(api, organizations):
+    rows = export(api, lat_min=56, lat_max=57, lon_min=35, lon_max=36)
+
+    assert [row["id"] for row in rows] == [organizations["Тверь"]]
+
+
+def test_export_rejects_partial_bounds(api, organizations):
+    response = api("GET", "/organizations/export", params={"lat_min": 56, "lat_max": 57})
+
+    assert response.status_code == 422
+
+
+def test_export_rejects_unknown_activity(api, organizations):
+    assert api("GET", "/organizations/export", params={"activity_id": 10_000}).status_code == 404
@@ -0,0 +1,40 @@
+import pytest
+
+from app.core.metrics import metrics
+
+
+@pytest.fixture
+def exposition(api, building):
+    """Текст /metrics после нескольких запросов к зданию (на чистых счётчиках маршрутов)."""
+    metrics.routes.clear()
+    api("GET", f"/buildings/building/{building}")
+    api("GET", "/buildings/building/10000")
+    response = api("GET", "/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    return response.text.splitlines()
+
+
+def samples(lines: list[str], name: str) -> dict[str, float]:
+    """Значения метрики name: строка после имени (метки) -> значение."""
+    return {line[len(name):].rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1]) for line in lines
+            if line.startswith(name + "{") or line.startswith(name + " ")}
+
+
+def test_requests_are_counted_per_route_template_and_status(exposition):
+    route = 'method="GET",route="/buildings/building/{building_id}"'
+
+    assert samples(exposition, "http_requests_total") == {
+        f'{{{route},status="200"}}': 1, f'{{{route},status="404"}}': 1}
+    assert samples(exposition, "http_request_duration_seconds_count") == {f"{{{route}}}": 2}
+    assert samples(exposition, "http_response_size_bytes_count") == {f"{{{route}}}": 2}
+    # Сам запрос /metrics ещё обрабатывается.
+    assert samples(exposition, "http_requests_in_flight") == {"": 1}
+
+
+def test_pool_and_database_series_are_exposed(exposition):
+    assert samples(exposition, "db_query_duration_seconds_count")[""] >= 2
+    assert "" in samples(exposition, "db_pool_wait_seconds_count")
+    assert "" in samples(exposition, "db_pool_rejections_total")
+    for name in ("db_pool_size", "db_pool_checked_out", "db_pool_checked_in", "db_pool_overflow"):
+        assert '{engine="primary"}' in samples(exposition, name), name
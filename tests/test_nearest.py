@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from app.repositories.common_dependencies import haversine_distance
+from app.repositories.spatial_index import SpatialGridIndex, building_index
+
+
+def brute_force(points: dict[int, tuple[float, float]], latitude: float, longitude: float) -> list[int]:
+    return sorted(points, key=lambda point_id: (haversine_distance(latitude, longitude, *points[point_id]), point_id))
+
+
+@pytest.mark.parametrize("cell_deg", [0.1, 1.0, 10.0])
+def test_iter_nearest_yields_every_point_in_distance_order(cell_deg):
+    rng = random.Random(2)
+    index = SpatialGridIndex(cell_deg=cell_deg)
+    points = {point_id: (rng.uniform(-90, 90), rng.uniform(-180, 180)) for point_id in range(1, 501)}
+    for point_id, point in points.items():
+        index.add(point_id, *point)
+
+    for latitude, longitude in ((55.75, 37.62), (-89.9, 0.0), (0.0, -179.95)):
+        found = list(index.iter_nearest(latitude, longitude))
+        distances = [distance for _, distance in found]
+        assert distances == sorted(distances)
+        assert [point_id for point_id, _ in found] == brute_force(points, latitude, longitude)
+
+
+def test_iter_nearest_stops_on_empty_index():
+    assert list(SpatialGridIndex(cell_deg=0.1).iter_nearest(10.0, 10.0)) == []
+
+
+def test_iter_nearest_reaches_far_points_without_scanning_every_ring():
+    # При ячейке 0.01° до точки на другой стороне Земли ~18000 колец: перебор должен перейти на обход ячеек.
+    index = SpatialGridIndex(cell_deg=0.01)
+    index.add(1, 55.75, 37.62)
+    index.add(2, -55.75, -142.38)
+
+    found = index.iter_nearest(55.75, 37.62)
+
+    assert next(found)[0] == 1
+    point_id, distance = next(found)
+    assert point_id == 2 and distance == pytest.approx(haversine_distance(55.75, 37.62, -55.75, -142.38))
+    assert next(found, None) is None
+
+
+def test_nearest_endpoint_orders_by_distance_and_respects_radius(api):
+    ids = {}
+    for name, latitude, longitude in (("Центр", 55.75, 37.62), ("Химки", 55.89, 37.44), ("Тверь", 56.86, 35.9)):
+        building = api("POST", "/buildings/", json={"address": name, "latitude": latitude, "longitude": longitude})
+        organization = api("POST", "/organizations/", json={"name": f"ООО {name}",
+                                                            "building_id": building.json()["id"]})
+        ids[name] = organization.json()["id"]
+    center = {"center_lat": 55.75, "center_lon": 37.62}
+
+    nearest = api("GET", "/organizations/nearest", params={**center, "k": 2}).json()
+    in_radius = api("GET", "/organizations/nearest", params={**center, "k": 10, "radius_km": 50}).json()
+
+    assert [item["id"] for item in nearest] == [ids["Центр"], ids["Химки"]]
+    assert nearest[0]["distance_km"] == pytest.approx(0, abs=1e-6)
+    assert nearest[1]["distance_km"] == pytest.approx(haversine_distance(55.75, 37.62, 55.89, 37.44), rel=1e-6)
+    assert [item["id"] for item in in_radius] == [ids["Центр"], ids["Химки"]]
+
+
+def test_nearest_filters_by_activity_subtree(api, activity_tree, building):
+    organization = api("POST", "/organizations/", json={"name": "ООО Колбасы", "building_id": building,
+                                                        "activity_ids": [activity_tree["Колбасы"]]}).json()
+    api("POST", "/organizations/", json={"name": "ООО Без деятельности", "building_id": building})
+    params = {"center_lat": 55.75, "center_lon": 37.62, "activity_ids": [activity_tree["Еда"]]}
+
+    assert [item["id"] for item in api("GET", "/organizations/nearest", params=params).json()] == [organization["id"]]
+
+
+def test_nearest_rejects_unknown_activity(api, activity_tree, building):
+    params = {"center_lat": 55.75, "center_lon": 37.62, "activity_ids": [activity_tree["Еда"], 10_000]}
+
+    assert api("GET", "/organizations/nearest", params=params).status_code == 404
+
+
+def test_nearest_without_organizations_in_subtree_skips_index(api, activity_tree, building, monkeypatch):
+    api("POST", "/organizations/", json={"name": "ООО Без деятельности", "building_id": building})
+
+    def iter_nearest(*args):
+        raise AssertionError("обход индекса не нужен")
+
+    monkeypatch.setattr(building_index, "iter_nearest", iter_nearest)
+    params = {"center_lat": 55.75, "center_lon": 37.62, "activity_ids": [activity_tree["Автомобили"]]}
+
+    response = api("GET", "/organizations/nearest", params=params)
+
+    assert response.status_code == 200 and response.json() == []
@@ -0,0 +1,56 @@
+import logging
+import re
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.query_stats import track_queries
+
+SERVER_TIMING = re.compile(r'db;dur=[\d.]+;desc="queries=(\d+)", db-slowest;dur=[\d.]+, app;dur=[\d.]+')
+
+
+def queries(response) -> int:
+    match = SERVER_TIMING.fullmatch(response.headers["server-timing"])
+    assert match, response.headers["server-timing"]
+    return int(match.group(1))
+
+
+def test_server_timing_counts_queries_of_request(api, building):
+    assert queries(api("GET", f"/buildings/building/{building}")) >= 1
+    assert queries(api("GET", "/")) == 0
+
+
+def test_error_responses_have_server_timing(api):
+    response = api("GET", "/buildings/building/10000")
+
+    assert response.status_code == 404
+    assert queries(response) >= 1
+
+
+def test_request_is_logged_with_query_count(api, building, caplog, monkeypatch):
+    monkeypatch.setattr(settings, "query_stats_log", True)
+
+    with caplog.at_level(logging.INFO, logger="app.sql"):
+        api("GET", f"/buildings/building/{building}")
+
+    record = next(record for record in caplog.records if record.getMessage().startswith("request "))
+    assert record.path == f"/buildings/building/{building}" and record.status == 200
+    assert record.queries >= 1 and record.duration_ms >= 0
+
+
+def test_slow_query_is_logged_with_plan(run, db, caplog, monkeypatch):
+    monkeypatch.setattr(settings, "slow_query_ms", 0)
+
+    statement = "SELECT id FROM building WHERE id = 1"
+
+    async def select():
+        async with db.session_factory() as session:
+            await session.execute(text(statement))
+
+    with caplog.at_level(logging.WARNING, logger="app.sql"), track_queries() as stats:
+        run(select())
+
+    assert stats.count == 1 and stats.slowest_statement == statement
+    record = next(record for record in caplog.records if record.getMessage().startswith("slow_query "))
+    assert record.statement == statement
+    assert "SEARCH building" in record.plan
@@ -0,0 +1,56 @@
+import pytest
+
+from app.core.config import settings
+from app.repositories.common_dependencies import haversine_distance
+
+CENTER = {"center_lat": 55.75, "center_lon": 37.62}
+# Точки вокруг центра: внутри 20 км, за 20 км, но внутри ограничивающего прямоугольника, и далеко.
+POINTS = {"Центр": (55.75, 37.62), "Химки": (55.89, 37.44), "Угол": (55.92, 37.9), "Тверь": (56.86, 35.9)}
+
+
+@pytest.fixture(params=["index", "sql"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(settings, "radius_query_backend", request.param)
+    return request.param
+
+
+@pytest.fixture
+def organizations(api):
+    ids = {}
+    for name, (latitude, longitude) in POINTS.items():
+        building = api("POST", "/buildings/", json={"address": name, "latitude": latitude, "longitude": longitude})
+        ids[name] = api("POST", "/organizations/", json={"name": f"ООО {name}",
+                                                         "building_id": building.json()["id"]}).json()["id"]
+    return ids
+
+
+def test_corner_point_is_outside_radius_but_inside_bounding_box():
+    assert haversine_distance(*POINTS["Центр"], *POINTS["Угол"]) > 20
+    assert abs(POINTS["Угол"][0] - POINTS["Центр"][0]) < 20 / 111
+
+
+def test_buildings_in_radius(api, organizations, backend):
+    items = api("GET", "/buildings/buildings_in_radius", params={**CENTER, "radius_km": 20}).json()["items"]
+
+    assert [item["address"] for item in items] == ["Центр", "Химки"]
+
+
+def test_organizations_in_radius(api, organizations, backend):
+    page = api("GET", "/organizations/organization_in_radius",
+               params={**CENTER, "radius_km": 20, "expand": True}).json()
+
+    assert [item["id"] for item in page["items"]] == [organizations["Центр"], organizations["Химки"]]
+    assert [item["building"]["address"] for item in page["items"]] == ["Центр", "Химки"]
+
+
+def test_radius_pages_follow_cursor(api, organizations, backend):
+    params = {**CENTER, "radius_km": 200, "limit": 1}
+    seen = []
+    while True:
+        page = api("GET", "/organizations/organization_in_radius", params=params).json()
+        seen += [item["id"] for item in page["items"]]
+        if page["next_cursor"] is None:
+            break
+        params["after"] = page["next_cursor"]
+
+    assert seen == sorted(organizations.values())
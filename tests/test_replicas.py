@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.cache import response_cache
+from app.core.replicas import ReplicaSet
+from app.models import Base, Building
+from conftest import DATABASE_DIR
+
+
+@pytest.fixture
+def replica(run, db, building, monkeypatch):
+    """Реплика на отдельном SQLite-файле: то же здание, что и в основной базе, но с другим адресом,
+    чтобы по ответу было видно, откуда он прочитан. Кэш ответов выключен."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{DATABASE_DIR / 'replica.db'}")
+
+    async def recreate():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(insert(Building).values(id=building, address="Адрес на реплике",
+                                                             latitude=55.75, longitude=37.62))
+
+    run(recreate())
+    replicas = ReplicaSet([engine], sticky_seconds=60, primary=db.engine)
+    monkeypatch.setattr(db, "replicas", replicas)
+    monkeypatch.setitem(db.read_session_factory.kw, "replicas", replicas)
+    monkeypatch.setattr(response_cache, "backend", None)
+    yield replicas
+    run(engine.dispose())
+
+
+def address(api, building: int, client: str) -> str:
+    response = api("GET", f"/buildings/building/{building}", headers={"x-client-id": client})
+    assert response.status_code == 200, response.text
+    return response.json()["address"]
+
+
+def test_choose_skips_replicas_behind_requested_time():
+    behind, fresh = object(), object()
+    replicas = ReplicaSet([behind, fresh])
+    replicas.applied_until = {behind: 10.0, fresh: 20.0}
+
+    assert {replicas.choose() for _ in range(4)} == {behind, fresh}
+    assert {replicas.choose(fresh_since=15.0) for _ in range(4)} == {fresh}
+    assert replicas.choose(fresh_since=25.0) is None
+
+
+def test_unchecked_replica_is_not_read(api, building, replica):
+    assert address(api, building, "b") == "г. Москва, ул. Ленина 1"
+
+
+def test_checked_replica_serves_reads(run, api, building, replica):
+    run(replica.check())
+
+    assert address(api, building, "b") == "Адрес на реплике"
+    response = api("GET", "/buildings/all_buildings", params={"stream": True}, headers={"x-client-id": "b"})
+    assert [item["address"] for item in response.json()["items"]] == ["Адрес на реплике"]
+
+
+def test_write_sends_reads_to_primary_until_replica_catches_up(run, api, building, replica):
+    run(replica.check())
+
+    api("PATCH", f"/buildings/{building}", json={"address": "Новый адрес"}, headers={"x-client-id": "a"})
+
+    assert address(api, building, "b") == "Новый адрес"
+    run(replica.check())
+    assert address(api, building, "b") == "Адрес на реплике"
+
+
+def test_read_your_writes_is_per_client(run, api, building, replica):
+    api("PATCH", f"/buildings/{building}", json={"address": "Новый адрес"}, headers={"x-client-id": "a"})
+    run(replica.check())
+
+    assert address(api, building, "a") == "Новый адрес"
+    assert address(api, building, "b") == "Адрес на реплике"
+
+
+def test_failed_write_does_not_make_client_sticky(run, api, building, replica):
+    assert api("PATCH", "/buildings/10000", json={"address": "Нет такого"},
+               headers={"x-client-id": "a"}).status_code == 404
+    run(replica.check())
+
+    assert address(api, building, "a") == "Адрес на реплике"
@@ -0,0 +1,126 @@
+import fakeredis
+import pytest
+from pydantic import BaseModel
+
+from app.core.cache import MemoryCacheBackend, RedisCacheBackend, ResponseCache
+
+
+@pytest.fixture
+def organization(api, activity_tree, building):
+    response = api("POST", "/organizations/", json={"name": "ООО Колбасы", "building_id": building,
+                                                    "activity_ids": [activity_tree["Колбасы"]]})
+    return response.json()
+
+
+def cache_status(api, url: str, **params) -> str:
+    response = api("GET", url, params=params)
+    assert response.status_code == 200, response.text
+    return response.headers["x-cache"]
+
+
+def test_repeated_read_is_served_from_cache(api, organization):
+    url = f"/organizations/organization/{organization['id']}"
+
+    assert cache_status(api, url) == "MISS"
+    assert cache_status(api, url) == "HIT"
+
+
+@pytest.mark.parametrize("write", [
+    lambda api, organization, tree: api("PATCH", f"/organizations/{organization['id']}", json={"name": "ООО Сосиски"}),
+    lambda api, organization, tree: api("PATCH", f"/buildings/{organization['building_id']}",
+                                        json={"address": "Новый адрес"}),
+    lambda api, organization, tree: api("PATCH", f"/activities/{tree['Колбасы']}", json={"name": "Сосиски"}),
+    lambda api, organization, tree: api("POST", "/phone_numbers/", json={"number": "8-800-555-35-35",
+                                                                        "organization_id": organization["id"]}),
+])
+def test_write_invalidates_tagged_responses(api, organization, activity_tree, write):
+    url = f"/organizations/organization/{organization['id']}"
+    assert cache_status(api, url, expand=True) == "MISS"
+    assert cache_status(api, url, expand=True) == "HIT"
+
+    assert write(api, organization, activity_tree).status_code in (200, 201)
+
+    assert cache_status(api, url, expand=True) == "MISS"
+
+
+def test_unrelated_write_keeps_cached_response(api, organization, activity_tree):
+    url = f"/organizations/organization/{organization['id']}"
+    assert cache_status(api, url) == "MISS"
+
+    api("POST", "/buildings/", json={"address": "Другое здание", "latitude": 1, "longitude": 1})
+    api("PATCH", f"/activities/{activity_tree['Автомобили']}", json={"name": "Автосалоны"})
+
+    assert cache_status(api, url) == "HIT"
+
+
+def test_tree_change_invalidates_subtree_pages(api, organization, activity_tree):
+    url, params = "/organizations/organization_by_activity", {"activity_id": activity_tree["Автомобили"]}
+    assert cache_status(api, url, **params) == "MISS"
+    assert cache_status(api, url, **params) == "HIT"
+
+    api("PATCH", f"/activities/{activity_tree['Мясная продукция']}", json={"parent_id": activity_tree["Автомобили"]})
+
+    response = api("GET", url, params=params)
+    assert response.headers["x-cache"] == "MISS"
+    assert [item["id"] for item in response.json()["items"]] == [organization["id"]]
+
+
+class Item(BaseModel):
+    id: int
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backends(request):
+    """Два бэкенда, как у двух воркеров: общий Redis или (для памяти) один объект."""
+    if request.param == "memory":
+        backend = MemoryCacheBackend(max_entries=100, ttl=60)
+        return backend, backend
+    server = fakeredis.FakeServer()
+    return (RedisCacheBackend(fakeredis.FakeAsyncRedis(server=server), ttl=60),
+            RedisCacheBackend(fakeredis.FakeAsyncRedis(server=server), ttl=60))
+
+
+def test_backend_invalidates_by_tag(run, backends):
+    backend, _ = backends
+
+    async def scenario():
+        await backend.set("a", b"1", {"organization:1", "building:1"})
+        await backend.set("b", b"2", {"organization:2", "building:1"})
+        await backend.set("c", b"3", {"organization:3"})
+        await backend.invalidate(["building:1"])
+        return [await backend.get(key) for key in ("a", "b", "c")]
+
+    assert run(scenario()) == [None, None, b"3"]
+
+
+def test_response_computed_before_invalidation_in_another_worker_is_not_stored(run, backends):
+    backend, other_worker_backend = backends
+    cache, other_worker = ResponseCache(backend), ResponseCache(other_worker_backend)
+
+    @cache.cached("item", Item, tags=lambda result, **_: {f"organization:{result.id}"})
+    async def read_item(item_id: int):
+        # Пока запрос читает данные, другой воркер записывает организацию и инвалидирует кэш.
+        await other_worker.invalidate(f"organization:{item_id}")
+        return {"id": item_id}
+
+    async def scenario():
+        first = await read_item(item_id=1)
+        second = await read_item(item_id=1)
+        stored = await backend.get(cache._key("item", {"item_id": 1}))
+        return first.headers["x-cache"], second.headers["x-cache"], stored
+
+    assert run(scenario()) == ("MISS", "MISS", None)
+
+
+def test_response_is_stored_without_concurrent_invalidation(run, backends):
+    backend, _ = backends
+    cache = ResponseCache(backend)
+
+    @cache.cached("item", Item, tags=lambda result, **_: {f"organization:{result.id}"})
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    async def scenario():
+        return [(await read_item(item_id=1)).headers["x-cache"] for _ in range(2)]
+
+    assert run(scenario()) == ["MISS", "HIT"]
@@ -0,0 +1,41 @@
+import pytest
+
+
+@pytest.fixture
+def organizations(api, building):
+    names = ["Рога и Копыта", "Рога и Копыта", "Рога и Копыта плюс", "Рога", "Копыта и Рога", "Рогатка",
+             "Рога и Копыта", "Автосервис"]
+    return [api("POST", "/organizations/", json={"name": name, "building_id": building}).json()["id"]
+            for name in names]
+
+
+@pytest.mark.parametrize("mode, query", [("substring", "рога"), ("prefix", "Рога"), ("fuzzy", "Рога и Копыта")])
+def test_search_pages_follow_score_and_id_cursor(api, organizations, mode, query):
+    full = api("GET", "/organizations/search", params={"q": query, "mode": mode, "limit": 100}).json()
+    assert full["next_cursor"] is None
+    assert len(full["items"]) >= 3
+
+    seen = []
+    params = {"q": query, "mode": mode, "limit": 2}
+    while True:
+        page = api("GET", "/organizations/search", params=params).json()
+        seen += page["items"]
+        if page["next_cursor"] is None:
+            break
+        params["cursor"] = page["next_cursor"]
+
+    assert seen == full["items"]
+    assert [(-item["score"], item["id"]) for item in seen] == sorted((-item["score"], item["id"]) for item in seen)
+
+
+def test_search_cursor_points_at_last_item(api, organizations):
+    page = api("GET", "/organizations/search", params={"q": "рога", "limit": 1}).json()
+
+    item = page["items"][0]
+    assert page["next_cursor"] == f"{item['score']!r}:{item['id']}"
+
+
+def test_malformed_search_cursor_is_rejected(api, organizations):
+    response = api("GET", "/organizations/search", params={"q": "рога", "cursor": "10"})
+
+    assert response.status_code == 422
@@ -0,0 +1,70 @@
+import random
+
+from sqlalchemy import insert
+
+from app.core.conditional import TableVersions
+from app.models import Building
+from app.repositories.common_dependencies import haversine_distance
+from app.repositories.index_poller import index_poller
+from app.repositories.spatial_index import SpatialGridIndex, building_index
+
+
+def test_radius_query_matches_brute_force():
+    rng = random.Random(1)
+    index = SpatialGridIndex(cell_deg=0.5)
+    points = {point_id: (rng.uniform(-89, 89), rng.uniform(-180, 180)) for point_id in range(1, 2001)}
+    for point_id, (latitude, longitude) in points.items():
+        index.add(point_id, latitude, longitude)
+
+    for latitude, longitude, radius_km in ((55.75, 37.62, 800), (0.0, 179.9, 1500), (88.5, 10.0, 400)):
+        expected = {point_id for point_id, point in points.items()
+                    if haversine_distance(latitude, longitude, *point) <= radius_km}
+        assert set(index.query_radius(latitude, longitude, radius_km)) == expected
+
+
+def test_poller_reloads_index_after_write_from_another_process(api, run, db, building):
+    radius = {"center_lat": 59.94, "center_lon": 30.31, "radius_km": 5}
+    assert api("GET", "/buildings/buildings_in_radius", params=radius).json()["items"] == []
+
+    async def write_elsewhere():
+        # Запись мимо API, как её сделал бы другой воркер или загрузчик: индекс этого процесса не обновляется,
+        # меняется только общая версия таблицы.
+        async with db.session_factory() as session:
+            await index_poller.load(session, "building")
+            await session.execute(insert(Building).values(address="г. Санкт-Петербург, Невский пр. 1",
+                                                          latitude=59.94, longitude=30.31))
+            await session.commit()
+        await TableVersions(engine=db.engine).bump("building")
+        async with db.session_factory() as session:
+            return await index_poller.refresh_if_stale(session)
+
+    assert run(write_elsewhere()) == ["building"]
+    assert len(building_index) == 2
+    items = api("GET", "/buildings/buildings_in_radius", params=radius).json()["items"]
+    assert [item["address"] for item in items] == ["г. Санкт-Петербург, Невский пр. 1"]
+
+
+def test_poller_skips_unchanged_indexes(run, db, building):
+    async def refresh():
+        async with db.session_factory() as session:
+            await index_poller.load(session)
+            return await index_poller.refresh_if_stale(session)
+
+    assert run(refresh()) == []
+
+
+def test_poller_skips_writes_of_own_process(api, run, db):
+    async def load():
+        async with db.session_factory() as session:
+            await index_poller.load(session)
+
+    async def refresh():
+        async with db.session_factory() as session:
+            return await index_poller.refresh_if_stale(session)
+
+    run(load())
+    api("POST", "/buildings/", json={"address": "Здание", "latitude": 1, "longitude": 1})
+    api("POST", "/activities/", json={"name": "Еда"})
+
+    assert run(refresh()) == []
+    assert len(building_index) == 1
@@ -0,0 +1,60 @@
+import pytest
+
+from app.repositories.suggest_index import suggest_index
+
+
+@pytest.fixture
+def organizations(api, building):
+    return {name: api("POST", "/organizations/", json={"name": name, "building_id": building}).json()["id"]
+            for name in ("Рога 1", "Рога 2", "Рога 3", "Копыта и Рога")}
+
+
+def suggested(api, q: str, k: int = 10) -> list[str]:
+    response = api("GET", "/organizations/suggest", params={"q": q, "k": k})
+    assert response.status_code == 200, response.text
+    return [item["name"] for item in response.json()]
+
+
+@pytest.fixture(params=["scan", "memoized"])
+def scan_limit(request, monkeypatch):
+    """Префикс "рога" совпадает с четырьмя ключами: при scan_limit=2 его лучшие результаты запоминаются."""
+    monkeypatch.setattr(suggest_index, "scan_limit", 512 if request.param == "scan" else 2)
+    return suggest_index.scan_limit
+
+
+def test_suggest_matches_any_word_and_ranks_first_word_higher(api, organizations):
+    assert suggested(api, "рог") == ["Рога 1", "Рога 2", "Рога 3", "Копыта и Рога"]
+    assert suggested(api, "копы") == ["Копыта и Рога"]
+
+
+def test_created_organization_is_suggested(api, building, organizations, scan_limit):
+    assert suggested(api, "рога", k=3) == ["Рога 1", "Рога 2", "Рога 3"]
+
+    api("POST", "/organizations/", json={"name": "Рога", "building_id": building})
+
+    assert suggested(api, "рога", k=3) == ["Рога", "Рога 1", "Рога 2"]
+
+
+def test_renamed_organization_is_suggested_by_new_name_only(api, organizations, scan_limit):
+    assert "Рога 1" in suggested(api, "рога")
+
+    api("PATCH", f"/organizations/{organizations['Рога 1']}", json={"name": "Копыта 1"})
+
+    assert suggested(api, "рога") == ["Рога 2", "Рога 3", "Копыта и Рога"]
+    assert suggested(api, "копыта") == ["Копыта 1", "Копыта и Рога"]
+
+
+def test_deleted_organization_is_not_suggested(api, organizations, scan_limit):
+    assert "Рога 2" in suggested(api, "рога")
+
+    api("DELETE", f"/organizations/{organizations['Рога 2']}")
+
+    assert suggested(api, "рога") == ["Рога 1", "Рога 3", "Копыта и Рога"]
+
+
+def test_memoized_prefix_is_used(api, organizations, monkeypatch):
+    monkeypatch.setattr(suggest_index, "scan_limit", 2)
+
+    suggested(api, "рога")
+
+    assert "рога" in suggest_index._top